@@ -0,0 +1,320 @@
+"""Multi-snake arena: many AI snakes sharing one playfield.
+
+``Arena`` keeps every snake in one padded structure of arrays, shape
+(segments, snakes), so a tick is a fixed number of NumPy operations per
+body *position* rather than per snake: the follow chain is still solved
+head to tail, but each step advances that segment of every snake at once.
+Food pickup, walls and obstacles are tested as (snakes x items) arrays, and
+snake-vs-snake hits go through a sort-based uniform grid over all body
+segments, so only heads and segments in neighbouring cells are compared.
+
+The rules follow the single-player game (segment spacing, thickness taper,
+food points/growth, timers, the speed ramp and power-up boost, the skipped
+first five segments for self-hits) with one change: a dead snake respawns
+at full health somewhere free, back at its starting speed, rather than
+losing a life. It is mainly a stress test and load generator::
+
+    python reptilearena.py --snakes 100 --length 100 --ticks 600
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+import reptilecore
+from reptilecore import screen_width, screen_height
+
+
+STATS_FIELDS = ('score', 'food_eaten', 'kills', 'deaths', 'best_length')
+
+
+def greedy_controller(arena, reach=100):
+    """Vectorised reptilebatch.greedy_controller: every snake heads for its
+    nearest food, with the cursor kept within ``reach`` of the head"""
+    head_x, head_y = arena.xs[0], arena.ys[0]
+    dx = arena.food_x[None, :] - head_x[:, None]
+    dy = arena.food_y[None, :] - head_y[:, None]
+    nearest = np.argmin(dx * dx + dy * dy, axis=1)
+    rows = np.arange(arena.num_snakes)
+    target_dx, target_dy = dx[rows, nearest], dy[rows, nearest]
+    dist = np.maximum(np.hypot(target_dx, target_dy), 1e-9)
+    scale = np.minimum(1.0, reach / dist)
+    return head_x + target_dx * scale, head_y + target_dy * scale
+
+
+class Arena:
+    segment_length = 18
+    spawn_length = 8
+    invulnerable_ticks = reptilecore.INVULNERABLE_TICKS
+    power_ticks = reptilecore.POWER_UP_TICKS
+    # Food keeps the 'normal' size, points and growth whatever its type, as in Game
+    food_size = 12
+    food_points = 10
+    food_growth = 1
+    speed_increment = reptilecore.SPEED_INCREMENT
+    max_speed = reptilecore.MAX_SPEED
+    body_cell_size = 64
+    super_food_chance = reptilecore.SUPER_FOOD_CHANCE
+    power_food_chance = reptilecore.POWER_FOOD_CHANCE
+
+    def __init__(self, snakes=100, food=150, obstacles=10, length=None, seed=None,
+                 base_speed=0.3, controller=greedy_controller):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng, self.fx_rng = reptilecore.make_rng_streams(self.seed)
+        self.clock = reptilecore.SimClock()
+        self.ticks = 0
+        self.num_snakes = snakes
+        self.base_speed = base_speed
+        self.controller = controller
+
+        self.spawn_length = length = length or self.spawn_length
+        capacity = max(32, 1 << (length - 1).bit_length())
+        self.xs = np.zeros((capacity, snakes))
+        self.ys = np.zeros((capacity, snakes))
+        self.angles = np.zeros((capacity, snakes))
+        self.lengths = np.full(snakes, length, dtype=np.int64)
+        self.power_timer = np.zeros(snakes, dtype=np.int64)
+        self.invulnerable_timer = np.zeros(snakes, dtype=np.int64)
+        self.stats = {name: np.zeros(snakes, dtype=np.int64) for name in STATS_FIELDS}
+        self.life_food = np.zeros(snakes, dtype=np.int64)  # Eaten since the last respawn
+
+        self.obstacles = []
+        space = reptilecore.PlacementGrid()
+        space.block_outside(60, 60, screen_width - 60, screen_height - 60)
+        for _ in range(obstacles):
+            width, height = self.rng.randint(70, 140), self.rng.randint(40, 90)
+            position = space.sample_rect(self.rng, width, height)
+            if position is not None:
+                self.obstacles.append(reptilecore.Obstacle(position[0], position[1], width, height))
+                space.block_rect(position[0], position[1], width, height, margin=30)
+        self.obstacle_rects = np.array([tuple(o.rect) for o in self.obstacles], dtype=np.float64).reshape(-1, 4)
+
+        # Free space for food and spawns, fixed for the arena's lifetime
+        self.food_space = reptilecore.PlacementGrid()
+        self.food_space.block_outside(50, 50, screen_width - 50, screen_height - 50)
+        for obstacle in self.obstacles:
+            self.food_space.block_rect(*obstacle.rect, margin=20)
+        self.spawn_space = reptilecore.PlacementGrid()
+        self.spawn_space.block_outside(120, 120, screen_width - 120, screen_height - 120)
+        for obstacle in self.obstacles:
+            self.spawn_space.block_rect(*obstacle.rect, margin=80)
+
+        self.food_x = np.zeros(food)
+        self.food_y = np.zeros(food)
+        self.food_type = [None] * food
+        for i in range(food):
+            self._place_food(i)
+
+        for s in range(snakes):
+            self._spawn(s)
+
+    def _place_food(self, i):
+        x, y = self.food_space.sample_point(self.rng)
+        food_type = 'normal'
+        if self.rng.random() < self.super_food_chance:
+            food_type = 'super'
+        elif self.rng.random() < self.power_food_chance:
+            food_type = 'power'
+        self.food_x[i], self.food_y[i] = x, y
+        self.food_type[i] = food_type
+
+    def _spawn(self, s):
+        """(Re)start snake ``s`` stacked at a random free point"""
+        length = self.spawn_length
+        self._reserve(length)
+        x, y = self.spawn_space.sample_point(self.rng)
+        self.xs[:, s], self.ys[:, s], self.angles[:, s] = x, y, 0.0
+        self.lengths[s] = length
+        self.power_timer[s] = 0
+        self.invulnerable_timer[s] = self.invulnerable_ticks
+        self.life_food[s] = 0
+
+    def _reserve(self, capacity):
+        if capacity <= len(self.xs):
+            return
+        new_capacity = max(capacity, 2 * len(self.xs))
+        for name in ('xs', 'ys', 'angles'):
+            old = getattr(self, name)
+            grown = np.zeros((new_capacity, self.num_snakes))
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def grow(self, s, count):
+        n = int(self.lengths[s])
+        self._reserve(n + count)
+        self.xs[n:n + count, s] = self.xs[n - 1, s]
+        self.ys[n:n + count, s] = self.ys[n - 1, s]
+        self.angles[n:n + count, s] = 0.0
+        self.lengths[s] = n + count
+
+    def speeds(self):
+        """GameStats.get_current_speed times the power-up boost, per snake"""
+        speed = np.minimum(self.base_speed + self.life_food * self.speed_increment, self.max_speed)
+        return speed * np.where(self.power_timer > 0, 2.0, 1.0)
+
+    def update_bodies(self, target_x, target_y):
+        """Batched Snake.update for every snake.
+
+        Only the head's angle is kept up to date; nothing in the arena reads
+        the body angles.
+        """
+        now = self.clock.get_ticks()
+        speed = self.speeds()
+        dist = np.hypot(target_x - self.xs[0], target_y - self.ys[0])
+        amplitude = np.where(dist > 15, 12 * speed, 0.0)
+        head_amplitude = np.where(dist > 15, 5 * speed, 0.0)
+        length = self.segment_length
+        tx, ty = np.asarray(target_x, dtype=np.float64), np.asarray(target_y, dtype=np.float64)
+        xs, ys = self.xs, self.ys
+        self.angles[0] = np.arctan2(ty - ys[0], tx - xs[0])
+        for i in range(int(self.lengths.max())):
+            x, y = xs[i], ys[i]
+            dx, dy = tx - x, ty - y
+            # Unit vector straight from the offset instead of atan2 -> cos/sin
+            inverse = 1.0 / np.maximum(np.hypot(dx, dy), 1e-12)
+            ux, uy = dx * inverse, dy * inverse
+            if i == 0:
+                w = head_amplitude * math.sin(now * 0.02)
+            else:
+                w = amplitude * math.sin(now * 0.02 + i * 0.4)
+            # Perpendicular (cos(a + pi/2), sin(a + pi/2)) is (-uy, ux)
+            tx = x + (dx - ux * length - uy * w) * speed
+            ty = y + (dy - uy * length + ux * w) * speed
+            xs[i], ys[i] = tx, ty
+
+    def check_food(self):
+        head_x, head_y = self.xs[0], self.ys[0]
+        reach = 22 + self.food_size
+        hits = ((np.abs(self.food_x[None, :] - head_x[:, None]) < reach)
+                & (np.abs(self.food_y[None, :] - head_y[:, None]) < reach))
+        snakes, foods = np.nonzero(hits)
+        taken = set()
+        for s, f in zip(snakes.tolist(), foods.tolist()):
+            if f in taken:
+                continue  # Lower-numbered snake got there first
+            taken.add(f)
+            food_type = self.food_type[f]
+            self.stats['score'][s] += self.food_points
+            self.stats['food_eaten'][s] += 1
+            self.life_food[s] += 1
+            if food_type == 'power':
+                self.power_timer[s] = self.power_ticks
+            self.grow(s, self.food_growth)
+            self._place_food(f)
+
+    def check_collisions(self):
+        """Indices of snakes whose head hit a wall, rock or body this tick,
+        and the owner of the body each one hit (-1 for walls and rocks)"""
+        head_x, head_y = self.xs[0], self.ys[0]
+        vulnerable = self.invulnerable_timer == 0
+        margin = 25
+        dead = ((head_x < margin) | (head_x > screen_width - margin)
+                | (head_y < margin) | (head_y > screen_height - margin)
+                | ~np.isfinite(head_x) | ~np.isfinite(head_y))
+        if len(self.obstacle_rects):
+            ox, oy, ow, oh = self.obstacle_rects.T
+            dead |= ((head_x[:, None] + 18 > ox) & (head_x[:, None] - 18 < ox + ow)
+                     & (head_y[:, None] + 18 > oy) & (head_y[:, None] - 18 < oy + oh)).any(axis=1)
+        dead &= vulnerable
+        killer = np.full(self.num_snakes, -1, dtype=np.int64)
+
+        heads, owners = self.body_hits(vulnerable & ~dead)
+        for s, owner in zip(heads.tolist(), owners.tolist()):
+            if not dead[s]:
+                dead[s] = True
+                killer[s] = owner if owner != s else -1
+        return np.flatnonzero(dead), killer
+
+    def body_hits(self, candidates):
+        """(head snake, body owner) pairs where a candidate head overlaps a
+        body segment; broad phase is a sort-based grid over all segments"""
+        cs = self.body_cell_size
+        grid_w = screen_width // cs + 3
+        segment_index = np.arange(len(self.xs))[:, None]
+        live = (segment_index < self.lengths[None, :]) & (self.invulnerable_timer == 0)[None, :]
+        live &= np.isfinite(self.xs) & np.isfinite(self.ys)
+        seg_i, seg_s = np.nonzero(live)
+        seg_x, seg_y = self.xs[seg_i, seg_s], self.ys[seg_i, seg_s]
+        keys = (np.clip(seg_x // cs, -1, grid_w - 2) + 1) * grid_w + np.clip(seg_y // cs, -1, grid_w - 2) + 1
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        heads = np.flatnonzero(candidates)
+        if not len(heads) or not len(order):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        head_x, head_y = self.xs[0, heads], self.ys[0, heads]
+        cell_x = np.clip(head_x // cs, -1, grid_w - 2) + 1
+        cell_y = np.clip(head_y // cs, -1, grid_w - 2) + 1
+        offsets = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        query = (cell_x[:, None] + offsets[:, 0]) * grid_w + cell_y[:, None] + offsets[:, 1]
+        lo = np.searchsorted(sorted_keys, query, 'left').ravel()
+        hi = np.searchsorted(sorted_keys, query, 'right').ravel()
+        counts = hi - lo
+        total = int(counts.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # Flatten the [lo, hi) ranges into one candidate list
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        candidate = order[starts + np.arange(total)]
+        head = heads[np.repeat(np.arange(len(heads) * 9) // 9, counts)]
+        owner, index = seg_s[candidate], seg_i[candidate]
+
+        keep = (owner != head) | (index >= 5)  # Skip the neck, as in the solo game
+        head, owner, index, candidate = head[keep], owner[keep], index[keep], candidate[keep]
+        progress = index / np.maximum(1, self.lengths[owner] - 1)
+        thickness = np.where(index == 0, 32, (26 * (1 - progress * 0.6) + 8).astype(np.int64))
+        half = thickness / 2 + 18
+        hit = ((np.abs(seg_x[candidate] - self.xs[0, head]) < half)
+               & (np.abs(seg_y[candidate] - self.ys[0, head]) < half))
+        return head[hit], owner[hit]
+
+    def tick(self):
+        target_x, target_y = self.controller(self)
+        self.update_bodies(np.asarray(target_x, dtype=np.float64), np.asarray(target_y, dtype=np.float64))
+        np.maximum(self.power_timer - 1, 0, out=self.power_timer)
+        np.maximum(self.invulnerable_timer - 1, 0, out=self.invulnerable_timer)
+        self.check_food()
+        dead, killer = self.check_collisions()
+        for s in dead.tolist():
+            self.stats['deaths'][s] += 1
+            self.stats['best_length'][s] = max(self.stats['best_length'][s], self.lengths[s])
+            if killer[s] >= 0:
+                self.stats['kills'][killer[s]] += 1
+            self._spawn(s)
+        self.clock.advance()
+        self.ticks += 1
+
+    def snake_stats(self, s):
+        """Per-snake stats as a dict"""
+        stats = {name: int(values[s]) for name, values in self.stats.items()}
+        stats['length'] = int(self.lengths[s])
+        stats['best_length'] = max(stats['best_length'], stats['length'])
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a headless multi-snake arena")
+    parser.add_argument('--snakes', type=int, default=100)
+    parser.add_argument('--length', type=int, default=100, help="starting (and respawn) length of every snake")
+    parser.add_argument('--food', type=int, default=150)
+    parser.add_argument('--obstacles', type=int, default=10)
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    arena = Arena(args.snakes, args.food, args.obstacles, args.length, args.seed)
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        arena.tick()
+    elapsed = time.perf_counter() - start
+    totals = {name: int(values.sum()) for name, values in arena.stats.items() if name != 'best_length'}
+    print(f"{args.snakes} snakes, {args.ticks} ticks in {elapsed:.2f}s "
+          f"({args.ticks / elapsed:.0f} ticks/s, {elapsed / args.ticks * 1000:.2f} ms/tick)", file=sys.stderr)
+    print(f"totals: {totals}; segments now {int(arena.lengths.sum())}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Batch runner for headless Snake Adventure games.
+
+Runs many ``reptilecore.Game`` instances across a process pool, each driven
+by a controller instead of the mouse, and streams one result record per game
+to a JSON Lines or CSV file. Intended for balance sweeps, e.g.::
+
+    python reptilebatch.py --grid grid.json --games 50 --output results.jsonl
+
+where ``grid.json`` maps tuning parameters to lists of values to try::
+
+    {"base_speed": [0.1, 0.15, 0.2], "power_food_chance": [0.08, 0.15]}
+"""
+import argparse
+import csv
+import importlib
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import reptilecore
+
+
+RESULT_FIELDS = ['seed', 'config', 'controller', 'score', 'level', 'food_eaten',
+                 'length', 'lives', 'ticks', 'outcome', 'wall_time']
+
+
+def greedy_controller(game, reach=100):
+    """Steer towards the nearest food item.
+
+    The head closes a fixed fraction of the distance to the cursor every
+    tick, so the cursor is kept within ``reach`` pixels of the head, the way
+    a player's mouse leads the snake, rather than jumping onto the food.
+    """
+    head_x, head_y = float(game.snake.xs[0]), float(game.snake.ys[0])
+    if game.food_list:
+        food = min(game.food_list, key=lambda f: (f.x - head_x) ** 2 + (f.y - head_y) ** 2)
+        target_x, target_y = food.x, food.y
+    else:
+        target_x, target_y = reptilecore.screen_width / 2, reptilecore.screen_height / 2
+    dist = math.hypot(target_x - head_x, target_y - head_y)
+    if dist <= reach:
+        return target_x, target_y
+    return (head_x + (target_x - head_x) * reach / dist,
+            head_y + (target_y - head_y) * reach / dist)
+
+
+def wander_controller(game):
+    """Sweep the playfield on a slow Lissajous curve, ignoring food"""
+    t = game.ticks
+    return (reptilecore.screen_width / 2 + 380 * math.cos(t * 0.011),
+            reptilecore.screen_height / 2 + 260 * math.sin(t * 0.017))
+
+
+def resolve_controller(controller):
+    """Accept a controller callable or a ``"module:function"`` reference"""
+    if callable(controller):
+        return controller
+    module_name, _, attr = controller.partition(':')
+    if not attr:
+        module_name, attr = __name__, module_name
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def controller_name(controller):
+    if isinstance(controller, str):
+        return controller
+    return f"{controller.__module__}:{controller.__qualname__}"
+
+
+def sweep(grid, games=1, seed=0):
+    """Yield (seed, config) jobs for every grid combination, ``games`` each.
+
+    Seeds are assigned sequentially from ``seed``, so a sweep is fully
+    reproducible.
+    """
+    names = sorted(grid)
+    next_seed = seed
+    for values in itertools.product(*(grid[name] for name in names)):
+        config = dict(zip(names, values))
+        for _ in range(games):
+            yield next_seed, config
+            next_seed += 1
+
+
+def run_game(seed, config=None, controller=greedy_controller, max_ticks=36000):
+    """Play one headless game to the end (or ``max_ticks``) and summarise it"""
+    control = resolve_controller(controller)
+    game = reptilecore.Game(seed=seed, config=config)
+    start = time.perf_counter()
+    while game.state == "playing" and game.ticks < max_ticks:
+        game.tick(control(game))
+    return {
+        'seed': seed,
+        'config': game.config,
+        'controller': controller_name(controller),
+        'score': game.stats.score,
+        'level': game.stats.level,
+        'food_eaten': game.stats.food_eaten,
+        'length': len(game.snake.segments),
+        'lives': game.stats.lives,
+        'ticks': game.ticks,
+        'outcome': game.state if game.state != "playing" else "timeout",
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def _run_job(args):
+    return run_game(*args)
+
+
+class ResultWriter:
+    """Append result records to a .jsonl or .csv file as they arrive"""
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.csv = None
+        if path.endswith('.csv'):
+            self.csv = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, result):
+        if self.csv:
+            self.csv.writerow(dict(result, config=json.dumps(result['config'], sort_keys=True)))
+        else:
+            self.file.write(json.dumps(result) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch(jobs, controller=greedy_controller, max_ticks=36000, workers=None, output=None):
+    """Run ``(seed, config)`` jobs across a process pool.
+
+    Yields each result as soon as its game finishes (completion order, not
+    submission order) and, if ``output`` is given, streams it to that file.
+    ``workers=1`` runs in-process, which is handy for profiling.
+    """
+    args = [(seed, config, controller, max_ticks) for seed, config in jobs]
+    writer = ResultWriter(output) if output else None
+    try:
+        if workers == 1:
+            yield from _record(map(_run_job, args), writer)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_run_job, job) for job in args]
+                yield from _record((future.result() for future in as_completed(futures)), writer)
+    finally:
+        if writer:
+            writer.close()
+
+
+def _record(results, writer):
+    for result in results:
+        if writer:
+            writer.write(result)
+        yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless Snake Adventure games in parallel")
+    parser.add_argument('--games', type=int, default=10, help="games per grid combination")
+    parser.add_argument('--grid', help="JSON file mapping parameters to lists of values")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help="fix a parameter for every game (repeatable)")
+    parser.add_argument('--seed', type=int, default=0, help="first seed of the sweep")
+    parser.add_argument('--controller', default='greedy_controller',
+                        help="controller function, as name or module:function")
+    parser.add_argument('--max-ticks', type=int, default=36000, help="stop a game after this many ticks")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--output', default='results.jsonl', help="results file (.jsonl or .csv)")
+    args = parser.parse_args(argv)
+
+    grid = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    for item in args.set:
+        name, _, value = item.partition('=')
+        grid[name] = [json.loads(value)]
+
+    jobs = list(sweep(grid, args.games, args.seed))
+    start = time.perf_counter()
+    total_ticks = 0
+    for done, result in enumerate(run_batch(jobs, args.controller, args.max_ticks, args.workers, args.output), 1):
+        total_ticks += result['ticks']
+        print(f"[{done}/{len(jobs)}] seed {result['seed']}: score {result['score']}, "
+              f"level {result['level']}, {result['ticks']} ticks ({result['outcome']})", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs)} games, {total_ticks} ticks in {elapsed:.1f}s "
+          f"({total_ticks / elapsed:.0f} ticks/s) -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
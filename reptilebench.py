@@ -0,0 +1,521 @@
+"""Benchmarks for the simulation and rendering hot paths.
+
+Every workload is seeded and fixed-size, and rendering goes to offscreen
+surfaces through SDL's dummy video driver, so results are comparable between
+runs on the same machine::
+
+    python reptilebench.py --output bench.json              # run and save results
+    python reptilebench.py --save-baseline                  # record a baseline
+    python reptilebench.py --compare                        # fail on regressions
+
+``--compare`` exits with status 1 if any benchmark's median is more than
+``--threshold`` times slower than the stored baseline.
+"""
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pygame
+
+import reptilearena
+import reptilebatch
+import reptilecast
+import reptilecore
+import reptilesimu
+import reptiletelemetry
+import reptilevec
+
+
+BASELINE_PATH = 'bench_baseline.json'
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register ``setup`` under ``name``; setup() returns the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def make_snake(segments, snake_class=reptilecore.Snake, ticks=120):
+    """A snake of ``segments`` that has been steered into a loose coil"""
+    snake = snake_class()
+    snake.add_segment(segments - snake.count)
+    for k in range(ticks):
+        snake.update(500 + 220 * math.cos(k * 0.05), 350 + 220 * math.sin(k * 0.05), 0.5, k * 16)
+    return snake
+
+
+def make_game(seed=1234, level=1, game_class=reptilecore.Game):
+    game = game_class(state="playing", persist=False, seed=seed)
+    if level != 1:
+        game.stats.level = level
+        game.generate_level()
+    return game
+
+
+for _n, _fast in [(n, fast) for fast in (False, True) for n in (8, 100, 1000, 10000)]:
+    @benchmark(f"snake_update{'_fast' if _fast else ''}[{_n}]")
+    def _setup(n=_n, fast=_fast):
+        snake = make_snake(n)
+        snake.fast_math = fast
+        k = [0]
+
+        def run():
+            k[0] += 1
+            snake.update(500 + 200 * math.cos(k[0] * 0.05), 350, 0.5, k[0] * 16)
+        return run
+
+
+@benchmark('check_self_collision[1000]')
+def _setup():
+    return make_snake(1000).check_self_collision_indexed
+
+
+@benchmark('check_self_collision_reference[1000]')
+def _setup():
+    return make_snake(1000).check_self_collision
+
+
+@benchmark('check_food_collision[level 50]')
+def _setup():
+    game = make_game(level=50)
+    return lambda: game.snake.check_food_collision_indexed(game.food_index)
+
+
+@benchmark('check_food_collision_reference[level 50]')
+def _setup():
+    game = make_game(level=50)
+    return lambda: game.snake.check_food_collision(game.food_list)
+
+
+for _level in (10, 50):
+    @benchmark(f'generate_level[level {_level}]')
+    def _setup(level=_level):
+        game = make_game(level=level)
+        return game.generate_level
+
+
+@benchmark('snapshot[level 50, 1000]')
+def _setup():
+    game = make_game(level=50)
+    game.snake = make_snake(1000)
+    return game.snapshot
+
+
+@benchmark('restore[level 50, 1000]')
+def _setup():
+    game = make_game(level=50)
+    game.snake = make_snake(1000)
+    data = game.snapshot()
+    return lambda: game.restore(data)
+
+
+def make_particles(count=20000):
+    particles = reptilecore.ParticleSystem(count, seed=7)
+    for k in range(count // 100):
+        particles.emit(50 + k * 4, 350, 100, (255, 200, 50), speed=4.0, life=10 ** 6)
+    return particles
+
+
+@benchmark('particles_update[20000]')
+def _setup():
+    return make_particles().update
+
+
+@benchmark('particles_draw[20000]')
+def _setup():
+    surface = pygame.Surface((reptilecore.screen_width, reptilecore.screen_height))
+    particles = make_particles()
+    return lambda: reptilesimu.draw_particles(surface, particles)
+
+
+@benchmark('vecenv_step[1024]')
+def _setup():
+    env = reptilevec.VecEnv(1024, seed=0)
+    targets = np.random.default_rng(0).uniform((0, 0), (reptilecore.screen_width, reptilecore.screen_height),
+                                               (1024, 2))
+    return lambda: env.step(targets)
+
+
+@benchmark('telemetry_write')
+def _setup():
+    game = reptilecore.Game(seed=0)
+    writer = reptiletelemetry.TelemetryWriter(os.path.join(tempfile.gettempdir(), 'reptilebench.tel'))
+    return lambda: writer.write(game)
+
+
+@benchmark('cast_encode[200]')
+def _setup():
+    game = reptilecore.Game(seed=0)
+    game.snake = make_snake(200)
+    encoder = reptilecast.StateEncoder(keyframe_interval=1 << 30)
+    encoder.encode(game)
+    return lambda: encoder.encode(game)
+
+
+@benchmark('arena_tick[100x100]')
+def _setup():
+    arena = reptilearena.Arena(snakes=100, length=100, seed=0)
+    for _ in range(60):
+        arena.tick()
+    return arena.tick
+
+
+@benchmark('food_draw[25]')
+def _setup():
+    rng = random.Random(5)
+    surface = pygame.Surface((reptilecore.screen_width, reptilecore.screen_height))
+    foods = [reptilesimu.Food(rng=rng) for _ in range(25)]
+    for food in foods:
+        food.type = rng.choice(['normal', 'super', 'power'])
+
+    def run():
+        for food in foods:
+            food.update()
+            food.draw(surface, rng)
+    return run
+
+
+@benchmark('obstacle_draw[10]')
+def _setup():
+    rng = random.Random(6)
+    surface = pygame.Surface((reptilecore.screen_width, reptilecore.screen_height))
+    obstacles = [reptilesimu.Obstacle(rng.randint(60, 800), rng.randint(60, 550),
+                                      rng.randint(70, 140), rng.randint(40, 90)) for _ in range(10)]
+
+    def run():
+        for obstacle in obstacles:
+            obstacle.draw(surface)
+    return run
+
+
+@benchmark('segment_draw[100]')
+def _setup():
+    surface = pygame.Surface((reptilecore.screen_width, reptilecore.screen_height))
+    snake = make_snake(100, reptilesimu.Snake)
+    return lambda: snake.draw(surface)
+
+
+@benchmark('full_frame[1000x700]')
+def _setup():
+    surface = pygame.Surface((reptilecore.screen_width, reptilecore.screen_height))
+    game = make_game(level=5, game_class=reptilesimu.Game)
+    game.snake = make_snake(60, reptilesimu.Snake)
+
+    def run():
+        game.clock.advance()
+        game.draw(surface)
+    return run
+
+
+def time_benchmark(setup, min_time=0.2, repeats=5):
+    """Median and best per-call time in microseconds"""
+    run = setup()
+    run()  # Warm caches
+
+    # Calibrate a batch size that takes roughly min_time / repeats
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeats or iterations >= 1 << 20:
+            break
+        iterations *= 2
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return {'median_us': statistics.median(samples), 'min_us': min(samples), 'iterations': iterations}
+
+
+def run_benchmarks(selected=None, min_time=0.2, repeats=5):
+    random.seed(0)
+    np.random.seed(0)
+    reptilesimu.init_display()
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = time_benchmark(setup, min_time, repeats)
+        print(f"{name:<42}{results[name]['median_us']:12.2f} us", file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+# Worst acceptable one-tick position error of fast math, and drift over a
+# whole non-chaotic run (see check_fast_math), in pixels
+FAST_MATH_STEP_TOLERANCE = 1e-4
+FAST_MATH_DRIFT_TOLERANCE = 1e-2
+
+
+def check_fast_math(segments=1000, ticks=600):
+    """Compare Snake.fast_math with the exact follow chain.
+
+    Returns the worst table_sin error over a wide phase range, the worst
+    one-tick position error (the fast snake is reset to the exact body before
+    every tick, at speeds up to the boosted 0.8) and the worst drift of a
+    free-running fast snake at game speed. A long snake coiled at high speed
+    is chaotic even in exact arithmetic (a 1e-9 px nudge grows to a visible
+    difference), so the free-running comparison is only meaningful where the
+    exact path is stable; the one-tick error bounds the rest.
+    """
+    phases = np.linspace(-1e3, 1e5, 1 << 20)
+    table_error = float(np.abs(reptilecore.table_sin(phases) - np.sin(phases)).max())
+
+    def follow(speed, resync):
+        exact, fast = reptilecore.Snake(), reptilecore.Snake()
+        fast.fast_math = True
+        for snake in (exact, fast):
+            snake.add_segment(segments - snake.count)
+        worst = 0.0
+        for k in range(ticks):
+            if resync:
+                fast.set_body(exact.xs[:segments].copy(), exact.ys[:segments].copy(),
+                              exact.angles[:segments].copy())
+            target = (500 + 220 * math.cos(k * 0.05), 350 + 220 * math.sin(k * 0.05))
+            exact.update(*target, speed, k * 16)
+            fast.update(*target, speed, k * 16)
+            error = np.hypot(exact.xs[:segments] - fast.xs[:segments], exact.ys[:segments] - fast.ys[:segments])
+            worst = max(worst, float(error.max()))
+        return worst
+
+    return {
+        'table_error': table_error,
+        'step_error': max(follow(speed, True) for speed in (0.15, 0.3, 0.5, 0.8)),
+        'drift': max(follow(speed, False) for speed in (0.15, 0.3)),
+    }
+
+
+def check_collisions(layouts=2000, seed=0):
+    """Fuzz the indexed collision checks against the reference scans.
+
+    Each layout is a seeded level (food and rocks for a random level number)
+    with a snake of random length steered around a random circle, tight
+    enough at times to coil into itself, at speeds up to the boosted 1.6.
+    With the head's previous position set to where it stands, the swept
+    checks have nothing to sweep and must agree exactly with the
+    end-position scans: the same set of food, the same rock and self-hit
+    verdicts. After a real move they may find more, never less.
+
+    Returns {check: [layouts where the reference hit, mismatches]}.
+    """
+    rng = random.Random(seed)
+    results = {name: [0, 0] for name in ('food', 'obstacle', 'self')}
+
+    def compare(name, reference, indexed, exact):
+        results[name][0] += exact and bool(reference)
+        if (reference != indexed) if exact else not reference <= indexed:
+            results[name][1] += 1
+
+    for k in range(layouts):
+        game = reptilecore.Game(seed=seed * layouts + k)
+        game.stats.level = rng.randint(1, 12)
+        game.generate_level()
+        snake = game.snake
+        snake.add_segment(rng.randint(0, 80))
+        cx, cy = rng.uniform(100, 900), rng.uniform(100, 600)
+        radius = rng.choice((20, 40, 80, 160, 300))
+        speed = rng.choice((0.15, 0.3, 0.5, 0.8, 1.6))
+        for tick in range(rng.randint(1, 150)):
+            angle = tick * rng.uniform(0.02, 0.2)
+            snake.update(cx + radius * math.cos(angle), cy + radius * math.sin(angle), speed, tick * 16)
+
+        for exact in (False, True):
+            if exact:
+                n = snake.count
+                snake.previous = (snake.xs[:n].copy(), snake.ys[:n].copy(), snake.angles[:n].copy())
+            compare('food', {id(food) for food in game.food_list if snake.check_food_collision([food])},
+                    {id(food) for food in snake.check_food_collision_indexed(game.food_index)}, exact)
+            compare('obstacle', {True} if snake.check_obstacle_collision(game.obstacles) else set(),
+                    {True} if snake.check_obstacle_collision_indexed(game.obstacle_index) else set(), exact)
+            compare('self', {True} if snake.check_self_collision() else set(),
+                    {True} if snake.check_self_collision_indexed() else set(), exact)
+    return results
+
+
+# Worst acceptable head position difference between VecEnv and Game, in pixels
+VECENV_HEAD_TOLERANCE = 1e-6
+# check_vecenv runs once per config: the defaults, where a power-up at top
+# speed soon ends the comparison, and without power food, which lets games
+# run on through many levels
+VECENV_CHECK_CONFIGS = ({}, {'power_food_chance': 0.0})
+
+
+def check_vecenv(games=16, ticks=2000, seed=0, config=None):
+    """Step a VecEnv and ``games`` fast-math Games with the same targets.
+
+    Targets mix each game's greedy controller with random points. Every
+    tick the score, lives, length, level and done flag must match, and the
+    head positions must agree within VECENV_HEAD_TOLERANCE. Each game is
+    compared until it ends, or until its effective speed (ramp times
+    power-up boost) goes above 1: from there the follow chain overshoots and
+    diverges, so rounding differences are amplified without bound and the
+    two copies are no longer expected to agree.
+
+    Returns {'ticks': ticks compared, 'ended': games compared to the end,
+    'chaotic': games cut off, 'head_error': worst head difference,
+    'mismatches': [(game, tick, what), ...]}.
+    """
+    rng = random.Random(seed)
+    config = dict(config or {}, fast_math=True)
+    env = reptilevec.VecEnv(games, seed=seed, config=config)
+    playing = [reptilecore.Game(state="playing", persist=False, seed=seed + e, config=config)
+               for e in range(games)]
+    live = set(range(games))
+    results = {'ticks': 0, 'ended': 0, 'chaotic': 0, 'head_error': 0.0, 'mismatches': []}
+    targets = np.zeros((games, 2))
+
+    for tick in range(ticks):
+        for e in list(live):
+            game = playing[e]
+            if game.stats.get_current_speed() * game.snake.speed_boost > 1:
+                live.discard(e)
+                results['chaotic'] += 1
+                continue
+            if rng.random() < 0.7:
+                targets[e] = reptilebatch.greedy_controller(game)
+            else:
+                targets[e] = rng.uniform(0, reptilecore.screen_width), rng.uniform(0, reptilecore.screen_height)
+        if not live:
+            break
+        for e in live:
+            playing[e].tick(tuple(targets[e]))
+        _, _, dones = env.step(targets)
+
+        for e in list(live):
+            game, stats = playing[e], playing[e].stats
+            results['ticks'] += 1
+            over = game.state == "game_over"
+            if over or dones[e]:
+                live.discard(e)
+                results['ended'] += 1
+                if over != bool(dones[e]):
+                    results['mismatches'].append((e, tick, f"done {bool(dones[e])} vs game {game.state}"))
+                elif (stats.score, stats.level) != (env.final_score[e], env.final_level[e]):
+                    results['mismatches'].append((e, tick, "final score or level"))
+                continue
+            expected = (stats.score, stats.lives, game.snake.count, stats.level)
+            got = (env.score[e], env.lives[e], env.lengths[e], env.level[e])
+            error = math.hypot(game.snake.xs[0] - env.xs[0, e], game.snake.ys[0] - env.ys[0, e])
+            results['head_error'] = max(results['head_error'], error)
+            if expected != tuple(int(v) for v in got):
+                what = f"score/lives/length/level {expected} vs {tuple(int(v) for v in got)}"
+            elif not error <= VECENV_HEAD_TOLERANCE:
+                what = f"head off by {error:.3g} px"
+            else:
+                continue
+            results['mismatches'].append((e, tick, what))
+            live.discard(e)  # Everything after the first difference follows from it
+    return results
+
+
+def compare(report, baseline, threshold):
+    """Print a comparison table; return the names that regressed"""
+    regressions = []
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            print(f"{name:<42}{'(new)':>12}")
+            continue
+        ratio = result['median_us'] / baseline['results'][name]['median_us']
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<42}{ratio:11.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Snake Adventure hot paths")
+    parser.add_argument('names', nargs='*', help="only run benchmarks whose name contains one of these")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--compare', action='store_true', help="compare against the baseline")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio that counts as a regression")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds to spend per benchmark")
+    parser.add_argument('--check-fast-math', action='store_true',
+                        help="verify fast-math accuracy against the exact path instead of benchmarking")
+    parser.add_argument('--check-vecenv', type=int, nargs='?', const=16, metavar='GAMES',
+                        help="step VecEnv and fast-math Games side by side and compare them instead of benchmarking")
+    parser.add_argument('--check-collisions', type=int, nargs='?', const=2000, metavar='LAYOUTS',
+                        help="fuzz the indexed collision checks against the reference scans instead of benchmarking")
+    args = parser.parse_args(argv)
+
+    if args.check_fast_math:
+        errors = check_fast_math()
+        limits = {'table_error': reptilecore.WIGGLE_TABLE_ERROR * (1 + 1e-6),
+                  'step_error': FAST_MATH_STEP_TOLERANCE, 'drift': FAST_MATH_DRIFT_TOLERANCE}
+        failed = [name for name, error in errors.items() if error > limits[name]]
+        for name, error in errors.items():
+            print(f"{name:<14}{error:12.3g} (limit {limits[name]:.3g}){'  FAIL' if name in failed else ''}")
+        return 1 if failed else 0
+
+    if args.check_vecenv:
+        failed = False
+        for config in VECENV_CHECK_CONFIGS:
+            results = check_vecenv(args.check_vecenv, config=config)
+            for game, tick, what in results['mismatches']:
+                print(f"config {config} game {game} tick {tick}: {what}  FAIL")
+            print(f"config {config}: {results['ticks']} game-ticks compared, {results['ended']} games to the "
+                  f"end, {results['chaotic']} cut off at speed > 1; worst head error "
+                  f"{results['head_error']:.3g} px (limit {VECENV_HEAD_TOLERANCE:.3g}); "
+                  f"{len(results['mismatches'])} mismatched")
+            failed |= bool(results['mismatches'])
+        return 1 if failed else 0
+
+    if args.check_collisions:
+        results = check_collisions(args.check_collisions)
+        for name, (hits, mismatches) in results.items():
+            print(f"{name:<10}{hits:6} layouts hit, {mismatches} mismatched{'  FAIL' if mismatches else ''}")
+        return 1 if any(mismatches for _, mismatches in results.values()) else 0
+
+    report = run_benchmarks(args.names, args.min_time)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed beyond {args.threshold}x", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
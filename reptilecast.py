@@ -0,0 +1,520 @@
+"""Live spectator streaming for Snake Adventure.
+
+``SpectatorServer`` serves one game to any number of local viewers over TCP.
+Set as ``Game.spectators`` it is fed once per tick, and on every change of
+game state (pause, menu, game over) even when no tick runs; it encodes the new state
+on the game's thread and hands the bytes to an asyncio loop (its own thread,
+or one you already run), which copies them to every viewer. Frames are
+length-prefixed binary, little-endian::
+
+    frame     u32 length, u8 kind, u32 tick, payload
+    keyframe  STAT_FIELDS x i64, u16 n, n x i16 x, n x i16 y,
+              u16 food count x (u32 id, i16 x, i16 y, u8 type),
+              u16 obstacle count x (4 x i16)
+    delta     u16 mask of changed stats, one i64 per changed stat,
+              u16 n, u8 width, n x dx, n x dy (int8 or int16 by width),
+              u16 removed count x u32 id, u16 added count x food
+
+Positions are quantised to 1/QUANTUM px and deltas are taken between the
+quantised values, so a viewer's copy is exact and never drifts. A
+segment's offset is from the same segment a tick earlier (for a new
+segment, from the old tail, where Snake.add_segment puts it), which fits in
+one byte per axis at any normal speed. Keyframes go out every
+``keyframe_interval`` ticks and whenever a delta can't express the change
+(new level or game, change of game state, body reset, offsets too large).
+A viewer that joins gets a keyframe of the latest state at once.
+
+The game never waits for a viewer: each one has a queue of at most
+``max_backlog`` frames. A viewer that overflows it loses the queue and gets
+a keyframe (built on the next tick) once everything already written to it
+has drained, then deltas again. ``watch`` is the client side::
+
+    python reptilesimu.py --spectate 8765
+    python reptilecast.py --watch 8765                 # follow it
+    python reptilecast.py --viewers 300 --slow 30      # local load test
+"""
+import argparse
+import asyncio
+import hashlib
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+import reptilecore
+
+
+KEYFRAME = 1
+DELTA = 2
+
+QUANTUM = 4  # Positions travel in 1/4 px steps
+LISTEN_BACKLOG = 1024  # Hundreds of viewers may connect at once
+
+STAT_FIELDS = ('seed', 'score', 'lives', 'level', 'food_eaten', 'power_up_timer',
+               'invulnerable_timer', 'state', 'events')
+_SEED, _LEVEL, _STATE = (STAT_FIELDS.index(name) for name in ('seed', 'level', 'state'))
+
+STATE_CODES = {name: code for code, name in enumerate(reptilecore.GAME_STATES)}
+FOOD_CODES = {name: code for code, name in enumerate(reptilecore.FOOD_TYPES)}
+
+_LENGTH = struct.Struct('<I')
+_HEAD = struct.Struct('<BI')
+_STATS = struct.Struct('<%dq' % len(STAT_FIELDS))
+_STAT = struct.Struct('<q')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_BODY = struct.Struct('<HB')
+_FOOD = struct.Struct('<Ihhb')
+_OBSTACLE = struct.Struct('<4h')
+
+
+def quantise(values):
+    """Pixel coordinates as int16 multiples of 1/QUANTUM px"""
+    return np.clip(np.rint(np.nan_to_num(values) * QUANTUM), -32768, 32767).astype('<i2')
+
+
+class CastState:
+    """What a viewer knows: positions quantised, food keyed by wire id"""
+    __slots__ = ('tick', 'stats', 'xs', 'ys', 'foods', 'obstacles')
+
+    def __init__(self, tick, stats, xs, ys, foods, obstacles):
+        self.tick = tick
+        self.stats = stats          # Tuple in STAT_FIELDS order
+        self.xs, self.ys = xs, ys   # int16 arrays, QUANTUM per px
+        self.foods = foods          # {id: (x, y, type code)}, x and y quantised
+        self.obstacles = obstacles  # Tuple of (x, y, width, height) in px
+
+    def stat(self, name):
+        return self.stats[STAT_FIELDS.index(name)]
+
+
+def _frame(parts):
+    body = b''.join(parts)
+    return _LENGTH.pack(len(body)) + body
+
+
+def encode_keyframe(state):
+    parts = [_HEAD.pack(KEYFRAME, state.tick), _STATS.pack(*state.stats),
+             _U16.pack(len(state.xs)), state.xs.tobytes(), state.ys.tobytes(),
+             _U16.pack(len(state.foods))]
+    parts += [_FOOD.pack(food_id, *food) for food_id, food in state.foods.items()]
+    parts.append(_U16.pack(len(state.obstacles)))
+    parts += [_OBSTACLE.pack(*obstacle) for obstacle in state.obstacles]
+    return _frame(parts)
+
+
+def encode_delta(prev, state):
+    """Frame taking ``prev`` to ``state``, or None if only a keyframe will do"""
+    n, m = len(state.xs), len(prev.xs)
+    if (n < m or state.obstacles != prev.obstacles
+            or state.stats[_SEED] != prev.stats[_SEED] or state.stats[_LEVEL] != prev.stats[_LEVEL]
+            or state.stats[_STATE] != prev.stats[_STATE]):
+        return None
+    mask = 0
+    changed = []
+    for i, (old, new) in enumerate(zip(prev.stats, state.stats)):
+        if old != new:
+            mask |= 1 << i
+            changed.append(_STAT.pack(new))
+
+    # New segments start on the old tail (Snake.add_segment)
+    base = np.arange(n).clip(max=m - 1)
+    dx = state.xs.astype(np.int32) - prev.xs[base]
+    dy = state.ys.astype(np.int32) - prev.ys[base]
+    reach = max(-min(dx.min(), dy.min()), max(dx.max(), dy.max())) if n else 0
+    if reach < 128:
+        width, dtype = 1, 'i1'
+    elif reach < 32768:
+        width, dtype = 2, '<i2'
+    else:
+        return None
+
+    removed = [food_id for food_id in prev.foods if food_id not in state.foods]
+    added = [(food_id, food) for food_id, food in state.foods.items() if food_id not in prev.foods]
+    parts = [_HEAD.pack(DELTA, state.tick), _U16.pack(mask), *changed,
+             _BODY.pack(n, width), dx.astype(dtype).tobytes(), dy.astype(dtype).tobytes(),
+             _U16.pack(len(removed))]
+    parts += [_U32.pack(food_id) for food_id in removed]
+    parts.append(_U16.pack(len(added)))
+    parts += [_FOOD.pack(food_id, *food) for food_id, food in added]
+    return _frame(parts)
+
+
+class StateEncoder:
+    """Turns a game into keyframes and deltas, tick by tick"""
+    def __init__(self, keyframe_interval=120):
+        self.keyframe_interval = keyframe_interval
+        self.state = None
+        self.since_keyframe = 0
+        self._food_ids = {}
+        self._next_food_id = 0
+
+    def capture(self, game):
+        stats = game.stats
+        n = game.snake.count
+        food_ids = {}
+        foods = {}
+        for food in game.food_list:
+            food_id = self._food_ids.get(food)
+            if food_id is None:
+                food_id = self._next_food_id
+                self._next_food_id = (food_id + 1) & 0xFFFFFFFF
+            food_ids[food] = food_id
+            foods[food_id] = (int(round(food.x * QUANTUM)), int(round(food.y * QUANTUM)),
+                              FOOD_CODES[food.type])
+        self._food_ids = food_ids
+        obstacles = tuple((o.x, o.y, o.width, o.height) for o in game.obstacles)
+        return CastState(game.ticks & 0xFFFFFFFF,
+                         (game.seed, stats.score, stats.lives, stats.level, stats.food_eaten,
+                          stats.power_up_timer, stats.invulnerable_timer, STATE_CODES[game.state],
+                          game.events),
+                         quantise(game.snake.xs[:n]), quantise(game.snake.ys[:n]), foods, obstacles)
+
+    def encode(self, game):
+        """(frame, is_keyframe) for the game's current state"""
+        state = self.capture(game)
+        frame = None
+        if self.state is not None and self.since_keyframe < self.keyframe_interval:
+            frame = encode_delta(self.state, state)
+        self.state = state
+        if frame is None:
+            self.since_keyframe = 1
+            return encode_keyframe(state), True
+        self.since_keyframe += 1
+        return frame, False
+
+    def keyframe(self):
+        """Keyframe of the state last encoded"""
+        return encode_keyframe(self.state)
+
+
+class StateDecoder:
+    """Viewer side: rebuilds a CastState from frame bodies"""
+    def __init__(self):
+        self.state = None
+
+    def apply(self, body):
+        """Apply one frame (without its length prefix); returns the new state"""
+        kind, tick = _HEAD.unpack_from(body)
+        offset = _HEAD.size
+        if kind == KEYFRAME:
+            stats = _STATS.unpack_from(body, offset)
+            offset += _STATS.size
+            n, = _U16.unpack_from(body, offset)
+            offset += 2
+            xs = np.frombuffer(body, '<i2', n, offset).copy()
+            ys = np.frombuffer(body, '<i2', n, offset + 2 * n).copy()
+            offset += 4 * n
+            foods, offset = self._read_foods(body, offset)
+            count, = _U16.unpack_from(body, offset)
+            obstacles = tuple(_OBSTACLE.iter_unpack(body[offset + 2:offset + 2 + count * _OBSTACLE.size]))
+            self.state = CastState(tick, stats, xs, ys, foods, obstacles)
+            return self.state
+
+        prev = self.state
+        if kind != DELTA or prev is None:
+            raise ValueError(f"Unexpected frame kind {kind}")
+        mask, = _U16.unpack_from(body, offset)
+        offset += 2
+        stats = list(prev.stats)
+        for i in range(len(STAT_FIELDS)):
+            if mask & (1 << i):
+                stats[i], = _STAT.unpack_from(body, offset)
+                offset += _STAT.size
+        n, width = _BODY.unpack_from(body, offset)
+        offset += _BODY.size
+        dtype = 'i1' if width == 1 else '<i2'
+        dx = np.frombuffer(body, dtype, n, offset)
+        dy = np.frombuffer(body, dtype, n, offset + width * n)
+        offset += 2 * width * n
+        base = np.arange(n).clip(max=len(prev.xs) - 1)
+        xs = (prev.xs[base] + dx).astype('<i2')
+        ys = (prev.ys[base] + dy).astype('<i2')
+
+        foods = dict(prev.foods)
+        count, = _U16.unpack_from(body, offset)
+        offset += 2
+        for food_id, in _U32.iter_unpack(body[offset:offset + 4 * count]):
+            del foods[food_id]
+        offset += 4 * count
+        added, offset = self._read_foods(body, offset)
+        foods.update(added)
+        self.state = CastState(tick, tuple(stats), xs, ys, foods, prev.obstacles)
+        return self.state
+
+    @staticmethod
+    def _read_foods(body, offset):
+        count, = _U16.unpack_from(body, offset)
+        offset += 2
+        end = offset + count * _FOOD.size
+        foods = {food_id: (x, y, food_type) for food_id, x, y, food_type in _FOOD.iter_unpack(body[offset:end])}
+        return foods, end
+
+
+class _Viewer:
+    __slots__ = ('writer', 'task', 'queue', 'waiting', 'busy', 'frames', 'resyncs')
+
+    def __init__(self, writer, backlog):
+        self.writer = writer
+        self.task = asyncio.current_task()
+        self.queue = asyncio.Queue(backlog)
+        self.waiting = True  # For a keyframe to start from
+        self.busy = False    # Between writing a frame and it draining
+        self.frames = 0
+        self.resyncs = 0
+
+
+class SpectatorServer:
+    """Broadcasts a game to TCP viewers; see the module docstring"""
+    def __init__(self, host='127.0.0.1', port=0, keyframe_interval=120, max_backlog=30,
+                 send_buffer=None):
+        self.host, self.port = host, port
+        self.encoder = StateEncoder(keyframe_interval)
+        self.max_backlog = max_backlog
+        self.send_buffer = send_buffer
+        self.viewers = set()
+        self.loop = None
+        self.server = None
+        self._thread = None
+        self._want_keyframe = False
+        self._latest = None  # Last state broadcast, for viewers that join
+        self.frames = self.keyframes = self.bytes = self.resyncs = 0
+
+    async def start_async(self):
+        """Start serving on the running event loop"""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._serve, self.host, self.port,
+                                                 backlog=LISTEN_BACKLOG)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    def start(self):
+        """Start serving on a loop in a background thread"""
+        started = threading.Event()
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.start_async())
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self._thread = threading.Thread(target=serve, name='reptilecast', daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def publish(self, game):
+        """Encode the game's new state and queue it for every viewer; safe
+        to call from any thread, and never blocks on viewers"""
+        frame, is_keyframe = self.encoder.encode(game)
+        keyframe = frame if is_keyframe else self.encoder.keyframe() if self._want_keyframe else None
+        self.loop.call_soon_threadsafe(self._broadcast, frame, keyframe, self.encoder.state)
+
+    def _broadcast(self, frame, keyframe, state):
+        self.frames += 1
+        self._latest = state
+        want_keyframe = False
+        for viewer in self.viewers:
+            if viewer.waiting:
+                if keyframe is not None and not viewer.busy and viewer.queue.empty():
+                    viewer.queue.put_nowait(keyframe)
+                    viewer.waiting = False
+                    self.keyframes += 1
+                    self.bytes += len(keyframe)
+                else:
+                    want_keyframe = True
+            elif viewer.queue.full():
+                # Too far behind: whatever is queued is stale, start again
+                while not viewer.queue.empty():
+                    viewer.queue.get_nowait()
+                viewer.waiting = True
+                viewer.resyncs += 1
+                self.resyncs += 1
+                want_keyframe = True
+            else:
+                viewer.queue.put_nowait(frame)
+                self.bytes += len(frame)
+        self._want_keyframe = want_keyframe
+
+    async def _serve(self, reader, writer):
+        if self.send_buffer:
+            sock = writer.get_extra_info('socket')
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        # Frames the kernel won't take yet wait in the viewer's bounded queue,
+        # not in the transport's own buffer, so drain() is the backpressure
+        writer.transport.set_write_buffer_limits(high=0)
+        viewer = _Viewer(writer, self.max_backlog)
+        self.viewers.add(viewer)
+        if self._latest is not None:
+            # Start from the latest state now rather than on the next tick,
+            # which may be a long way off while the game is paused
+            keyframe = encode_keyframe(self._latest)
+            viewer.queue.put_nowait(keyframe)
+            viewer.waiting = False
+            self.keyframes += 1
+            self.bytes += len(keyframe)
+        else:
+            self._want_keyframe = True
+        try:
+            while True:
+                frame = await viewer.queue.get()
+                if frame is None:
+                    break
+                viewer.busy = True
+                writer.write(frame)
+                await writer.drain()
+                viewer.busy = False
+                viewer.frames += 1
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            writer.close()
+
+    async def close(self):
+        """Stop accepting viewers and disconnect the ones there are"""
+        self.server.close()
+        viewers = list(self.viewers)
+        for viewer in viewers:
+            while not viewer.queue.empty():
+                viewer.queue.get_nowait()
+            viewer.queue.put_nowait(None)
+            if viewer.busy:
+                viewer.writer.transport.abort()  # Don't wait on a stalled viewer
+        await asyncio.gather(*(viewer.task for viewer in viewers), return_exceptions=True)
+        await self.server.wait_closed()
+
+    def stop(self):
+        """Stop a server started with ``start``"""
+        if self._thread:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self._thread = None
+
+
+async def watch(host, port, sock=None):
+    """Async iterator over the decoded state after every frame a server sends"""
+    if sock is None:
+        reader, writer = await asyncio.open_connection(host, port)
+    else:
+        reader, writer = await asyncio.open_connection(sock=sock)
+    decoder = StateDecoder()
+    try:
+        while True:
+            length, = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+            yield decoder.apply(await reader.readexactly(length))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return
+    finally:
+        writer.close()
+
+
+def _digest(state):
+    return hashlib.blake2b(encode_keyframe(state), digest_size=16).digest()
+
+
+async def load_test(viewers=200, slow=20, ticks=600, rate=60, seed=0):
+    """Serve a headless game to local stand-in viewers and check each one.
+
+    ``slow`` of the viewers stall now and then with a tiny receive buffer,
+    so they overflow and have to resync. Every frame any viewer decodes is
+    compared with what the server encoded for that tick.
+    """
+    import reptilebatch
+
+    server = await SpectatorServer(max_backlog=30, send_buffer=4096).start_async()
+    expected = {}
+    results = []
+
+    async def viewer(index):
+        sock = None
+        if index < slow:
+            sock = socket.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            sock.setblocking(False)
+            await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', server.port))
+        frames = mismatches = 0
+        last_tick = None
+        async for state in watch('127.0.0.1', server.port, sock):
+            frames += 1
+            mismatches += expected.get((state.stat('seed'), state.tick)) != _digest(state)
+            last_tick = state.tick
+            if index < slow and frames % 60 == 0:
+                await asyncio.sleep(1.5)
+        results.append((index < slow, frames, mismatches, last_tick))
+
+    tasks = [asyncio.ensure_future(viewer(i)) for i in range(viewers)]
+    while len(server.viewers) < viewers:
+        await asyncio.sleep(0.01)
+
+    game = reptilecore.Game(seed=seed)
+    publish_times = []
+    start = time.perf_counter()
+    for i in range(ticks):
+        game.tick(reptilebatch.greedy_controller(game))
+        if game.state != 'playing':
+            game.restart()
+        began = time.perf_counter()
+        server.publish(game)
+        publish_times.append(time.perf_counter() - began)
+        expected[game.seed, game.ticks & 0xFFFFFFFF] = _digest(server.encoder.state)
+        await asyncio.sleep(1 / rate if rate else 0)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(1.0)  # Let the slow ones catch up
+    await server.close()
+    await asyncio.gather(*tasks)
+
+    publish_times.sort()
+    return {
+        'ticks': ticks, 'elapsed': elapsed, 'frames': server.frames, 'keyframes': server.keyframes,
+        'bytes': server.bytes, 'resyncs': server.resyncs,
+        'publish_p50_us': publish_times[len(publish_times) // 2] * 1e6,
+        'publish_p99_us': publish_times[int(len(publish_times) * 0.99)] * 1e6,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake Adventure spectator streaming")
+    parser.add_argument('--watch', type=int, metavar='PORT', help="follow a game served on PORT")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--viewers', type=int, default=200, help="load test: stand-in viewers")
+    parser.add_argument('--slow', type=int, default=20, help="load test: how many of them stall")
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--rate', type=float, default=60, help="load test: ticks per second, 0 for flat out")
+    args = parser.parse_args(argv)
+
+    if args.watch:
+        async def follow():
+            async for state in watch(args.host, args.watch):
+                if state.tick % 60 == 0:
+                    print(f"tick {state.tick}: score {state.stat('score')}, level {state.stat('level')}, "
+                          f"lives {state.stat('lives')}, length {len(state.xs)}, food {len(state.foods)}")
+        try:
+            asyncio.run(follow())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    report = asyncio.run(load_test(args.viewers, args.slow, args.ticks, args.rate))
+    results = report['results']
+    fast = [r for r in results if not r[0]]
+    slow = [r for r in results if r[0]]
+    mismatches = sum(r[2] for r in results)
+    print(f"{args.viewers} viewers ({len(slow)} slow), {report['ticks']} ticks in {report['elapsed']:.2f} s; "
+          f"publish p50 {report['publish_p50_us']:.0f} us, p99 {report['publish_p99_us']:.0f} us", file=sys.stderr)
+    print(f"{report['bytes'] / max(1, report['frames']) / max(1, len(results)):.0f} bytes per viewer-tick, "
+          f"{report['keyframes']} keyframes sent, {report['resyncs']} resyncs", file=sys.stderr)
+    print(f"frames received: fast min {min((r[1] for r in fast), default=0)}, "
+          f"slow min {min((r[1] for r in slow), default=0)}; {mismatches} mismatched frames", file=sys.stderr)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1390 @@
+"""Headless simulation core for Snake Adventure.
+
+Everything in here is pure game logic: no pygame import, no window, no audio
+device. ``reptilesimu`` layers rendering and the interactive loop on top of
+these classes, while batch tools can drive ``Game.step`` directly.
+"""
+import math
+import random
+import json
+import struct
+from collections import namedtuple
+from concurrent.futures import wait
+from collections.abc import Sequence
+
+import numpy as np
+
+import reptilestore
+
+
+screen_width, screen_height = 1000, 700
+
+TICK_RATE = 60
+TICK_DT = 1.0 / TICK_RATE
+
+# Timers count simulation ticks, i.e. game time, never rendered frames
+POWER_UP_TICKS = 5 * TICK_RATE
+INVULNERABLE_TICKS = 3 * TICK_RATE
+
+# Default tuning (see Game.configure); the batched copies of the rules in
+# reptilevec and reptilearena read these too
+BASE_SPEED = 0.15  # Starting speed (very slow)
+SPEED_INCREMENT = 0.02  # Speed increase per food
+MAX_SPEED = 0.8  # Maximum speed cap
+SUPER_FOOD_CHANCE = 0.18
+POWER_FOOD_CHANCE = 0.08
+MAX_OBSTACLES = 10
+# Level layout constraints, in pixels
+HEAD_CLEARANCE = 120
+OBSTACLE_GAP = 30
+FOOD_OBSTACLE_MARGIN = 20
+FOOD_SPACING = 40
+
+# Bits of Game.events: what happened during the last tick
+EVENT_FOOD = 0x01
+EVENT_POWER_UP = 0x02
+EVENT_LEVEL_UP = 0x04
+EVENT_HIT_WALL = 0x08
+EVENT_HIT_OBSTACLE = 0x10
+EVENT_HIT_SELF = 0x20
+EVENT_LIFE_LOST = 0x40
+EVENT_GAME_OVER = 0x80
+
+
+class SimClock:
+    """Simulation clock counted in fixed ticks.
+
+    Anything time-dependent (wiggle, flashing, animation) reads ``get_ticks``
+    from here instead of the wall clock, so a run can go faster than real
+    time and replays bit-identically.
+    """
+    def __init__(self, ticks=0):
+        self.ticks = ticks
+
+    def advance(self, ticks=1):
+        self.ticks += ticks
+
+    def get_ticks(self):
+        """Elapsed simulation time in milliseconds (mirrors pygame.time.get_ticks)"""
+        return self.ticks * 1000 // TICK_RATE
+
+
+def make_rng_streams(seed):
+    """Independent RNG streams for level generation and cosmetic effects.
+
+    Effects draw from their own stream so rendering never perturbs the
+    sequence that decides where food and obstacles go.
+    """
+    return random.Random(f"{seed}:level"), random.Random(f"{seed}:fx")
+
+
+class Rect(namedtuple('Rect', 'x y width height')):
+    """Minimal integer rectangle with pygame.Rect collision semantics.
+
+    Being a plain 4-tuple it can be handed straight to pygame.draw.rect.
+    """
+    __slots__ = ()
+
+    def __new__(cls, x, y, width, height):
+        return super().__new__(cls, int(x), int(y), int(width), int(height))
+
+    def colliderect(self, other):
+        if self.width <= 0 or self.height <= 0 or other[2] <= 0 or other[3] <= 0:
+            return False
+        return (self.x < other[0] + other[2] and other[0] < self.x + self.width and
+                self.y < other[1] + other[3] and other[1] < self.y + self.height)
+
+    def collidepoint(self, x, y):
+        x, y = int(x), int(y)
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+
+def sweep_box(x0, y0, x1, y1, left, top, right, bottom):
+    """Fraction of the way from (x0, y0) to (x1, y1) at which a moving point
+    first lies inside the open box (left, right) x (top, bottom), or None if
+    it never does.
+
+    Sweeping a box of half-size h is the same test for its centre against
+    the target grown by h on every side (slab method, one pass per axis).
+    """
+    enter, leave = 0.0, 1.0
+    for start, delta, low, high in ((x0, x1 - x0, left, right), (y0, y1 - y0, top, bottom)):
+        if delta:
+            near = (low - start) / delta
+            far = (high - start) / delta
+            if near > far:
+                near, far = far, near
+            enter = max(enter, near)
+            leave = min(leave, far)
+        elif not low < start < high:
+            return None
+    return enter if enter < leave else None
+
+
+class SpatialHash:
+    """Uniform grid for broad-phase collision queries.
+
+    Each item is remembered in every cell its bounding box touches, so a
+    query only inspects the few cells under the query box instead of every
+    item. Query results come back in insertion order.
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+        self.order = {}
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def cell_range(self, x, y, width=0, height=0):
+        cs = self.cell_size
+        return [(cx, cy)
+                for cx in range(math.floor(x / cs), math.floor((x + width) / cs) + 1)
+                for cy in range(math.floor(y / cs), math.floor((y + height) / cs) + 1)]
+
+    def _place(self, item, cells):
+        self.item_cells[item] = cells
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(item)
+
+    def _unplace(self, item):
+        for cell in self.item_cells.pop(item, ()):
+            bucket = self.cells[cell]
+            bucket.discard(item)
+            if not bucket:
+                del self.cells[cell]
+
+    def insert(self, item, x, y, width=0, height=0):
+        self.order[item] = self._next_order
+        self._next_order += 1
+        self._place(item, self.cell_range(x, y, width, height))
+
+    def insert_points(self, items, cells):
+        """Bulk ``insert`` of point items whose (cx, cy) cells are known"""
+        start = self._next_order
+        self.order.update(zip(items, range(start, start + len(items))))
+        self._next_order += len(items)
+        item_cells, buckets = self.item_cells, self.cells
+        for item, cell in zip(items, cells):
+            item_cells[item] = [cell]
+            bucket = buckets.get(cell)
+            if bucket is None:
+                buckets[cell] = {item}
+            else:
+                bucket.add(item)
+
+    def move(self, item, x, y, width=0, height=0):
+        """Re-bucket an existing item, keeping its insertion order"""
+        self._unplace(item)
+        self._place(item, self.cell_range(x, y, width, height))
+
+    def remove(self, item):
+        self._unplace(item)
+        self.order.pop(item, None)
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+        self.order.clear()
+        self._next_order = 0
+
+    def query(self, x, y, width=0, height=0):
+        found = set()
+        for cell in self.cell_range(x, y, width, height):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found |= bucket
+        return sorted(found, key=self.order.__getitem__)
+
+
+class PlacementGrid:
+    """Occupancy grid over the playfield for rejection-free placement.
+
+    Cells are marked blocked conservatively: a cell stays free only if every
+    pixel in it satisfies all constraints so far, so any point of a free cell
+    is a valid position. Drawing one random free cell (or free window, for
+    rectangles) replaces retry loops with a single draw whose cost does not
+    depend on how crowded the level is.
+    """
+    def __init__(self, width=screen_width, height=screen_height, cell_size=20):
+        self.cell_size = cell_size
+        self.blocked = np.zeros((width // cell_size, height // cell_size), dtype=bool)
+        self.centers_x = (np.arange(self.blocked.shape[0]) + 0.5) * cell_size
+        self.centers_y = (np.arange(self.blocked.shape[1]) + 0.5) * cell_size
+
+    def _cells(self, start, stop, axis):
+        """Cell slice overlapping the pixel span [start, stop)"""
+        cs = self.cell_size
+        return slice(max(0, math.floor(start / cs)),
+                     max(0, min(self.blocked.shape[axis], math.ceil(stop / cs))))
+
+    def block_outside(self, left, top, right, bottom):
+        """Block every cell not entirely inside the box"""
+        cs = self.cell_size
+        self.blocked[:math.ceil(left / cs)] = True
+        self.blocked[right // cs:] = True
+        self.blocked[:, :math.ceil(top / cs)] = True
+        self.blocked[:, bottom // cs:] = True
+
+    def block_rect(self, x, y, width, height, margin=0):
+        self.blocked[self._cells(x - margin, x + width + margin, 0),
+                     self._cells(y - margin, y + height + margin, 1)] = True
+
+    def block_disk(self, x, y, radius):
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return
+        # Pad by half a cell diagonal so partially covered cells are blocked too
+        reach = radius + self.cell_size * 0.7072
+        cols = self._cells(x - reach, x + reach, 0)
+        rows = self._cells(y - reach, y + reach, 1)
+        dx = self.centers_x[cols, None] - x
+        dy = self.centers_y[None, rows] - y
+        self.blocked[cols, rows] |= dx * dx + dy * dy < reach * reach
+
+    def sample_point(self, rng, *others):
+        """Random integer point in a cell free here and in ``others``, or None"""
+        blocked = self.blocked
+        for other in others:
+            blocked = blocked | other.blocked
+        free = np.flatnonzero(~blocked)
+        if not len(free):
+            return None
+        cell_x, cell_y = divmod(int(free[rng.randrange(len(free))]), blocked.shape[1])
+        cs = self.cell_size
+        return cell_x * cs + rng.randrange(cs), cell_y * cs + rng.randrange(cs)
+
+    def sample_rect(self, rng, width, height):
+        """Random top-left corner for a free width x height rectangle, or None"""
+        cs = self.cell_size
+        # Windows are one cell wider than the rectangle to absorb the jitter
+        span_x, span_y = width // cs + 2, height // cs + 2
+        table = np.zeros((self.blocked.shape[0] + 1, self.blocked.shape[1] + 1), dtype=np.int32)
+        table[1:, 1:] = self.blocked.cumsum(0).cumsum(1)
+        counts = (table[span_x:, span_y:] - table[:-span_x, span_y:]
+                  - table[span_x:, :-span_y] + table[:-span_x, :-span_y])
+        free = np.flatnonzero(counts == 0)
+        if not len(free):
+            return None
+        cell_x, cell_y = divmod(int(free[rng.randrange(len(free))]), counts.shape[1])
+        return cell_x * cs + rng.randrange(cs), cell_y * cs + rng.randrange(cs)
+
+
+class GameStats:
+    """Score, lives and tuning for one game.
+
+    With ``persist`` the high score is loaded and saved through a
+    ``reptilestore.ScoreStore`` in the background. ``high_score`` leaves the
+    stored value out until the load finishes (``high_score_loaded``), so
+    displays hold it back until then; only game over, which compares against
+    it, waits for the load, through ``wait_for_high_score``.
+    """
+    def __init__(self, persist=True, store=None):
+        self.persist = persist
+        self.store = store or (reptilestore.default_store() if persist else None)
+        self.reset()
+        self._high_score = 0
+        self._high_score_loading = None
+        self.load_high_score()
+
+    def reset(self):
+        """Back to the start of a game; the high score is kept"""
+        self.score = 0
+        self.level = 1
+        self.food_eaten = 0
+        self.lives = 3
+        self.power_up_timer = 0
+        self.invulnerable_timer = 0
+        self.base_speed = BASE_SPEED
+        self.speed_increment = SPEED_INCREMENT
+        self.max_speed = MAX_SPEED
+
+    def get_current_speed(self):
+        """Calculate current speed based on food eaten"""
+        current_speed = self.base_speed + (self.food_eaten * self.speed_increment)
+        return min(current_speed, self.max_speed)
+
+    @property
+    def high_score(self):
+        loading = self._high_score_loading
+        if loading is not None and loading.done():
+            self._high_score_loading = None
+            if loading.exception() is None:
+                self._high_score = max(self._high_score, loading.result())
+        return self._high_score
+
+    @high_score.setter
+    def high_score(self, value):
+        self._high_score = value
+        self._high_score_loading = None
+
+    @property
+    def high_score_loaded(self):
+        """Whether ``high_score`` includes the stored value yet"""
+        self.high_score  # Folds in a load that has just finished
+        return self._high_score_loading is None
+
+    def wait_for_high_score(self, timeout=None):
+        """``high_score`` once the stored value is in, waiting at most
+        ``timeout`` seconds for it"""
+        if self._high_score_loading is not None:
+            wait([self._high_score_loading], timeout)
+        return self.high_score
+
+    def load_high_score(self):
+        """Start (re)loading the stored high score in the background"""
+        if self.store:
+            self._high_score_loading = self.store.load_high_score()
+
+    def save_high_score(self):
+        if self.store:
+            self.store.save_high_score(self.high_score)
+
+    def record_session(self, **details):
+        """Log a finished game (plus ``details``) to the session log and leaderboard"""
+        if self.store:
+            self.store.record_session(score=self.score, level=self.level,
+                                      food_eaten=self.food_eaten, **details)
+
+
+class Food:
+    def __init__(self, x=None, y=None, food_type='normal', rng=random):
+        self.x = x or rng.randint(50, screen_width - 50)
+        self.y = y or rng.randint(50, screen_height - 50)
+        self.type = food_type
+        self.size = 12 if food_type == 'normal' else 18
+        self.points = 10 if food_type == 'normal' else 50
+        self.growth = 1 if food_type == 'normal' else 3
+        self.pulse = 0
+        self.collected = False
+        self.sparkle_timer = 0
+
+    def update(self):
+        self.pulse += 0.2
+        self.sparkle_timer += 1
+
+
+class Obstacle:
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.rect = Rect(x, y, width, height)
+
+
+class Segment:
+    """Read/write view of one body segment stored in a Snake's arrays.
+
+    Segments no longer own their coordinates; they are cheap handles created
+    on demand by ``Snake.segments`` so per-segment drawing code keeps working.
+    """
+    __slots__ = ('snake', 'index')
+
+    def __init__(self, snake, index):
+        self.snake = snake
+        self.index = index
+
+    @property
+    def x(self):
+        return float(self.snake.xs[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.snake.xs[self.index] = value
+
+    @property
+    def y(self):
+        return float(self.snake.ys[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.snake.ys[self.index] = value
+
+    @property
+    def angle(self):
+        return float(self.snake.angles[self.index])
+
+    @angle.setter
+    def angle(self, value):
+        self.snake.angles[self.index] = value
+
+    @property
+    def length(self):
+        return self.snake.segment_length
+
+    @property
+    def total_segments(self):
+        return self.snake.count
+
+    def get_thickness(self):
+        if self.index == 0:  # Head
+            return 32
+        else:
+            progress = self.index / max(1, self.total_segments - 1)
+            return int(26 * (1 - progress * 0.6) + 8)
+
+    def get_end(self):
+        return (
+            self.x + math.cos(self.angle) * self.length,
+            self.y + math.sin(self.angle) * self.length
+        )
+
+    def get_rect(self):
+        thickness = self.get_thickness()
+        return Rect(self.x - thickness // 2, self.y - thickness // 2, thickness, thickness)
+
+
+class SegmentList(Sequence):
+    """Sequence of Segment views over a snake's body arrays"""
+    __slots__ = ('snake',)
+
+    def __init__(self, snake):
+        self.snake = snake
+
+    def __len__(self):
+        return self.snake.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.snake.count))]
+        if index < 0:
+            index += self.snake.count
+        if not 0 <= index < self.snake.count:
+            raise IndexError("segment index out of range")
+        return self.snake.segment_class(self.snake, index)
+
+
+# Fast-math wiggle: sin() from a table of WIGGLE_TABLE_SIZE samples per turn,
+# linearly interpolated. The interpolation error is at most h^2 / 8 * max|sin''|
+# for step h = 2 pi / size, i.e. pi^2 / (2 size^2) per unit of amplitude.
+WIGGLE_TABLE_SIZE = 1 << 12
+WIGGLE_TABLE = np.sin(np.arange(WIGGLE_TABLE_SIZE + 1) * (2 * math.pi / WIGGLE_TABLE_SIZE))
+WIGGLE_SLOPES = np.diff(WIGGLE_TABLE)
+WIGGLE_TABLE_ERROR = math.pi ** 2 / (2 * WIGGLE_TABLE_SIZE ** 2)
+
+
+def table_sin(phase):
+    """sin() of a phase (or array of phases) via WIGGLE_TABLE"""
+    position = np.asarray(phase) * (WIGGLE_TABLE_SIZE / (2 * math.pi))
+    index = np.floor(position)
+    fraction = position - index
+    index = index.astype(np.int64) & (WIGGLE_TABLE_SIZE - 1)
+    return WIGGLE_TABLE[index] + fraction * WIGGLE_SLOPES[index]
+
+
+class Snake:
+    """Snake body stored as a structure of arrays (x, y, angle).
+
+    Arrays are over-allocated and grown by doubling, so adding segments is
+    amortised O(1). Only the first ``count`` entries are live. Segment
+    centres are also kept in ``body_index``, a SpatialHash that is updated
+    only for segments that crossed into a different cell this tick.
+
+    Up to ``scalar_segments`` long (the game's usual size), the wiggle and the
+    index refresh run on plain floats instead: NumPy's fixed per-call cost
+    would outweigh the work. Both paths give bit-identical bodies.
+
+    With ``fast_math`` set, the follow chain works on unit vectors taken
+    straight from dx/dy instead of atan2 followed by cos/sin, the stored
+    angles are computed afterwards in one vectorized arctan2, and the wiggle
+    comes from ``table_sin``. Directions match the exact path to rounding;
+    the wiggle differs by at most ``WIGGLE_TABLE_ERROR`` times its amplitude.
+    """
+    segment_class = Segment
+    body_cell_size = 64
+    scalar_segments = 32
+    fast_math = False
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.num_segments = 8
+        self.segment_length = 18
+        start_x = screen_width // 2
+        start_y = screen_height // 2
+        self.set_body(np.full(self.num_segments, float(start_x)),
+                      np.full(self.num_segments, float(start_y)),
+                      np.zeros(self.num_segments))
+        self.target_x, self.target_y = start_x, start_y
+        self.moving = False
+        self.speed_boost = 1.0
+
+    def set_body(self, xs, ys, angles):
+        """Replace the whole body with the given coordinate arrays"""
+        n = len(xs)
+        capacity = max(32, 1 << (n - 1).bit_length())
+        self.count = n
+        self.xs = np.zeros(capacity)
+        self.ys = np.zeros(capacity)
+        self.angles = np.zeros(capacity)
+        self.xs[:n] = xs
+        self.ys[:n] = ys
+        self.angles[:n] = angles
+        self._thickness = None
+        self.previous = None  # A jump, not a move: nothing to interpolate from
+
+        self.body_index = SpatialHash(self.body_cell_size)
+        self._cell_x = np.zeros(capacity, dtype=np.int64)
+        self._cell_y = np.zeros(capacity, dtype=np.int64)
+        with np.errstate(invalid='ignore'):
+            finite = np.isfinite(self.xs[:n]) & np.isfinite(self.ys[:n])
+            self._cell_x[:n] = np.where(finite, np.floor(self.xs[:n] / self.body_cell_size), 0)
+            self._cell_y[:n] = np.where(finite, np.floor(self.ys[:n] / self.body_cell_size), 0)
+        self.body_index.insert_points(range(n), zip(self._cell_x[:n].tolist(), self._cell_y[:n].tolist()))
+
+    @property
+    def segments(self):
+        return SegmentList(self)
+
+    def interpolated(self, alpha):
+        """Body (xs, ys, angles) ``alpha`` of the way from the previous tick
+        to the current one; segments added since then are not interpolated"""
+        n = self.count
+        xs, ys, angles = self.xs[:n], self.ys[:n], self.angles[:n]
+        if self.previous is None or alpha >= 1:
+            return xs, ys, angles
+        prev_xs, prev_ys, prev_angles = self.previous
+        m = min(n, len(prev_xs))
+        xs, ys, angles = xs.copy(), ys.copy(), angles.copy()
+        xs[:m] = prev_xs[:m] + (xs[:m] - prev_xs[:m]) * alpha
+        ys[:m] = prev_ys[:m] + (ys[:m] - prev_ys[:m]) * alpha
+        turn = (angles[:m] - prev_angles[:m] + math.pi) % (2 * math.pi) - math.pi
+        angles[:m] = prev_angles[:m] + turn * alpha
+        return xs, ys, angles
+
+    def _reserve(self, capacity):
+        if capacity <= len(self.xs):
+            return
+        new_capacity = max(capacity, 2 * len(self.xs))
+        for name in ('xs', 'ys', 'angles', '_cell_x', '_cell_y'):
+            old = getattr(self, name)
+            grown = np.zeros(new_capacity, dtype=old.dtype)
+            grown[:self.count] = old[:self.count]
+            setattr(self, name, grown)
+
+    def add_segment(self, count=1):
+        n = self.count
+        self._reserve(n + count)
+        # New segments start stacked on the current tail, facing angle 0
+        self.xs[n:n + count] = self.xs[n - 1]
+        self.ys[n:n + count] = self.ys[n - 1]
+        self.angles[n:n + count] = 0.0
+        # ...and in the tail's grid cell
+        tail_cell_x, tail_cell_y = int(self._cell_x[n - 1]), int(self._cell_y[n - 1])
+        self._cell_x[n:n + count] = tail_cell_x
+        self._cell_y[n:n + count] = tail_cell_y
+        for i in range(n, n + count):
+            self.body_index.insert(i, tail_cell_x * self.body_cell_size, tail_cell_y * self.body_cell_size)
+        self.count = n + count
+        self._thickness = None
+
+    def thickness(self):
+        """Per-segment thickness array, recomputed only when the length changes"""
+        if self._thickness is None or len(self._thickness) != self.count:
+            n = self.count
+            progress = np.arange(n) / max(1, n - 1)
+            thickness = (26 * (1 - progress * 0.6) + 8).astype(np.int64)
+            thickness[0] = 32  # Head
+            self._thickness = thickness
+        return self._thickness
+
+    def update(self, target_x, target_y, base_speed, now=0):
+        self.target_x, self.target_y = target_x, target_y
+        n = self.count
+        self.previous = (self.xs[:n].copy(), self.ys[:n].copy(), self.angles[:n].copy())
+
+        dist = math.hypot(target_x - self.xs[0], target_y - self.ys[0])
+        self.moving = dist > 15
+
+        # Apply the gradual speed system
+        current_speed = base_speed * self.speed_boost
+
+        # Wiggle offsets for the whole body in one pass; the head wiggles less
+        if not self.moving:
+            wiggle = [0] * n
+        elif n <= self.scalar_segments and not self.fast_math:
+            phase, amplitude, sin = now * 0.02, 12 * current_speed, math.sin
+            wiggle = [sin(phase + i * 0.4) * amplitude for i in range(n)]
+            wiggle[0] = sin(phase) * (5 * current_speed)
+        else:
+            if self.fast_math:
+                wiggle = table_sin(now * 0.02 + np.arange(n) * 0.4) * (12 * current_speed)
+                wiggle[0] = table_sin(now * 0.02) * (5 * current_speed)
+            else:
+                wiggle = np.sin(now * 0.02 + np.arange(n) * 0.4) * (12 * current_speed)
+                wiggle[0] = math.sin(now * 0.02) * (5 * current_speed)
+            wiggle = wiggle.tolist()
+
+        if self.fast_math:
+            self._follow_fast(target_x, target_y, current_speed, wiggle)
+            return
+
+        # Each segment chases its parent's *updated* position, so the chain is
+        # solved head to tail in a tight loop over plain floats.
+        xs = self.xs[:n].tolist()
+        ys = self.ys[:n].tolist()
+        angles = [0.0] * n
+        length = self.segment_length
+        atan2, cos, sin, half_pi = math.atan2, math.cos, math.sin, math.pi / 2
+        tx, ty = target_x, target_y
+        for i in range(n):
+            x = xs[i]
+            y = ys[i]
+            angle = atan2(ty - y, tx - x)
+            w = wiggle[i]
+            target_seg_x = tx - cos(angle) * length + cos(angle + half_pi) * w
+            target_seg_y = ty - sin(angle) * length + sin(angle + half_pi) * w
+            tx = x + (target_seg_x - x) * current_speed
+            ty = y + (target_seg_y - y) * current_speed
+            xs[i] = tx
+            ys[i] = ty
+            angles[i] = angle
+
+        self.xs[:n] = xs
+        self.ys[:n] = ys
+        self.angles[:n] = angles
+        self._update_body_index()
+
+    def _follow_fast(self, target_x, target_y, current_speed, wiggle):
+        """The follow chain of ``update`` without the angle round-trip. With
+        d = (dx, dy) towards the parent, (cos a, sin a) = d / |d| and
+        (cos, sin)(a + pi/2) = (-sin a, cos a), so each step is a few
+        multiplies by 1 / |d|; atan2 is scale-free, so the angles come out
+        of one vectorized arctan2 over the raw (dx, dy)."""
+        n = self.count
+        xs = self.xs[:n].tolist()
+        ys = self.ys[:n].tolist()
+        dxs = [0.0] * n
+        dys = [0.0] * n
+        reach = self.segment_length * current_speed
+        hypot = math.hypot
+        tx, ty = target_x, target_y
+        for i in range(n):
+            x = xs[i]
+            y = ys[i]
+            dx = tx - x
+            dy = ty - y
+            d = hypot(dx, dy)
+            if d:
+                along = current_speed - reach / d
+                across = wiggle[i] * current_speed / d
+                tx = x + dx * along - dy * across
+                ty = y + dy * along + dx * across
+            else:  # Stacked on the parent: atan2(0, 0) == 0
+                tx = x - reach
+                ty = y + wiggle[i] * current_speed
+            xs[i] = tx
+            ys[i] = ty
+            dxs[i] = dx
+            dys[i] = dy
+
+        self.xs[:n] = xs
+        self.ys[:n] = ys
+        self.angles[:n] = np.arctan2(dys, dxs)
+        self._update_body_index()
+
+    def _update_body_index(self):
+        n = self.count
+        if n <= self.scalar_segments:
+            self._update_body_index_scalar()
+            return
+        xs, ys = self.xs[:n], self.ys[:n]
+        with np.errstate(invalid='ignore'):
+            cell_x = np.floor(xs / self.body_cell_size).astype(np.int64)
+            cell_y = np.floor(ys / self.body_cell_size).astype(np.int64)
+        moved = (cell_x != self._cell_x[:n]) | (cell_y != self._cell_y[:n])
+        moved &= np.isfinite(xs) & np.isfinite(ys)
+        changed = np.flatnonzero(moved)
+        for i in changed.tolist():
+            self.body_index.move(i, xs[i], ys[i])
+        self._cell_x[changed] = cell_x[changed]
+        self._cell_y[changed] = cell_y[changed]
+
+    def _update_body_index_scalar(self):
+        n = self.count
+        size, floor = self.body_cell_size, math.floor
+        cells_x, cells_y = self._cell_x, self._cell_y
+        for i, x, y, old_x, old_y in zip(range(n), self.xs[:n].tolist(), self.ys[:n].tolist(),
+                                         cells_x[:n].tolist(), cells_y[:n].tolist()):
+            try:
+                cell_x, cell_y = floor(x / size), floor(y / size)
+            except (ValueError, OverflowError):  # NaN or inf stays where it was
+                continue
+            if cell_x != old_x or cell_y != old_y:
+                self.body_index.move(i, x, y)
+                cells_x[i] = cell_x
+                cells_y[i] = cell_y
+
+    def head_path(self):
+        """(x0, y0, x1, y1): where the head started and ended its last move"""
+        x1, y1 = float(self.xs[0]), float(self.ys[0])
+        if self.previous is None:
+            return x1, y1, x1, y1
+        return float(self.previous[0][0]), float(self.previous[1][0]), x1, y1
+
+    @staticmethod
+    def _path_rect(path, half):
+        """Box around everything a head box of half-size ``half`` swept over"""
+        x0, y0, x1, y1 = path
+        return (min(x0, x1) - half - 1, min(y0, y1) - half - 1,
+                abs(x1 - x0) + 2 * half + 2, abs(y1 - y0) + 2 * half + 2)
+
+    @staticmethod
+    def _swept_hit(path, head_rect, rect):
+        """Fraction of ``path`` at which ``head_rect`` (the head box at the
+        end of it) first touches ``rect``, or None. The end position gets the
+        usual Rect test; on the way there the box is swept, inset by a pixel
+        so the sweep never accepts a spot the truncating Rect test rejects."""
+        half = head_rect.width // 2
+        x, y, width, height = rect
+        t = sweep_box(*path, x - half + 1, y - half + 1, x + width + half, y + height + half)
+        if t is None and head_rect.colliderect(rect):
+            return 1.0
+        return t
+
+    def check_food_collision(self, food_list):
+        """Reference linear scan of the end position only; the game uses
+        the swept check_food_collision_indexed"""
+        head = self.segments[0]
+        head_rect = Rect(head.x - 22, head.y - 22, 44, 44)
+
+        for food in food_list:
+            food_rect = Rect(food.x - food.size, food.y - food.size,
+                             food.size * 2, food.size * 2)
+            if head_rect.colliderect(food_rect):
+                return food
+        return None
+
+    def check_obstacle_collision(self, obstacles):
+        """Reference linear scan of the end position only; the game uses
+        the swept check_obstacle_collision_indexed"""
+        head = self.segments[0]
+        head_rect = Rect(head.x - 18, head.y - 18, 36, 36)
+
+        for obstacle in obstacles:
+            if head_rect.colliderect(obstacle.rect):
+                return True
+        return False
+
+    def check_wall_collision(self):
+        """Head outside the playfield margin. The field is convex, so a
+        straight move that starts and ends inside it stays inside: testing
+        the end position is already exact for the whole move."""
+        head = self.segments[0]
+        margin = 25
+        return (head.x < margin or head.x > screen_width - margin or
+                head.y < margin or head.y > screen_height - margin)
+
+    def check_self_collision(self):
+        """Reference linear scan of the end position only; the game uses
+        the swept check_self_collision_indexed"""
+        if len(self.segments) < 6:
+            return False
+
+        head = self.segments[0]
+        head_rect = Rect(head.x - 18, head.y - 18, 36, 36)
+
+        for seg in self.segments[5:]:  # Skip first few segments
+            seg_rect = seg.get_rect()
+            if head_rect.colliderect(seg_rect):
+                return True
+        return False
+
+    # The indexed checks sweep the head box along head_path, so a head that
+    # moves further than a food or a thin rock is wide in one tick still
+    # hits it; for short moves they agree with the end-position scans.
+
+    def check_food_collision_indexed(self, food_index):
+        """Every food the head touched on its last move, in the order it
+        reached them"""
+        path = self.head_path()
+        head_rect = Rect(path[2] - 22, path[3] - 22, 44, 44)
+
+        hits = []
+        for food in food_index.query(*self._path_rect(path, 22)):
+            food_rect = Rect(food.x - food.size, food.y - food.size,
+                             food.size * 2, food.size * 2)
+            t = self._swept_hit(path, head_rect, food_rect)
+            if t is not None:
+                hits.append((t, food))
+        hits.sort(key=lambda hit: hit[0])  # Stable, so ties keep insertion order
+        return [food for _, food in hits]
+
+    def check_obstacle_collision_indexed(self, obstacle_index):
+        path = self.head_path()
+        head_rect = Rect(path[2] - 18, path[3] - 18, 36, 36)
+
+        for obstacle in obstacle_index.query(*self._path_rect(path, 18)):
+            if self._swept_hit(path, head_rect, obstacle.rect) is not None:
+                return True
+        return False
+
+    def check_self_collision_indexed(self):
+        """Head against the body from the sixth segment on, as it stands at
+        the end of the tick"""
+        if self.count < 6:
+            return False
+
+        path = self.head_path()
+        head_rect = Rect(path[2] - 18, path[3] - 18, 36, 36)
+        thickness = self.thickness()
+
+        # Body rects are at most 34px wide, so any hit has its centre within
+        # half that of the swept head box.
+        for i in self.body_index.query(*self._path_rect(path, 36)):
+            if i < 5:  # Skip first few segments
+                continue
+            t = int(thickness[i])
+            if self._swept_hit(path, head_rect, Rect(self.xs[i] - t // 2, self.ys[i] - t // 2, t, t)) is not None:
+                return True
+        return False
+
+
+class ParticleSystem:
+    """Fixed-capacity pool of short-lived particles in parallel arrays.
+
+    Slots come from a free-list stack and go back to it when a particle
+    expires, so neither ``emit`` nor ``update`` allocates per particle; both
+    are a handful of whole-array operations over the slots below
+    ``high_water``. Particles are cosmetic: they never affect the simulation
+    and are not part of snapshots.
+    """
+    def __init__(self, capacity=8192, gravity=0.06, drag=0.95, seed=None):
+        self.capacity = capacity
+        self.gravity = gravity
+        self.drag = drag
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)  # Ticks left
+        self.max_life = np.ones(capacity, dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int64)
+        self.clear()
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.alive[:] = False
+        # Top of the stack is the end, so the lowest slots are reused first
+        self.free[:] = np.arange(self.capacity - 1, -1, -1)
+        self.free_count = self.capacity
+        self.count = 0
+        self.high_water = 0
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def emit(self, x, y, count, color, speed=3.0, life=40, size=3.0,
+             direction=0.0, spread=math.tau):
+        """Spawn up to ``count`` particles at (x, y), fanned around ``direction``.
+
+        Speeds and lifetimes are jittered per particle. When the pool is full
+        the burst is silently truncated.
+        """
+        n = min(count, self.free_count)
+        if n <= 0:
+            return
+        slots = self.free[self.free_count - n:self.free_count].copy()
+        self.free_count -= n
+        rng = self.rng
+        angle = direction + (rng.random(n) - 0.5) * spread
+        velocity = speed * (0.3 + 0.7 * rng.random(n))
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vx[slots] = np.cos(angle) * velocity
+        self.vy[slots] = np.sin(angle) * velocity
+        self.life[slots] = self.max_life[slots] = life * (0.6 + 0.4 * rng.random(n))
+        self.size[slots] = size
+        self.color[slots] = color
+        self.alive[slots] = True
+        self.count += n
+        self.high_water = max(self.high_water, int(slots.max()) + 1)
+
+    def update(self):
+        """Advance every live particle by one tick and recycle expired ones"""
+        if not self.count:
+            return
+        hw = self.high_water
+        vx, vy = self.vx[:hw], self.vy[:hw]
+        vy += self.gravity
+        vx *= self.drag
+        vy *= self.drag
+        self.x[:hw] += vx
+        self.y[:hw] += vy
+        life = self.life[:hw]
+        life -= 1
+        expired = np.flatnonzero(self.alive[:hw] & (life <= 0))
+        if len(expired):
+            self.alive[expired] = False
+            self.count -= len(expired)
+            if not self.count:
+                self.clear()
+            else:
+                self.free[self.free_count:self.free_count + len(expired)] = expired
+                self.free_count += len(expired)
+
+    def live(self):
+        """Slot indices of the live particles"""
+        return np.flatnonzero(self.alive[:self.high_water])
+
+
+# Particle colours per effect (and per food type for pickups)
+PARTICLE_COLORS = {
+    'normal': (255, 100, 100),
+    'super': (255, 225, 90),
+    'power': (190, 100, 255),
+    'damage': (255, 70, 30),
+    'level_up': (255, 240, 150),
+}
+
+
+GAME_STATES = ("menu", "playing", "paused", "game_over")
+FOOD_TYPES = ('normal', 'super', 'power')
+
+# Binary snapshot layout (Game.snapshot): a fixed header, both Mersenne
+# Twister states, then the snake body, food and obstacles as raw arrays and
+# a short JSON tail for the seed and config.
+SNAPSHOT_MAGIC = b'RSNP'
+SNAPSHOT_VERSION = 1
+_STATS_INT_FIELDS = ('score', 'level', 'food_eaten', 'high_score', 'lives',
+                     'power_up_timer', 'invulnerable_timer')
+_STATS_FLOAT_FIELDS = ('base_speed', 'speed_increment', 'max_speed')
+_SNAPSHOT_HEADER = struct.Struct('<4sHBqqd7q3d3d?2d4I')
+_MT_STATE_SIZE = 625
+FOOD_DTYPE = np.dtype([('x', '<i8'), ('y', '<i8'), ('type', 'u1'), ('size', '<i4'),
+                       ('points', '<i4'), ('growth', '<i4'), ('pulse', '<f8'),
+                       ('sparkle_timer', '<i8')])
+
+
+def _gauss_to_float(value):
+    return math.nan if value is None else value
+
+
+def _float_to_gauss(value):
+    return None if math.isnan(value) else value
+
+
+def layout_level(rng, level, head_x, head_y, params):
+    """Obstacle rects and (x, y, type) food for ``level``, drawn from ``rng``.
+
+    ``params`` supplies the tuning attributes (max_obstacles, the layout
+    margins and the special food chances); it is normally the Game itself.
+    """
+    # Obstacles first, so food can be kept clear of this level's rocks
+    obstacle_space = PlacementGrid()
+    obstacle_space.block_outside(60, 60, screen_width - 60, screen_height - 60)
+    obstacle_space.block_disk(head_x, head_y, params.head_clearance)
+    obstacles = []
+    for _ in range(min(level - 1, params.max_obstacles)):
+        width = rng.randint(70, 140)
+        height = rng.randint(40, 90)
+        position = obstacle_space.sample_rect(rng, width, height)
+        if position is None:
+            continue  # No room left for a rock this size
+        obstacles.append((position[0], position[1], width, height))
+        obstacle_space.block_rect(position[0], position[1], width, height, margin=params.obstacle_gap)
+
+    food_space = PlacementGrid()
+    food_space.block_outside(50, 50, screen_width - 50, screen_height - 50)
+    food_space.block_disk(head_x, head_y, params.head_clearance)
+    for rect in obstacles:
+        food_space.block_rect(*rect, margin=params.food_obstacle_margin)
+    # Soft constraint: keep food apart while there is room, then allow crowding
+    spacing = PlacementGrid()
+
+    foods = []
+    for _ in range(6 + level):
+        position = food_space.sample_point(rng, spacing) or food_space.sample_point(rng)
+        if position is None:
+            break
+        spacing.block_disk(position[0], position[1], params.food_spacing)
+
+        # Chance for special food
+        food_type = 'normal'
+        if rng.random() < params.super_food_chance:
+            food_type = 'super'
+        elif rng.random() < params.power_food_chance:
+            food_type = 'power'
+        foods.append((position[0], position[1], food_type))
+    return obstacles, foods
+
+
+class Game:
+    """Pure-logic game state advanced by ``tick`` / ``step``.
+
+    Subclasses swap in renderable entities through the ``*_class`` hooks.
+    ``config`` overrides tuning parameters (see ``configure``) before the
+    first level is generated.
+    """
+    snake_class = Snake
+    food_class = Food
+    obstacle_class = Obstacle
+
+    super_food_chance = SUPER_FOOD_CHANCE
+    power_food_chance = POWER_FOOD_CHANCE
+    max_obstacles = MAX_OBSTACLES
+    particle_capacity = 8192
+
+    # Level layout constraints, in pixels
+    head_clearance = HEAD_CLEARANCE
+    obstacle_gap = OBSTACLE_GAP
+    food_obstacle_margin = FOOD_OBSTACLE_MARGIN
+    food_spacing = FOOD_SPACING
+
+    # Optional reptileprofile.FrameProfiler; deliberately not reset by __init__
+    profiler = None
+    # Optional reptiletelemetry.TelemetryWriter, fed once per tick; same deal
+    telemetry = None
+    # Optional reptilecast.SpectatorServer, published to once per tick and on
+    # every change of state; same deal
+    spectators = None
+
+    def __init__(self, state="playing", persist=False, seed=None, clock=None, config=None):
+        self.state = state  # menu, playing, paused, game_over
+        self.clock = clock or SimClock()
+        self.stats = GameStats(persist)
+        self._allocate()
+        self.new_game(seed, config)
+
+    def _allocate(self):
+        self.snake = self.snake_class()
+        self.food_list = []
+        self.obstacles = []
+        self.food_index = SpatialHash(64)
+        self.obstacle_index = SpatialHash(128)
+        self.particles = ParticleSystem(self.particle_capacity)
+
+    def new_game(self, seed=None, config=None):
+        """Reset to the first level of a fresh game.
+
+        Reuses the existing stats, snake and indexes, and keeps the high
+        score already loaded, so nothing is read from disk.
+        """
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng, self.fx_rng = make_rng_streams(self.seed)
+        self.stats.reset()
+        self.config = dict(config or {})
+        self.configure(**self.config)
+        self.snake.reset()
+        self.particles.clear()
+        self.particles.seed(self.fx_rng.getrandbits(64))
+        self.ticks = 0
+        self.accumulator = 0.0
+        self.events = 0
+        self.generate_level()
+
+    def restart(self):
+        """Start a new game in place, keeping the configuration.
+
+        The new seed is drawn from the current level RNG, so restarts are as
+        reproducible as the game that preceded them.
+        """
+        self.clock.ticks = 0
+        self.new_game(self.rng.getrandbits(32), self.config)
+        self.state = "playing"
+
+    def handle_input(self, action):
+        """Apply a player action: "escape", "pause", "restart" or "click" """
+        state = self.state
+        if action == "escape":
+            if self.state == "playing":
+                self.state = "paused" if self.state != "paused" else "playing"
+            else:
+                self.state = "menu"
+
+        elif action == "restart" and self.state == "game_over":
+            self.restart()
+
+        elif action == "pause" and self.state == "playing":
+            self.state = "paused"
+
+        elif action == "click":
+            if self.state == "menu":
+                self.state = "playing"
+            elif self.state == "paused":
+                self.state = "playing"
+
+        # No tick runs outside "playing", so tell spectators about the change here
+        if self.spectators and self.state != state:
+            self.spectators.publish(self)
+
+    def snapshot(self):
+        """Complete simulation state as compact bytes (see ``restore``)"""
+        snake, stats = self.snake, self.stats
+        n = snake.count
+        rng_state, fx_state = self.rng.getstate(), self.fx_rng.getstate()
+        extra = json.dumps({'seed': self.seed, 'config': self.config}).encode()
+        header = _SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, GAME_STATES.index(self.state),
+            self.ticks, self.clock.ticks, self.accumulator,
+            *(getattr(stats, name) for name in _STATS_INT_FIELDS),
+            *(getattr(stats, name) for name in _STATS_FLOAT_FIELDS),
+            snake.target_x, snake.target_y, snake.speed_boost, snake.moving,
+            _gauss_to_float(rng_state[2]), _gauss_to_float(fx_state[2]),
+            n, len(self.food_list), len(self.obstacles), len(extra))
+
+        food = np.empty(len(self.food_list), dtype=FOOD_DTYPE)
+        for i, f in enumerate(self.food_list):
+            food[i] = (f.x, f.y, FOOD_TYPES.index(f.type), f.size, f.points, f.growth,
+                       f.pulse, f.sparkle_timer)
+        obstacles = np.array([(o.x, o.y, o.width, o.height) for o in self.obstacles],
+                             dtype=np.int64)
+        return b''.join((
+            header,
+            np.array(rng_state[1], dtype=np.uint32).tobytes(),
+            np.array(fx_state[1], dtype=np.uint32).tobytes(),
+            snake.xs[:n].tobytes(), snake.ys[:n].tobytes(), snake.angles[:n].tobytes(),
+            food.tobytes(), obstacles.tobytes(), extra,
+        ))
+
+    def restore(self, data):
+        """Return to a state captured by ``snapshot``.
+
+        Entities are rebuilt from the arrays in ``data``; stats and the
+        high score are overwritten in place, never reloaded from disk.
+        """
+        (magic, version, state, self.ticks, self.clock.ticks, self.accumulator, *fields
+         ) = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("Not a Snake Adventure snapshot, or from an incompatible version")
+        self.state = GAME_STATES[state]
+        stats_count = len(_STATS_INT_FIELDS) + len(_STATS_FLOAT_FIELDS)
+        for name, value in zip(_STATS_INT_FIELDS + _STATS_FLOAT_FIELDS, fields):
+            setattr(self.stats, name, value)
+        (target_x, target_y, speed_boost, moving, gauss, fx_gauss,
+         n, food_count, obstacle_count, extra_length) = fields[stats_count:]
+
+        offset = _SNAPSHOT_HEADER.size
+        mt = np.frombuffer(data, np.uint32, 2 * _MT_STATE_SIZE, offset).tolist()
+        self.rng.setstate((3, tuple(mt[:_MT_STATE_SIZE]), _float_to_gauss(gauss)))
+        self.fx_rng.setstate((3, tuple(mt[_MT_STATE_SIZE:]), _float_to_gauss(fx_gauss)))
+        offset += 8 * _MT_STATE_SIZE
+        body = np.frombuffer(data, np.float64, 3 * n, offset).reshape(3, n)
+        offset += 24 * n
+        food = np.frombuffer(data, FOOD_DTYPE, food_count, offset)
+        offset += FOOD_DTYPE.itemsize * food_count
+        obstacles = np.frombuffer(data, np.int64, 4 * obstacle_count, offset).reshape(-1, 4)
+        offset += 32 * obstacle_count
+        extra = json.loads(bytes(data[offset:offset + extra_length]))
+        self.seed = extra['seed']
+        self.config = extra['config']
+        self.configure(**self.config)
+
+        snake = self.snake
+        snake.set_body(body[0], body[1], body[2])
+        snake.target_x, snake.target_y = target_x, target_y
+        snake.moving = moving
+        snake.speed_boost = speed_boost
+        self.particles.clear()
+        self.events = 0
+
+        self.food_list.clear()
+        self.food_index.clear()
+        for x, y, food_type, size, points, growth, pulse, sparkle_timer in food.tolist():
+            item = self.food_class(x, y, FOOD_TYPES[food_type])
+            item.size, item.points, item.growth = size, points, growth
+            item.pulse, item.sparkle_timer = pulse, sparkle_timer
+            self.food_list.append(item)
+            self.food_index.insert(item, x - size, y - size, size * 2, size * 2)
+
+        self.obstacles.clear()
+        self.obstacle_index.clear()
+        for x, y, width, height in obstacles.tolist():
+            obstacle = self.obstacle_class(x, y, width, height)
+            self.obstacles.append(obstacle)
+            self.obstacle_index.insert(obstacle, *obstacle.rect)
+
+    def fork(self):
+        """Independent copy of this game, e.g. to explore rollouts from here.
+
+        Goes through ``snapshot``/``restore`` without generating a level; the
+        copy never persists its high score.
+        """
+        game = object.__new__(type(self))
+        game.clock = SimClock()
+        game.stats = GameStats(persist=False)
+        game.rng, game.fx_rng = random.Random(), random.Random()
+        game._allocate()
+        game.restore(self.snapshot())
+        return game
+
+    def configure(self, **params):
+        """Override tuning parameters on the game or its GameStats.
+
+        Accepts e.g. base_speed, speed_increment, max_speed,
+        super_food_chance, power_food_chance, max_obstacles, the level
+        layout margins (head_clearance, obstacle_gap, food_obstacle_margin,
+        food_spacing) and fast_math (see Snake).
+        """
+        for name, value in params.items():
+            if name in ('base_speed', 'speed_increment', 'max_speed'):
+                setattr(self.stats, name, value)
+            elif name == 'fast_math':
+                self.snake.fast_math = value
+            elif name in ('super_food_chance', 'power_food_chance', 'max_obstacles',
+                          'head_clearance', 'obstacle_gap', 'food_obstacle_margin', 'food_spacing'):
+                setattr(self, name, value)
+            else:
+                raise ValueError(f"Unknown config parameter: {name!r}")
+
+    def generate_level(self):
+        self.food_list.clear()
+        self.obstacles.clear()
+        self.food_index.clear()
+        self.obstacle_index.clear()
+
+        obstacle_rects, foods = layout_level(self.rng, self.stats.level, float(self.snake.xs[0]),
+                                             float(self.snake.ys[0]), self)
+        for rect in obstacle_rects:
+            obstacle = self.obstacle_class(*rect)
+            self.obstacles.append(obstacle)
+            self.obstacle_index.insert(obstacle, *obstacle.rect)
+        for x, y, food_type in foods:
+            food = self.food_class(x, y)
+            food.type = food_type
+            self.food_list.append(food)
+            self.food_index.insert(food, food.x - food.size, food.y - food.size,
+                                   food.size * 2, food.size * 2)
+
+    def handle_food_collection(self, food):
+        self.stats.score += food.points
+        self.stats.food_eaten += 1
+        self.events |= EVENT_FOOD
+        self.particles.emit(food.x, food.y, 20 if food.type == 'normal' else 40,
+                            PARTICLE_COLORS[food.type])
+
+        if food.type == 'power':
+            self.stats.power_up_timer = POWER_UP_TICKS
+            self.snake.speed_boost = 2.0
+            self.events |= EVENT_POWER_UP
+            self.particles.emit(food.x, food.y, 80, PARTICLE_COLORS['power'],
+                                speed=6.0, life=50, size=2.0)
+
+        self.snake.add_segment(food.growth)
+        self.food_list.remove(food)
+        self.food_index.remove(food)
+
+        # Level up check
+        if len(self.food_list) == 0:
+            self.stats.level += 1
+            self.stats.invulnerable_timer = INVULNERABLE_TICKS
+            self.events |= EVENT_LEVEL_UP
+            self.particles.emit(self.snake.xs[0], self.snake.ys[0], 300, PARTICLE_COLORS['level_up'],
+                                speed=9.0, life=70, size=4.0)
+            self.generate_level()
+
+    def update_game(self):
+        if self.state != "playing":
+            return
+
+        # Update timers
+        if self.stats.power_up_timer > 0:
+            self.stats.power_up_timer -= 1
+            if self.stats.power_up_timer == 0:
+                self.snake.speed_boost = 1.0
+            # Exhaust trail behind the head while boosted
+            self.particles.emit(self.snake.xs[0], self.snake.ys[0], 3, PARTICLE_COLORS['power'],
+                                speed=1.5, life=25, size=2.0,
+                                direction=self.snake.angles[0] + math.pi, spread=1.0)
+
+        if self.stats.invulnerable_timer > 0:
+            self.stats.invulnerable_timer -= 1
+
+        # Update food
+        for food in self.food_list:
+            food.update()
+
+        # Check food collision: everything the head passed over this tick
+        for food in self.snake.check_food_collision_indexed(self.food_index):
+            self.handle_food_collection(food)
+
+        # Check collisions (only if not invulnerable)
+        if self.stats.invulnerable_timer == 0:
+            if self.snake.check_wall_collision():
+                hit = EVENT_HIT_WALL
+            elif self.snake.check_obstacle_collision_indexed(self.obstacle_index):
+                hit = EVENT_HIT_OBSTACLE
+            elif self.snake.check_self_collision_indexed():
+                hit = EVENT_HIT_SELF
+            else:
+                hit = 0
+
+            if hit:
+                self.events |= hit | EVENT_LIFE_LOST
+                self.stats.lives -= 1
+                self.particles.emit(self.snake.xs[0], self.snake.ys[0], 120, PARTICLE_COLORS['damage'],
+                                    speed=5.0, life=45)
+                if self.stats.lives <= 0:
+                    self.state = "game_over"
+                    self.events |= EVENT_GAME_OVER
+                    self.stats.record_session(length=self.snake.count, duration=self.ticks / TICK_RATE)
+                    # Don't let a load still in flight turn any score into a record
+                    if self.stats.score > self.stats.wait_for_high_score(timeout=1.0):
+                        self.stats.high_score = self.stats.score
+                        self.stats.save_high_score()
+                else:
+                    # Reset snake position
+                    self.snake.reset()
+                    self.stats.invulnerable_timer = INVULNERABLE_TICKS
+
+    def tick(self, target):
+        """Advance the simulation by exactly one fixed tick towards ``target``"""
+        if self.state != "playing":
+            return
+        profiler = self.profiler
+        self.events = 0
+        current_speed = self.stats.get_current_speed()
+        self.snake.update(target[0], target[1], current_speed, self.clock.get_ticks())
+        if profiler:
+            profiler.mark('snake_update')
+        self.update_game()
+        self.particles.update()
+        if profiler:
+            profiler.mark('update_game')
+        self.clock.advance()
+        self.ticks += 1
+        if self.telemetry:
+            self.telemetry.write(self)
+        if self.spectators:
+            self.spectators.publish(self)
+
+    def step(self, dt, target):
+        """Advance by ``dt`` seconds of game time in fixed ticks; returns ticks run"""
+        ticks = self.due_ticks(dt)
+        for _ in range(ticks):
+            self.tick(target)
+        return ticks
+
+    def due_ticks(self, dt, limit=None):
+        """Add ``dt`` seconds to the accumulator and take out the whole ticks now due.
+
+        With ``limit``, at most that many are taken and any further backlog is
+        dropped, so after a stall the game slows down briefly instead of
+        racing to catch up.
+        """
+        self.accumulator += dt
+        ticks = 0
+        # Small tolerance so that repeated step(TICK_DT) never drops a tick to rounding
+        while self.accumulator >= TICK_DT - 1e-9:
+            self.accumulator -= TICK_DT
+            ticks += 1
+            if ticks == limit:
+                self.accumulator = min(self.accumulator, TICK_DT / 2)
+                break
+        return ticks
+
+    def render_alpha(self):
+        """How far game time has run past the last tick, as a fraction of a
+        tick, for drawing between the previous tick and this one"""
+        if self.state != "playing":
+            return 1.0
+        return min(1.0, self.accumulator / TICK_DT)
@@ -0,0 +1,146 @@
+"""Frame-time profiler for Snake Adventure.
+
+``FrameProfiler`` splits every frame into named phases by taking a single
+``perf_counter`` reading at each phase boundary (``mark``), keeps a bounded
+history of per-frame records, and reports percentiles or exports the trace
+as JSON or CSV. The game only talks to it through ``if profiler:`` checks, so
+with profiling off the cost is one attribute test per phase.
+
+``install_draw_counters`` optionally wraps pygame's drawing primitives and
+Surface constructor and blits to count draw calls and surface allocations
+per frame.
+"""
+import csv
+import json
+import time
+from collections import deque
+
+
+class FrameProfiler:
+    def __init__(self, history=36000):
+        self.frames = deque(maxlen=history)
+        self.counters = {}
+        self.current = None
+        self.frame_start = 0.0
+        self.last_mark = 0.0
+        self.frame_number = 0
+
+    def begin_frame(self):
+        self.frame_start = self.last_mark = time.perf_counter()
+        self.current = {}
+        self.counters = {}
+
+    def mark(self, phase):
+        """Attribute the time since the previous mark to ``phase``"""
+        now = time.perf_counter()
+        if self.current is not None:
+            self.current[phase] = self.current.get(phase, 0.0) + (now - self.last_mark) * 1000
+        self.last_mark = now
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def end_frame(self, **counters):
+        """Close the frame; ``counters`` are recorded alongside the phase times"""
+        if self.current is None:
+            return
+        record = {'frame': self.frame_number,
+                  'frame_ms': (time.perf_counter() - self.frame_start) * 1000}
+        record.update(self.current)
+        record.update(self.counters)
+        record.update(counters)
+        self.frames.append(record)
+        self.frame_number += 1
+        self.current = None
+
+    def percentiles(self, key='frame_ms', points=(50, 95, 99), window=600):
+        """Percentiles of ``key`` over the most recent ``window`` frames"""
+        values = sorted(f[key] for f in list(self.frames)[-window:] if key in f)
+        if not values:
+            return {p: 0.0 for p in points}
+        return {p: values[min(len(values) - 1, int(len(values) * p / 100))] for p in points}
+
+    def averages(self, window=120):
+        """Mean of every recorded field over the most recent ``window`` frames"""
+        recent = list(self.frames)[-window:]
+        totals = {}
+        for frame in recent:
+            for key, value in frame.items():
+                if key != 'frame':
+                    totals[key] = totals.get(key, 0.0) + value
+        return {key: value / len(recent) for key, value in totals.items()}
+
+    def export(self, path):
+        """Write the recorded trace to ``path`` (.csv, otherwise JSON)"""
+        frames = list(self.frames)
+        if path.endswith('.csv'):
+            fields = []
+            for frame in frames:
+                fields.extend(k for k in frame if k not in fields)
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(frames)
+        else:
+            summary = {'frame_ms_percentiles': self.percentiles(window=len(frames) or 1),
+                       'averages': self.averages(window=len(frames) or 1)}
+            with open(path, 'w') as f:
+                json.dump({'summary': summary, 'frames': frames}, f)
+
+
+_DRAW_FUNCTIONS = ('rect', 'polygon', 'circle', 'ellipse', 'arc', 'line', 'lines', 'aaline', 'aalines')
+
+
+def install_draw_counters(profiler):
+    """Count pygame.draw calls, blits and Surface allocations into ``profiler``.
+
+    Every primitive and every blit (each item of a ``blits`` batch) is one
+    draw call. pygame's own Surface type can't be patched, so blits are only
+    seen on surfaces created while this is installed, which ``pygame.Surface``
+    now makes; to count those onto the display, draw on such a surface and
+    copy it over. Returns a function that restores the original pygame
+    callables. Only install this while profiling; the wrappers add a Python
+    call per primitive.
+    """
+    import pygame
+
+    originals = {name: getattr(pygame.draw, name) for name in _DRAW_FUNCTIONS}
+    original_surface = pygame.Surface
+
+    def counting(draw):
+        def wrapper(*args, **kwargs):
+            profiler.count('draw_calls')
+            return draw(*args, **kwargs)
+        return wrapper
+
+    class CountingSurface(original_surface):
+        # Cleared on uninstall; surfaces made meanwhile may outlive it in caches
+        counting = profiler
+
+        def __init__(self, *args, **kwargs):
+            profiler.count('surfaces')
+            super().__init__(*args, **kwargs)
+
+        def blit(self, *args, **kwargs):
+            if self.counting:
+                self.counting.count('draw_calls')
+            return super().blit(*args, **kwargs)
+
+        def blits(self, blit_sequence, *args, **kwargs):
+            if self.counting:
+                if not hasattr(blit_sequence, '__len__'):
+                    blit_sequence = list(blit_sequence)
+                self.counting.count('draw_calls', len(blit_sequence))
+            return super().blits(blit_sequence, *args, **kwargs)
+
+    for name, draw in originals.items():
+        setattr(pygame.draw, name, counting(draw))
+    pygame.Surface = CountingSurface
+
+    def uninstall():
+        for name, draw in originals.items():
+            setattr(pygame.draw, name, draw)
+        pygame.Surface = original_surface
+        CountingSurface.counting = None
+
+    return uninstall
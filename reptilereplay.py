@@ -0,0 +1,290 @@
+"""Input recording and replay for Snake Adventure.
+
+A replay is the starting state plus everything the player did, one record
+per simulation tick (a "frame" below, however many were drawn), so the
+simulation can be re-run exactly instead of storing what it produced. File
+layout::
+
+    header    b'RPLY', u16 version, u32 length, JSON {seed, config, tick_rate,
+              snapshot_interval}
+    records   frame:    u8 flags [varint dx, varint dy] [varint n, n x u8 action]
+              snapshot: 0xFF, varint frame, zigzag mouse x, zigzag mouse y,
+                        varint length, Game.snapshot() bytes
+    index     0xFE, varint count, count x (varint frame, varint offset)
+    trailer   u64 index offset, b'RPLE'
+
+Mouse positions are zigzag varint deltas from the previous frame, so a frame
+where the mouse is still and nothing was pressed costs a single byte. A
+snapshot of the full game state is written every ``snapshot_interval``
+frames (always including frame 0); ``ReplayPlayer.seek`` restores the nearest
+one at or before the target and re-simulates the remainder. Files without a
+trailer (e.g. the game crashed) are still readable; the index is rebuilt by
+scanning the records.
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+
+import reptilecore
+
+
+MAGIC = b'RPLY'
+TRAILER_MAGIC = b'RPLE'
+VERSION = 1
+
+ACTIONS = ('escape', 'pause', 'restart', 'click')
+ACTION_CODES = {name: code for code, name in enumerate(ACTIONS)}
+
+FLAG_MOVED = 0x01
+FLAG_ACTIONS = 0x02
+SNAPSHOT = 0xFF
+INDEX = 0xFE
+
+_TRAILER = struct.Struct('<Q4s')
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+class ReplayWriter:
+    """Record a game frame by frame; call ``record`` before each tick"""
+    def __init__(self, path, game, snapshot_interval=600):
+        self.file = open(path, 'wb')
+        self.game = game
+        self.snapshot_interval = snapshot_interval
+        self.frame = 0
+        self.mouse = (0, 0)
+        self.snapshots = []
+        header = json.dumps({'seed': game.seed, 'config': game.config,
+                             'tick_rate': reptilecore.TICK_RATE,
+                             'snapshot_interval': snapshot_interval}).encode()
+        self.file.write(MAGIC + struct.pack('<HI', VERSION, len(header)) + header)
+        self.offset = self.file.tell()
+
+    def record(self, actions, mouse):
+        """Log one frame: the actions handled this frame and the mouse position"""
+        out = bytearray()
+        if self.frame % self.snapshot_interval == 0:
+            self.snapshots.append((self.frame, self.offset))
+            blob = self.game.snapshot()
+            out.append(SNAPSHOT)
+            for value in (self.frame, _zigzag(self.mouse[0]), _zigzag(self.mouse[1]), len(blob)):
+                _write_varint(out, value)
+            out += blob
+
+        mouse = (int(mouse[0]), int(mouse[1]))
+        dx, dy = mouse[0] - self.mouse[0], mouse[1] - self.mouse[1]
+        flags = (FLAG_MOVED if dx or dy else 0) | (FLAG_ACTIONS if actions else 0)
+        out.append(flags)
+        if dx or dy:
+            _write_varint(out, _zigzag(dx))
+            _write_varint(out, _zigzag(dy))
+        if actions:
+            _write_varint(out, len(actions))
+            out += bytes(ACTION_CODES[action] for action in actions)
+
+        self.file.write(out)
+        self.offset += len(out)
+        self.mouse = mouse
+        self.frame += 1
+
+    def close(self):
+        out = bytearray([INDEX])
+        _write_varint(out, len(self.snapshots))
+        for frame, offset in self.snapshots:
+            _write_varint(out, frame)
+            _write_varint(out, offset)
+        out += _TRAILER.pack(self.offset, TRAILER_MAGIC)
+        self.file.write(out)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayPlayer:
+    """Re-run a recorded game headlessly, with random access by frame"""
+    def __init__(self, path, game_class=reptilecore.Game):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        if self.data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        version, length = struct.unpack_from('<HI', self.data, 4)
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        self.header = json.loads(self.data[10:10 + length])
+        self.start = 10 + length
+        self.game_class = game_class
+        self.end, self.snapshots = self._read_index()
+        self.game = None
+        self.frame = 0
+        self.offset = self.start
+        self.mouse = (0, 0)
+        self.frames = self._count_frames()
+        self.seek(0)
+
+    def _read_index(self):
+        data = self.data
+        if len(data) >= self.start + _TRAILER.size:
+            index_offset, magic = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+            if magic == TRAILER_MAGIC and data[index_offset] == INDEX:
+                count, offset = _read_varint(data, index_offset + 1)
+                snapshots = []
+                for _ in range(count):
+                    frame, offset = _read_varint(data, offset)
+                    position, offset = _read_varint(data, offset)
+                    snapshots.append((frame, position))
+                return index_offset, snapshots
+        return self._scan()
+
+    def _scan(self):
+        """Rebuild the snapshot index of a file that was never closed"""
+        snapshots = []
+        offset = self.start
+        while offset < len(self.data) and self.data[offset] != INDEX:
+            try:
+                next_offset = self._skip(offset)
+            except IndexError:
+                break  # Truncated record
+            if next_offset > len(self.data):
+                break
+            if self.data[offset] == SNAPSHOT:
+                snapshots.append((_read_varint(self.data, offset + 1)[0], offset))
+            offset = next_offset
+        return offset, snapshots
+
+    def _skip(self, offset):
+        """Offset of the record after the one at ``offset``"""
+        data = self.data
+        flags = data[offset]
+        offset += 1
+        if flags == SNAPSHOT:
+            for _ in range(3):
+                _, offset = _read_varint(data, offset)
+            length, offset = _read_varint(data, offset)
+            return offset + length
+        if flags & FLAG_MOVED:
+            _, offset = _read_varint(data, offset)
+            _, offset = _read_varint(data, offset)
+        if flags & FLAG_ACTIONS:
+            count, offset = _read_varint(data, offset)
+            offset += count
+        return offset
+
+    def _count_frames(self):
+        if not self.snapshots:
+            return 0
+        frame, offset = self.snapshots[-1]
+        while offset < self.end:
+            if self.data[offset] != SNAPSHOT:
+                frame += 1
+            offset = self._skip(offset)
+        return frame
+
+    def _restore(self, offset):
+        data = self.data
+        offset += 1
+        frame, offset = _read_varint(data, offset)
+        mouse_x, offset = _read_varint(data, offset)
+        mouse_y, offset = _read_varint(data, offset)
+        length, offset = _read_varint(data, offset)
+        if self.game is None:
+            self.game = self.game_class(persist=False, seed=self.header['seed'],
+                                        config=self.header['config'])
+        self.game.restore(memoryview(data)[offset:offset + length])
+        self.frame = frame
+        self.mouse = (_unzigzag(mouse_x), _unzigzag(mouse_y))
+        self.offset = offset + length
+
+    def step(self):
+        """Replay one frame; returns False at the end of the recording"""
+        data = self.data
+        if self.frame >= self.frames:
+            return False
+        if data[self.offset] == SNAPSHOT:
+            self.offset = self._skip(self.offset)
+        flags = data[self.offset]
+        offset = self.offset + 1
+        if flags & FLAG_MOVED:
+            dx, offset = _read_varint(data, offset)
+            dy, offset = _read_varint(data, offset)
+            self.mouse = (self.mouse[0] + _unzigzag(dx), self.mouse[1] + _unzigzag(dy))
+        if flags & FLAG_ACTIONS:
+            count, offset = _read_varint(data, offset)
+            for code in data[offset:offset + count]:
+                self.game.handle_input(ACTIONS[code])
+            offset += count
+        self.offset = offset
+        self.game.tick(self.mouse)
+        self.frame += 1
+        return True
+
+    def seek(self, frame):
+        """Jump to the state just before ``frame`` is replayed"""
+        frame = max(0, min(frame, self.frames))
+        if not self.snapshots:
+            raise ValueError("Replay contains no snapshots")
+        snap_frame, snap_offset = self.snapshots[0]
+        for candidate in self.snapshots:
+            if candidate[0] > frame:
+                break
+            snap_frame, snap_offset = candidate
+        # Stepping forward from where we are beats a restore if it is closer
+        if self.game is None or not snap_frame <= self.frame <= frame:
+            self._restore(snap_offset)
+        while self.frame < frame:
+            self.step()
+        return self.game
+
+    def play(self):
+        while self.step():
+            pass
+        return self.game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded Snake Adventure game headlessly")
+    parser.add_argument('path', help="replay file")
+    parser.add_argument('--seek', type=int, metavar='FRAME', help="only replay up to this frame")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    player = ReplayPlayer(args.path)
+    game = player.seek(args.seek) if args.seek is not None else player.play()
+    elapsed = time.perf_counter() - start
+    print(f"seed {player.header['seed']}: frame {player.frame}/{player.frames}, "
+          f"{len(player.snapshots)} snapshots", file=sys.stderr)
+    print(f"state {game.state}, score {game.stats.score}, level {game.stats.level}, "
+          f"length {game.snake.count}, tick {game.ticks} ({elapsed * 1000:.1f} ms)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
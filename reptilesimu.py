@@ -1,757 +1,1108 @@
-import pygame
-import math
-import sys
-import random
-import json
-
-pygame.init()
-pygame.mixer.init()
-
-
-screen_width, screen_height = 1000, 700
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Snake Adventure - The Ultimate Slither")
-
-clock = pygame.time.Clock()
-font = pygame.font.Font(None, 36)
-big_font = pygame.font.Font(None, 72)
-small_font = pygame.font.Font(None, 24)
-medium_font = pygame.font.Font(None, 48)
-
-
-class GameStats:
-    def __init__(self):
-        self.score = 0
-        self.level = 1
-        self.food_eaten = 0
-        self.high_score = self.load_high_score()
-        self.lives = 3
-        self.power_up_timer = 0
-        self.invulnerable_timer = 0
-        self.base_speed = 0.15  # Starting speed (very slow)
-        self.speed_increment = 0.02  # Speed increase per food
-        self.max_speed = 0.8  # Maximum speed cap
-
-    def get_current_speed(self):
-        """Calculate current speed based on food eaten"""
-        current_speed = self.base_speed + (self.food_eaten * self.speed_increment)
-        return min(current_speed, self.max_speed)
-
-    def load_high_score(self):
-        try:
-            with open('high_score.json', 'r') as f:
-                return json.load(f).get('high_score', 0)
-        except:
-            return 0
-
-    def save_high_score(self):
-        try:
-            with open('high_score.json', 'w') as f:
-                json.dump({'high_score': self.high_score}, f)
-        except:
-            pass
-
-
-class Food:
-    def __init__(self, x=None, y=None, food_type='normal'):
-        self.x = x or random.randint(50, screen_width - 50)
-        self.y = y or random.randint(50, screen_height - 50)
-        self.type = food_type
-        self.size = 12 if food_type == 'normal' else 18
-        self.points = 10 if food_type == 'normal' else 50
-        self.growth = 1 if food_type == 'normal' else 3
-        self.pulse = 0
-        self.collected = False
-        self.sparkle_timer = 0
-
-    def update(self):
-        self.pulse += 0.2
-        self.sparkle_timer += 1
-
-    def draw(self, surface):
-        pulse_size = self.size + math.sin(self.pulse) * 3
-
-        if self.type == 'normal':
-      
-            color = (220, 50, 50)
-            highlight = (255, 100, 100)
-        elif self.type == 'super':
-           
-            color = (255, 215, 0)
-            highlight = (255, 255, 150)
-        elif self.type == 'power':
-         
-            color = (138, 43, 226)
-            highlight = (200, 100, 255)
-
-       
-        pygame.draw.circle(surface, color, (int(self.x), int(self.y)), int(pulse_size))
-
-        highlight_pos = (int(self.x - pulse_size * 0.3), int(self.y - pulse_size * 0.3))
-        pygame.draw.circle(surface, highlight, highlight_pos, int(pulse_size * 0.4))
-
-        # Outer glow
-        for i in range(3):
-            glow_color = (*color, 60 - i * 20)  # Fading alpha
-            glow_surface = pygame.Surface((pulse_size * 4, pulse_size * 4), pygame.SRCALPHA)
-            pygame.draw.circle(glow_surface, glow_color,
-                               (pulse_size * 2, pulse_size * 2), int(pulse_size + i * 3))
-            surface.blit(glow_surface, (self.x - pulse_size * 2, self.y - pulse_size * 2))
-
-        # Sparkle effect for special foods
-        if self.type != 'normal' and self.sparkle_timer % 20 < 10:
-            sparkle_positions = [
-                (self.x + random.randint(-15, 15), self.y + random.randint(-15, 15))
-                for _ in range(3)
-            ]
-            for pos in sparkle_positions:
-                pygame.draw.circle(surface, (255, 255, 255), pos, 2)
-
-
-class Obstacle:
-    def __init__(self, x, y, width, height):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.rect = pygame.Rect(x, y, width, height)
-
-    def draw(self, surface):
-        # Enhanced 3D rock appearance
-        # Main body
-        pygame.draw.rect(surface, (101, 67, 33), self.rect)
-
-        # Top highlight
-        highlight_rect = pygame.Rect(self.x, self.y, self.width, 8)
-        pygame.draw.rect(surface, (139, 101, 67), highlight_rect)
-
-        # Side shadow
-        shadow_rect = pygame.Rect(self.x + self.width - 8, self.y, 8, self.height)
-        pygame.draw.rect(surface, (67, 45, 22), shadow_rect)
-
-        # Border
-        pygame.draw.rect(surface, (139, 69, 19), self.rect, 3)
-
-        # Texture dots
-        for i in range(0, self.width, 20):
-            for j in range(0, self.height, 15):
-                if random.random() < 0.3:
-                    dot_x = self.x + i + random.randint(-5, 5)
-                    dot_y = self.y + j + random.randint(-5, 5)
-                    if self.rect.collidepoint(dot_x, dot_y):
-                        pygame.draw.circle(surface, (89, 59, 31), (dot_x, dot_y), 2)
-
-
-class Segment:
-    def __init__(self, x, y, length, index, total_segments):
-        self.x = x
-        self.y = y
-        self.length = length
-        self.angle = 0
-        self.index = index
-        self.total_segments = total_segments
-
-    def get_thickness(self):
-        if self.index == 0:  # Head
-            return 32
-        else:
-            progress = self.index / max(1, self.total_segments - 1)
-            return int(26 * (1 - progress * 0.6) + 8)
-
-    def follow(self, tx, ty, wiggle_phase=0, is_moving=True, speed_multiplier=1.0):
-        dx = tx - self.x
-        dy = ty - self.y
-        self.angle = math.atan2(dy, dx)
-
-        wiggle_intensity = (12 if self.index > 0 else 5) * speed_multiplier
-        wiggle = math.sin(pygame.time.get_ticks() * 0.02 + wiggle_phase) * wiggle_intensity if is_moving else 0
-        offset_x = math.cos(self.angle + math.pi / 2) * wiggle
-        offset_y = math.sin(self.angle + math.pi / 2) * wiggle
-
-        target_x = tx - math.cos(self.angle) * self.length + offset_x
-        target_y = ty - math.sin(self.angle) * self.length + offset_y
-
-        follow_speed = speed_multiplier
-        self.x += (target_x - self.x) * follow_speed
-        self.y += (target_y - self.y) * follow_speed
-
-    def get_end(self):
-        return (
-            self.x + math.cos(self.angle) * self.length,
-            self.y + math.sin(self.angle) * self.length
-        )
-
-    def get_rect(self):
-        thickness = self.get_thickness()
-        return pygame.Rect(self.x - thickness // 2, self.y - thickness // 2, thickness, thickness)
-
-    def draw(self, surface, invulnerable=False):
-        end_x, end_y = self.get_end()
-        thickness = self.get_thickness()
-
-        # Flash if invulnerable
-        if invulnerable and pygame.time.get_ticks() % 200 < 100:
-            return
-
-        if self.index == 0:  # Enhanced head design
-            # Main head circle with gradient
-            head_color = (50, 180, 50)
-            shadow_color = (30, 120, 30)
-
-            # Shadow/depth
-            pygame.draw.circle(surface, shadow_color, (int(self.x + 2), int(self.y + 2)), thickness)
-            # Main head
-            pygame.draw.circle(surface, head_color, (int(self.x), int(self.y)), thickness)
-            # Highlight
-            pygame.draw.circle(surface, (80, 220, 80), (int(self.x - 5), int(self.y - 5)), thickness // 3)
-
-            # Enhanced eyes
-            eye_offset = 12
-            eye_size = 7
-            pupil_size = 4
-
-            eye1_x = self.x + math.cos(self.angle - 0.4) * eye_offset
-            eye1_y = self.y + math.sin(self.angle - 0.4) * eye_offset
-            eye2_x = self.x + math.cos(self.angle + 0.4) * eye_offset
-            eye2_y = self.y + math.sin(self.angle + 0.4) * eye_offset
-
-            # Eye whites
-            pygame.draw.circle(surface, (255, 255, 255), (int(eye1_x), int(eye1_y)), eye_size)
-            pygame.draw.circle(surface, (255, 255, 255), (int(eye2_x), int(eye2_y)), eye_size)
-
-            # Eye pupils
-            pygame.draw.circle(surface, (0, 0, 0), (int(eye1_x), int(eye1_y)), pupil_size)
-            pygame.draw.circle(surface, (0, 0, 0), (int(eye2_x), int(eye2_y)), pupil_size)
-
-            # Eye shine
-            pygame.draw.circle(surface, (255, 255, 255), (int(eye1_x - 1), int(eye1_y - 1)), 2)
-            pygame.draw.circle(surface, (255, 255, 255), (int(eye2_x - 1), int(eye2_y - 1)), 2)
-
-            # Enhanced tongue
-            if abs(self.x - end_x) > 5 or abs(self.y - end_y) > 5:
-                tongue_length = 20
-                tongue_x = self.x + math.cos(self.angle) * (thickness + tongue_length)
-                tongue_y = self.y + math.sin(self.angle) * (thickness + tongue_length)
-
-                # Forked tongue
-                fork_angle1 = self.angle + 0.3
-                fork_angle2 = self.angle - 0.3
-                fork_length = 8
-
-                fork1_x = tongue_x + math.cos(fork_angle1) * fork_length
-                fork1_y = tongue_y + math.sin(fork_angle1) * fork_length
-                fork2_x = tongue_x + math.cos(fork_angle2) * fork_length
-                fork2_y = tongue_y + math.sin(fork_angle2) * fork_length
-
-                # Main tongue
-                pygame.draw.line(surface, (200, 50, 50),
-                                 (int(self.x + math.cos(self.angle) * thickness),
-                                  int(self.y + math.sin(self.angle) * thickness)),
-                                 (int(tongue_x), int(tongue_y)), 4)
-
-                # Fork tips
-                pygame.draw.line(surface, (255, 100, 100), (int(tongue_x), int(tongue_y)),
-                                 (int(fork1_x), int(fork1_y)), 3)
-                pygame.draw.line(surface, (255, 100, 100), (int(tongue_x), int(tongue_y)),
-                                 (int(fork2_x), int(fork2_y)), 3)
-        else:
-            # Enhanced body segments with better gradients
-            progress = self.index / self.total_segments
-            base_r, base_g, base_b = 50, 180, 50
-
-            # Color variation along body
-            r = int(base_r - 20 * progress)
-            g = int(base_g - 40 * progress)
-            b = int(base_b - 20 * progress)
-
-            shadow_r = max(0, r - 30)
-            shadow_g = max(0, g - 30)
-            shadow_b = max(0, b - 30)
-
-            if thickness > 4:
-                perpendicular_angle = self.angle + math.pi / 2
-                half_thickness = thickness / 2
-
-                # Create segment points
-                corner1_x = self.x + math.cos(perpendicular_angle) * half_thickness
-                corner1_y = self.y + math.sin(perpendicular_angle) * half_thickness
-                corner2_x = self.x - math.cos(perpendicular_angle) * half_thickness
-                corner2_y = self.y - math.sin(perpendicular_angle) * half_thickness
-                corner3_x = end_x - math.cos(perpendicular_angle) * half_thickness
-                corner3_y = end_y - math.sin(perpendicular_angle) * half_thickness
-                corner4_x = end_x + math.cos(perpendicular_angle) * half_thickness
-                corner4_y = end_y + math.sin(perpendicular_angle) * half_thickness
-
-                # Draw shadow first
-                shadow_points = [(corner1_x + 2, corner1_y + 2), (corner2_x + 2, corner2_y + 2),
-                                 (corner3_x + 2, corner3_y + 2), (corner4_x + 2, corner4_y + 2)]
-                pygame.draw.polygon(surface, (shadow_r, shadow_g, shadow_b), shadow_points)
-
-                # Main body
-                points = [(corner1_x, corner1_y), (corner2_x, corner2_y),
-                          (corner3_x, corner3_y), (corner4_x, corner4_y)]
-                pygame.draw.polygon(surface, (r, g, b), points)
-
-                # End caps
-                pygame.draw.circle(surface, (r, g, b), (int(self.x), int(self.y)), int(half_thickness))
-                pygame.draw.circle(surface, (r, g, b), (int(end_x), int(end_y)), int(half_thickness))
-
-                # Scale pattern
-                if self.index % 3 == 0:
-                    scale_color = (min(255, r + 40), min(255, g + 40), min(255, b + 20))
-                    mid_x = (self.x + end_x) / 2
-                    mid_y = (self.y + end_y) / 2
-                    scale_size = max(3, thickness // 8)
-                    pygame.draw.circle(surface, scale_color, (int(mid_x), int(mid_y)), scale_size)
-
-
-class Snake:
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        self.num_segments = 8
-        self.segment_length = 18
-        start_x = screen_width // 2
-        start_y = screen_height // 2
-        self.segments = [Segment(start_x, start_y, self.segment_length, i, self.num_segments)
-                         for i in range(self.num_segments)]
-        self.target_x, self.target_y = start_x, start_y
-        self.moving = False
-        self.speed_boost = 1.0
-
-    def add_segment(self, count=1):
-        for _ in range(count):
-            last_seg = self.segments[-1]
-            new_seg = Segment(last_seg.x, last_seg.y, self.segment_length,
-                              len(self.segments), len(self.segments) + 1)
-            self.segments.append(new_seg)
-
-        # Update indices
-        for i, seg in enumerate(self.segments):
-            seg.index = i
-            seg.total_segments = len(self.segments)
-
-    def update(self, target_x, target_y, base_speed):
-        self.target_x, self.target_y = target_x, target_y
-
-        head = self.segments[0]
-        dist = math.hypot(target_x - head.x, target_y - head.y)
-        self.moving = dist > 15
-
-        # Apply the gradual speed system
-        current_speed = base_speed * self.speed_boost
-
-        self.segments[0].follow(target_x, target_y, wiggle_phase=0,
-                                is_moving=self.moving, speed_multiplier=current_speed)
-
-        for i in range(1, len(self.segments)):
-            self.segments[i].follow(self.segments[i - 1].x, self.segments[i - 1].y,
-                                    i * 0.4, is_moving=self.moving, speed_multiplier=current_speed)
-
-    def check_food_collision(self, food_list):
-        head = self.segments[0]
-        head_rect = pygame.Rect(head.x - 22, head.y - 22, 44, 44)
-
-        for food in food_list[:]:
-            food_rect = pygame.Rect(food.x - food.size, food.y - food.size,
-                                    food.size * 2, food.size * 2)
-            if head_rect.colliderect(food_rect):
-                return food
-        return None
-
-    def check_obstacle_collision(self, obstacles):
-        head = self.segments[0]
-        head_rect = pygame.Rect(head.x - 18, head.y - 18, 36, 36)
-
-        for obstacle in obstacles:
-            if head_rect.colliderect(obstacle.rect):
-                return True
-        return False
-
-    def check_wall_collision(self):
-        head = self.segments[0]
-        margin = 25
-        return (head.x < margin or head.x > screen_width - margin or
-                head.y < margin or head.y > screen_height - margin)
-
-    def check_self_collision(self):
-        if len(self.segments) < 6:
-            return False
-
-        head = self.segments[0]
-        head_rect = pygame.Rect(head.x - 18, head.y - 18, 36, 36)
-
-        for seg in self.segments[5:]:  # Skip first few segments
-            seg_rect = seg.get_rect()
-            if head_rect.colliderect(seg_rect):
-                return True
-        return False
-
-    def draw(self, surface, invulnerable=False):
-        for seg in reversed(self.segments):
-            seg.draw(surface, invulnerable)
-
-
-class Game:
-    def __init__(self):
-        self.state = "menu"  # menu, playing, paused, game_over
-        self.stats = GameStats()
-        self.snake = Snake()
-        self.food_list = []
-        self.obstacles = []
-        self.particles = []
-        self.generate_level()
-
-    def generate_level(self):
-        self.food_list.clear()
-        self.obstacles.clear()
-
-        # Generate food
-        food_count = 6 + self.stats.level
-        for _ in range(food_count):
-            while True:
-                food = Food()
-                # Make sure food doesn't spawn in obstacles or too close to snake
-                valid = True
-                for obstacle in self.obstacles:
-                    if obstacle.rect.collidepoint(food.x, food.y):
-                        valid = False
-                        break
-                if valid and len(self.snake.segments) > 0:
-                    head = self.snake.segments[0]
-                    if math.hypot(food.x - head.x, food.y - head.y) < 120:
-                        valid = False
-                if valid:
-                    break
-
-            # Chance for special food
-            if random.random() < 0.18:
-                food.type = 'super'
-            elif random.random() < 0.08:
-                food.type = 'power'
-
-            self.food_list.append(food)
-
-        # Generate obstacles based on level
-        obstacle_count = min(self.stats.level - 1, 10)
-        for _ in range(obstacle_count):
-            width = random.randint(70, 140)
-            height = random.randint(40, 90)
-            x = random.randint(60, screen_width - width - 60)
-            y = random.randint(60, screen_height - height - 60)
-            self.obstacles.append(Obstacle(x, y, width, height))
-
-    def handle_food_collection(self, food):
-        self.stats.score += food.points
-        self.stats.food_eaten += 1
-
-        if food.type == 'power':
-            self.stats.power_up_timer = 300  # 5 seconds at 60fps
-            self.snake.speed_boost = 2.0
-
-        self.snake.add_segment(food.growth)
-        self.food_list.remove(food)
-
-        # Level up check
-        if len(self.food_list) == 0:
-            self.stats.level += 1
-            self.stats.invulnerable_timer = 180  # 3 seconds
-            self.generate_level()
-
-    def update_game(self):
-        if self.state != "playing":
-            return
-
-        # Update timers
-        if self.stats.power_up_timer > 0:
-            self.stats.power_up_timer -= 1
-            if self.stats.power_up_timer == 0:
-                self.snake.speed_boost = 1.0
-
-        if self.stats.invulnerable_timer > 0:
-            self.stats.invulnerable_timer -= 1
-
-        # Update food
-        for food in self.food_list:
-            food.update()
-
-        # Check food collision
-        collected_food = self.snake.check_food_collision(self.food_list)
-        if collected_food:
-            self.handle_food_collection(collected_food)
-
-        # Check collisions (only if not invulnerable)
-        if self.stats.invulnerable_timer == 0:
-            if (self.snake.check_wall_collision() or
-                    self.snake.check_obstacle_collision(self.obstacles) or
-                    self.snake.check_self_collision()):
-
-                self.stats.lives -= 1
-                if self.stats.lives <= 0:
-                    self.state = "game_over"
-                    if self.stats.score > self.stats.high_score:
-                        self.stats.high_score = self.stats.score
-                        self.stats.save_high_score()
-                else:
-                    # Reset snake position
-                    self.snake.reset()
-                    self.stats.invulnerable_timer = 180
-
-    def draw_speed_meter(self, surface):
-        """Draw a visual speed meter"""
-        meter_x = screen_width - 200
-        meter_y = 50
-        meter_width = 150
-        meter_height = 20
-
-        # Background
-        pygame.draw.rect(surface, (50, 50, 50), (meter_x, meter_y, meter_width, meter_height))
-        pygame.draw.rect(surface, (100, 100, 100), (meter_x, meter_y, meter_width, meter_height), 2)
-
-        # Speed fill
-        current_speed = self.stats.get_current_speed()
-        speed_ratio = (current_speed - self.stats.base_speed) / (self.stats.max_speed - self.stats.base_speed)
-        fill_width = int(meter_width * speed_ratio)
-
-        if fill_width > 0:
-            # Color gradient based on speed
-            if speed_ratio < 0.3:
-                color = (0, 255, 0)  # Green
-            elif speed_ratio < 0.7:
-                color = (255, 255, 0)  # Yellow
-            else:
-                color = (255, 100, 0)  # Orange-red
-
-            pygame.draw.rect(surface, color, (meter_x, meter_y, fill_width, meter_height))
-
-        # Label
-        speed_text = small_font.render("SPEED", True, (255, 255, 255))
-        surface.blit(speed_text, (meter_x, meter_y - 25))
-
-    def draw_ui(self, surface):
-        # Enhanced UI with better layout and styling
-        # Background panel
-        ui_panel = pygame.Surface((300, 180), pygame.SRCALPHA)
-        ui_panel.fill((0, 0, 0, 120))
-        surface.blit(ui_panel, (5, 5))
-
-        # Score and stats with better formatting
-        score_text = font.render(f"Score: {self.stats.score:,}", True, (255, 255, 100))
-        level_text = font.render(f"Level: {self.stats.level}", True, (100, 255, 100))
-        lives_text = font.render(f"Lives: {'♥' * self.stats.lives}", True, (255, 100, 100))
-        food_text = small_font.render(f"Food Remaining: {len(self.food_list)}", True, (255, 255, 255))
-        length_text = small_font.render(f"Snake Length: {len(self.snake.segments)}", True, (200, 200, 255))
-
-        # Speed info
-        current_speed = self.stats.get_current_speed()
-        speed_percentage = int((current_speed / self.stats.max_speed) * 100)
-        speed_text = small_font.render(f"Speed: {speed_percentage}%", True, (255, 200, 100))
-
-        surface.blit(score_text, (15, 15))
-        surface.blit(level_text, (15, 50))
-        surface.blit(lives_text, (15, 85))
-        surface.blit(food_text, (15, 115))
-        surface.blit(length_text, (15, 135))
-        surface.blit(speed_text, (15, 155))
-
-        # Power-up indicator with enhanced effects
-        if self.stats.power_up_timer > 0:
-            power_bg = pygame.Surface((200, 30), pygame.SRCALPHA)
-            power_bg.fill((138, 43, 226, 150))
-            surface.blit(power_bg, (350, 10))
-
-            power_text = font.render("⚡ SPEED BOOST! ⚡", True, (255, 255, 255))
-            surface.blit(power_text, (360, 15))
-
-        # Speed meter
-        self.draw_speed_meter(surface)
-
-        # High score with better positioning
-        high_score_bg = pygame.Surface((180, 30), pygame.SRCALPHA)
-        high_score_bg.fill((0, 0, 0, 120))
-        surface.blit(high_score_bg, (screen_width - 185, 80))
-
-        high_score_text = small_font.render(f"High Score: {self.stats.high_score:,}", True, (255, 215, 0))
-        surface.blit(high_score_text, (screen_width - 180, 90))
-
-    def draw_menu(self, surface):
-        # Enhanced menu with gradient background
-        for y in range(screen_height):
-            color_ratio = y / screen_height
-            r = int(20 + (40 - 20) * color_ratio)
-            g = int(40 + (80 - 40) * color_ratio)
-            b = int(20 + (40 - 20) * color_ratio)
-            pygame.draw.line(surface, (r, g, b), (0, y), (screen_width, y))
-
-        title = big_font.render("🐍 SNAKE ADVENTURE 🐍", True, (50, 255, 50))
-        subtitle = font.render("The Ultimate Slither Experience", True, (255, 255, 255))
-
-        instructions = [
-            "🎯 Click anywhere to guide your snake",
-            "🍎 Red food: Basic growth and points",
-            "🟡 Gold food: Bonus points and extra growth",
-            "🟣 Purple food: Speed boost power-up",
-            "⚠️ Avoid walls, rocks, and yourself",
-            "🏆 Clear all food to advance levels",
-            "🚀 Snake gets faster as you eat more!",
-            "",
-            "🎮 Click anywhere to start your adventure!"
-        ]
-
-        title_rect = title.get_rect(center=(screen_width // 2, 120))
-        subtitle_rect = subtitle.get_rect(center=(screen_width // 2, 170))
-
-        surface.blit(title, title_rect)
-        surface.blit(subtitle, subtitle_rect)
-
-        y_offset = 230
-        for instruction in instructions:
-            if instruction:
-                color = (200, 200, 200) if not instruction.startswith("🎮") else (100, 255, 100)
-                text = small_font.render(instruction, True, color)
-                text_rect = text.get_rect(center=(screen_width // 2, y_offset))
-                surface.blit(text, text_rect)
-            y_offset += 35
-
-    def draw_game_over(self, surface):
-        # Enhanced game over screen
-        for y in range(screen_height):
-            color_ratio = y / screen_height
-            r = int(60 + (20 - 60) * color_ratio)
-            g = int(20)
-            b = int(20)
-            pygame.draw.line(surface, (r, g, b), (0, y), (screen_width, y))
-
-        game_over_text = big_font.render("💀 GAME OVER 💀", True, (255, 100, 100))
-        final_score = font.render(f"Final Score: {self.stats.score:,}", True, (255, 255, 255))
-        level_reached = font.render(f"Level Reached: {self.stats.level}", True, (255, 255, 255))
-        length_reached = font.render(f"Max Length: {len(self.snake.segments)}", True, (200, 200, 255))
-        food_eaten = font.render(f"Food Consumed: {self.stats.food_eaten}", True, (100, 255, 100))
-        high_score = font.render(f"High Score: {self.stats.high_score:,}", True, (255, 215, 0))
-
-        if self.stats.score == self.stats.high_score and self.stats.score > 0:
-            new_record = medium_font.render("🎉 NEW HIGH SCORE! 🎉", True, (255, 215, 0))
-        else:
-            new_record = None
-
-        restart_text = small_font.render("Press R to restart or ESC for menu", True, (200, 200, 200))
-
-        game_over_rect = game_over_text.get_rect(center=(screen_width // 2, 200))
-        final_score_rect = final_score.get_rect(center=(screen_width // 2, 280))
-        level_rect = level_reached.get_rect(center=(screen_width // 2, 320))
-        length_rect = length_reached.get_rect(center=(screen_width // 2, 360))
-        food_rect = food_eaten.get_rect(center=(screen_width // 2, 400))
-        high_score_rect = high_score.get_rect(center=(screen_width // 2, 440))
-        restart_rect = restart_text.get_rect(center=(screen_width // 2, 520))
-
-        surface.blit(game_over_text, game_over_rect)
-        surface.blit(final_score, final_score_rect)
-        surface.blit(level_reached, level_rect)
-        surface.blit(length_reached, length_rect)
-        surface.blit(food_eaten, food_rect)
-        surface.blit(high_score, high_score_rect)
-        surface.blit(restart_text, restart_rect)
-
-        if new_record:
-            new_record_rect = new_record.get_rect(center=(screen_width // 2, 480))
-            surface.blit(new_record, new_record_rect)
-
-    def run(self):
-        running = True
-
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        if self.state == "playing":
-                            self.state = "paused" if self.state != "paused" else "playing"
-                        else:
-                            self.state = "menu"
-
-                    elif event.key == pygame.K_r and self.state == "game_over":
-                        self.__init__()  # Reset game
-                        self.state = "playing"
-
-                    elif event.key == pygame.K_p and self.state == "playing":
-                        self.state = "paused"
-
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if self.state == "menu":
-                        self.state = "playing"
-                    elif self.state == "playing":
-                        pass  # Mouse movement handled in main loop
-                    elif self.state == "paused":
-                        self.state = "playing"
-
-            # Update game logic
-            if self.state == "playing":
-                mouse_pos = pygame.mouse.get_pos()
-                current_speed = self.stats.get_current_speed()
-                self.snake.update(mouse_pos[0], mouse_pos[1], current_speed)
-                self.update_game()
-
-            # Draw everything
-            if self.state == "menu":
-                self.draw_menu(screen)
-            elif self.state == "game_over":
-                self.draw_game_over(screen)
-            else:
-                # Enhanced game background with animated grass
-                base_color = (25, 35, 25)
-                screen.fill(base_color)
-
-                # Animated grass pattern
-                time_offset = pygame.time.get_ticks() * 0.001
-                for i in range(0, screen_width, 40):
-                    for j in range(0, screen_height, 40):
-                        if (i + j) % 80 == 0:
-                            grass_size = 3 + math.sin(time_offset + i * 0.01 + j * 0.01) * 1
-                            grass_color = (30 + int(math.sin(time_offset + i * 0.02) * 10),
-                                           45 + int(math.cos(time_offset + j * 0.02) * 10),
-                                           30)
-                            pygame.draw.circle(screen, grass_color, (i, j), int(grass_size))
-
-                # Draw obstacles
-                for obstacle in self.obstacles:
-                    obstacle.draw(screen)
-
-                # Draw food
-                for food in self.food_list:
-                    food.draw(screen)
-
-                # Draw snake
-                self.snake.draw(screen, self.stats.invulnerable_timer > 0)
-
-                # Draw UI
-                self.draw_ui(screen)
-
-                # Paused overlay
-                if self.state == "paused":
-                    overlay = pygame.Surface((screen_width, screen_height))
-                    overlay.set_alpha(180)
-                    overlay.fill((0, 0, 0))
-                    screen.blit(overlay, (0, 0))
-
-                    paused_text = big_font.render("⏸️ PAUSED ⏸️", True, (255, 255, 255))
-                    paused_rect = paused_text.get_rect(center=(screen_width // 2, screen_height // 2))
-                    screen.blit(paused_text, paused_rect)
-
-                    resume_text = small_font.render("Click to resume or press ESC for menu", True, (200, 200, 200))
-                    resume_rect = resume_text.get_rect(center=(screen_width // 2, screen_height // 2 + 50))
-                    screen.blit(resume_text, resume_rect)
-
-            pygame.display.flip()
-            clock.tick(60)
-
-        pygame.quit()
-        sys.exit()
-
-
-# Run the game
-if __name__ == "__main__":
-    game = Game()
-    game.run()
+import pygame
+import argparse
+import math
+import sys
+import random
+from collections import OrderedDict
+
+import numpy as np
+
+import reptilecore
+from reptilecore import screen_width, screen_height
+from reptileprofile import FrameProfiler, install_draw_counters
+from reptilecast import SpectatorServer
+from reptilereplay import ReplayWriter
+from reptiletelemetry import TelemetryWriter
+
+# Display resources are created lazily by init_display() so that importing this
+# module (e.g. to reuse the entity classes) never opens a window or audio device.
+screen = None
+clock = None
+font = None
+big_font = None
+small_font = None
+medium_font = None
+
+
+def init_display():
+    global screen, clock, font, big_font, small_font, medium_font
+    pygame.init()
+    pygame.mixer.init()
+
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    pygame.display.set_caption("Snake Adventure - The Ultimate Slither")
+
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 36)
+    big_font = pygame.font.Font(None, 72)
+    small_font = pygame.font.Font(None, 24)
+    medium_font = pygame.font.Font(None, 48)
+
+
+# The display is redrawn at most this often; the simulation always runs at
+# reptilecore.TICK_RATE, and a frame that took longer than a tick runs the
+# ticks it owes (up to MAX_TICKS_PER_FRAME, past which the game slows down)
+MAX_FPS = 60
+MAX_TICKS_PER_FRAME = 5
+
+# Keys that map onto Game.handle_input actions
+KEY_ACTIONS = {
+    pygame.K_ESCAPE: "escape",
+    pygame.K_p: "pause",
+    pygame.K_r: "restart",
+}
+
+
+class LRUCache:
+    """Bounded cache of rendered surfaces with hit/miss counters.
+
+    ``get`` returns the cached value for ``key`` or builds it with
+    ``factory()``; once ``maxsize`` entries are held the least recently
+    used one is evicted.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, factory):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            value = self.entries[key] = factory()
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return value
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"{len(self.entries)}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses ({rate:.1f}% hit)"
+
+
+FOOD_COLORS = {
+    'normal': ((220, 50, 50), (255, 100, 100)),
+    'super': ((255, 215, 0), (255, 255, 150)),
+    'power': ((138, 43, 226), (200, 100, 255)),
+}
+
+# The pulse animation is quantised to this many frames per cycle so every
+# food sprite can be pre-rendered once and reused.
+PULSE_FRAMES = 16
+
+food_sprites = LRUCache(maxsize=256)
+
+
+def render_food_sprite(food_type, size, frame):
+    """Body, highlight and glow of one food type at one pulse frame"""
+    pulse_size = size + math.sin(frame * 2 * math.pi / PULSE_FRAMES) * 3
+    color, highlight = FOOD_COLORS[food_type]
+
+    side = int((size + 3) * 4)
+    center = side // 2
+    sprite = pygame.Surface((side, side), pygame.SRCALPHA)
+
+    pygame.draw.circle(sprite, color, (center, center), int(pulse_size))
+
+    highlight_pos = (int(center - pulse_size * 0.3), int(center - pulse_size * 0.3))
+    pygame.draw.circle(sprite, highlight, highlight_pos, int(pulse_size * 0.4))
+
+    # Outer glow
+    for i in range(3):
+        glow_color = (*color, 60 - i * 20)  # Fading alpha
+        glow_surface = pygame.Surface((side, side), pygame.SRCALPHA)
+        pygame.draw.circle(glow_surface, glow_color, (center, center), int(pulse_size + i * 3))
+        sprite.blit(glow_surface, (0, 0))
+
+    return sprite
+
+
+text_cache = LRUCache(maxsize=256)
+
+
+def render_text(text_font, text, color):
+    """Antialiased text surface, rasterised only the first time it is seen"""
+    return text_cache.get((text_font, text, color), lambda: text_font.render(text, True, color))
+
+
+_panels = {}
+
+
+def get_panel(size, color):
+    """Translucent filled panel, built once per size and RGBA colour"""
+    key = (size, color)
+    if key not in _panels:
+        panel = pygame.Surface(size, pygame.SRCALPHA)
+        panel.fill(color)
+        _panels[key] = panel
+    return _panels[key]
+
+
+def counting_canvas(surface):
+    """Copy of ``surface`` to draw frames on while install_draw_counters is
+    active, since blits onto the display's own Surface can't be counted"""
+    canvas = pygame.Surface(surface.get_size(), 0, surface)
+    canvas.blit(surface, (0, 0))
+    return canvas
+
+
+class Food(reptilecore.Food):
+    def get_draw_rect(self):
+        """Screen area covered by draw(), sprite and sparkles included"""
+        side = int((self.size + 3) * 4)
+        return pygame.Rect(int(self.x) - side // 2, int(self.y) - side // 2, side, side)
+
+    def draw(self, surface, rng=random):
+        frame = round(self.pulse % (2 * math.pi) / (2 * math.pi) * PULSE_FRAMES) % PULSE_FRAMES
+        key = (self.type, self.size, frame)
+        sprite = food_sprites.get(key, lambda: render_food_sprite(*key))
+        center = sprite.get_width() // 2
+        surface.blit(sprite, (int(self.x) - center, int(self.y) - center))
+
+        # Sparkle effect for special foods
+        if self.type != 'normal' and self.sparkle_timer % 20 < 10:
+            sparkle_positions = [
+                (self.x + rng.randint(-15, 15), self.y + rng.randint(-15, 15))
+                for _ in range(3)
+            ]
+            for pos in sparkle_positions:
+                pygame.draw.circle(surface, (255, 255, 255), pos, 2)
+
+
+class Obstacle(reptilecore.Obstacle):
+    # Rendered once on first draw. Obstacles are rebuilt by generate_level,
+    # so a new level always gets fresh textures.
+    texture = None
+
+    def render_texture(self):
+        """Render the rock body, shadow and texture dots into a surface.
+
+        The dot pattern is seeded from the obstacle's own geometry, so it is
+        stable from frame to frame and never touches the game's RNG streams.
+        """
+        texture = pygame.Surface((self.width, self.height))
+        rect = pygame.Rect(0, 0, self.width, self.height)
+        rng = random.Random(f"{self.x},{self.y},{self.width},{self.height}")
+
+        # Enhanced 3D rock appearance
+        # Main body
+        pygame.draw.rect(texture, (101, 67, 33), rect)
+
+        # Top highlight
+        highlight_rect = pygame.Rect(0, 0, self.width, 8)
+        pygame.draw.rect(texture, (139, 101, 67), highlight_rect)
+
+        # Side shadow
+        shadow_rect = pygame.Rect(self.width - 8, 0, 8, self.height)
+        pygame.draw.rect(texture, (67, 45, 22), shadow_rect)
+
+        # Border
+        pygame.draw.rect(texture, (139, 69, 19), rect, 3)
+
+        # Texture dots
+        for i in range(0, self.width, 20):
+            for j in range(0, self.height, 15):
+                if rng.random() < 0.3:
+                    dot_x = i + rng.randint(-5, 5)
+                    dot_y = j + rng.randint(-5, 5)
+                    if rect.collidepoint(dot_x, dot_y):
+                        pygame.draw.circle(texture, (89, 59, 31), (dot_x, dot_y), 2)
+
+        return texture
+
+    def draw(self, surface):
+        if self.texture is None:
+            self.texture = self.render_texture()
+        surface.blit(self.texture, (self.x, self.y))
+
+
+def draw_head(surface, x, y, angle, length, thickness=32):
+    """The snake's head: shaded disc, eyes and forked tongue"""
+    end_x = x + math.cos(angle) * length
+    end_y = y + math.sin(angle) * length
+
+    # Main head circle with gradient
+    head_color = (50, 180, 50)
+    shadow_color = (30, 120, 30)
+
+    # Shadow/depth
+    pygame.draw.circle(surface, shadow_color, (int(x + 2), int(y + 2)), thickness)
+    # Main head
+    pygame.draw.circle(surface, head_color, (int(x), int(y)), thickness)
+    # Highlight
+    pygame.draw.circle(surface, (80, 220, 80), (int(x - 5), int(y - 5)), thickness // 3)
+
+    # Enhanced eyes
+    eye_offset = 12
+    eye_size = 7
+    pupil_size = 4
+
+    eye1_x = x + math.cos(angle - 0.4) * eye_offset
+    eye1_y = y + math.sin(angle - 0.4) * eye_offset
+    eye2_x = x + math.cos(angle + 0.4) * eye_offset
+    eye2_y = y + math.sin(angle + 0.4) * eye_offset
+
+    # Eye whites
+    pygame.draw.circle(surface, (255, 255, 255), (int(eye1_x), int(eye1_y)), eye_size)
+    pygame.draw.circle(surface, (255, 255, 255), (int(eye2_x), int(eye2_y)), eye_size)
+
+    # Eye pupils
+    pygame.draw.circle(surface, (0, 0, 0), (int(eye1_x), int(eye1_y)), pupil_size)
+    pygame.draw.circle(surface, (0, 0, 0), (int(eye2_x), int(eye2_y)), pupil_size)
+
+    # Eye shine
+    pygame.draw.circle(surface, (255, 255, 255), (int(eye1_x - 1), int(eye1_y - 1)), 2)
+    pygame.draw.circle(surface, (255, 255, 255), (int(eye2_x - 1), int(eye2_y - 1)), 2)
+
+    # Enhanced tongue
+    if abs(x - end_x) > 5 or abs(y - end_y) > 5:
+        tongue_length = 20
+        tongue_x = x + math.cos(angle) * (thickness + tongue_length)
+        tongue_y = y + math.sin(angle) * (thickness + tongue_length)
+
+        # Forked tongue
+        fork_angle1 = angle + 0.3
+        fork_angle2 = angle - 0.3
+        fork_length = 8
+
+        fork1_x = tongue_x + math.cos(fork_angle1) * fork_length
+        fork1_y = tongue_y + math.sin(fork_angle1) * fork_length
+        fork2_x = tongue_x + math.cos(fork_angle2) * fork_length
+        fork2_y = tongue_y + math.sin(fork_angle2) * fork_length
+
+        # Main tongue
+        pygame.draw.line(surface, (200, 50, 50),
+                         (int(x + math.cos(angle) * thickness),
+                          int(y + math.sin(angle) * thickness)),
+                         (int(tongue_x), int(tongue_y)), 4)
+
+        # Fork tips
+        pygame.draw.line(surface, (255, 100, 100), (int(tongue_x), int(tongue_y)),
+                         (int(fork1_x), int(fork1_y)), 3)
+        pygame.draw.line(surface, (255, 100, 100), (int(tongue_x), int(tongue_y)),
+                         (int(fork2_x), int(fork2_y)), 3)
+
+
+class Segment(reptilecore.Segment):
+    __slots__ = ()
+
+    def draw(self, surface, invulnerable=False, now=0):
+        end_x, end_y = self.get_end()
+        thickness = self.get_thickness()
+
+        # Flash if invulnerable
+        if invulnerable and now % 200 < 100:
+            return
+
+        if self.index == 0:
+            draw_head(surface, self.x, self.y, self.angle, self.length, thickness)
+        else:
+            # Enhanced body segments with better gradients
+            progress = self.index / self.total_segments
+            base_r, base_g, base_b = 50, 180, 50
+
+            # Color variation along body
+            r = int(base_r - 20 * progress)
+            g = int(base_g - 40 * progress)
+            b = int(base_b - 20 * progress)
+
+            shadow_r = max(0, r - 30)
+            shadow_g = max(0, g - 30)
+            shadow_b = max(0, b - 30)
+
+            if thickness > 4:
+                perpendicular_angle = self.angle + math.pi / 2
+                half_thickness = thickness / 2
+
+                # Create segment points
+                corner1_x = self.x + math.cos(perpendicular_angle) * half_thickness
+                corner1_y = self.y + math.sin(perpendicular_angle) * half_thickness
+                corner2_x = self.x - math.cos(perpendicular_angle) * half_thickness
+                corner2_y = self.y - math.sin(perpendicular_angle) * half_thickness
+                corner3_x = end_x - math.cos(perpendicular_angle) * half_thickness
+                corner3_y = end_y - math.sin(perpendicular_angle) * half_thickness
+                corner4_x = end_x + math.cos(perpendicular_angle) * half_thickness
+                corner4_y = end_y + math.sin(perpendicular_angle) * half_thickness
+
+                # Draw shadow first
+                shadow_points = [(corner1_x + 2, corner1_y + 2), (corner2_x + 2, corner2_y + 2),
+                                 (corner3_x + 2, corner3_y + 2), (corner4_x + 2, corner4_y + 2)]
+                pygame.draw.polygon(surface, (shadow_r, shadow_g, shadow_b), shadow_points)
+
+                # Main body
+                points = [(corner1_x, corner1_y), (corner2_x, corner2_y),
+                          (corner3_x, corner3_y), (corner4_x, corner4_y)]
+                pygame.draw.polygon(surface, (r, g, b), points)
+
+                # End caps
+                pygame.draw.circle(surface, (r, g, b), (int(self.x), int(self.y)), int(half_thickness))
+                pygame.draw.circle(surface, (r, g, b), (int(end_x), int(end_y)), int(half_thickness))
+
+                # Scale pattern
+                if self.index % 3 == 0:
+                    scale_color = (min(255, r + 40), min(255, g + 40), min(255, b + 20))
+                    mid_x = (self.x + end_x) / 2
+                    mid_y = (self.y + end_y) / 2
+                    scale_size = max(3, thickness // 8)
+                    pygame.draw.circle(surface, scale_color, (int(mid_x), int(mid_y)), scale_size)
+
+
+# Body segments are drawn from sprites pre-rendered at this many headings;
+# at 128 the far end of an 18 px segment is off by under half a pixel.
+BODY_ANGLES = 128
+SPRITE_COLORKEY = (255, 0, 255)
+
+body_tables = LRUCache(maxsize=16)
+segment_sprites = LRUCache(maxsize=4096)
+
+
+def body_styles(total_segments):
+    """Per-index (thickness, colour, shadow, scale colour, scale size) of a
+    body of ``total_segments``; the same formulas as Segment.draw, vectorized"""
+    index = np.arange(total_segments)
+    progress = index / total_segments
+    thickness = (26 * (1 - index / max(1, total_segments - 1) * 0.6) + 8).astype(int)
+    color = np.stack([50 - 20 * progress, 180 - 40 * progress, 50 - 20 * progress], axis=1).astype(int)
+    shadow = np.maximum(0, color - 30)
+    scale = np.minimum(255, color + (40, 40, 20))
+    scale_size = np.where(index % 3 == 0, np.maximum(3, thickness // 8), 0)
+    styles = [(t, tuple(c), tuple(sh), tuple(sc), size) for t, c, sh, sc, size in
+              zip(thickness.tolist(), color.tolist(), shadow.tolist(), scale.tolist(), scale_size.tolist())]
+    styles[0] = None  # The head is drawn separately
+    return [style if style is None or style[0] > 4 else None for style in styles]
+
+
+def render_segment_sprite(style, length, angle_bin):
+    """One body segment (shadow, body, end caps, scale) with its start at the
+    returned offset from the sprite's top-left corner"""
+    thickness, color, shadow, scale_color, scale_size = style
+    angle = angle_bin * 2 * math.pi / BODY_ANGLES
+    half_thickness = thickness / 2
+    pad = int(length + half_thickness) + 3
+    sprite = pygame.Surface((2 * pad + 1, 2 * pad + 1))
+    sprite.fill(SPRITE_COLORKEY)
+
+    x = y = pad
+    end_x, end_y = x + math.cos(angle) * length, y + math.sin(angle) * length
+    across_x = math.cos(angle + math.pi / 2) * half_thickness
+    across_y = math.sin(angle + math.pi / 2) * half_thickness
+    points = [(x + across_x, y + across_y), (x - across_x, y - across_y),
+              (end_x - across_x, end_y - across_y), (end_x + across_x, end_y + across_y)]
+    pygame.draw.polygon(sprite, shadow, [(px + 2, py + 2) for px, py in points])
+    pygame.draw.polygon(sprite, color, points)
+    pygame.draw.circle(sprite, color, (x, y), int(half_thickness))
+    pygame.draw.circle(sprite, color, (int(end_x), int(end_y)), int(half_thickness))
+    if scale_size:
+        pygame.draw.circle(sprite, scale_color, (int((x + end_x) / 2), int((y + end_y) / 2)), scale_size)
+
+    sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+    bounds = sprite.get_bounding_rect()
+    return sprite.subsurface(bounds).copy(), (bounds.x - pad, bounds.y - pad)
+
+
+# Segments further off-screen than this are never drawn; past the edge they
+# can't be seen anyway, and a diverging body would overflow int pixel coords
+DRAW_LIMIT = 3 * max(screen_width, screen_height)
+
+
+def drawable(xs, ys):
+    """Mask of the points that are finite and within DRAW_LIMIT of the screen"""
+    return ((xs > -DRAW_LIMIT) & (xs < screen_width + DRAW_LIMIT)
+            & (ys > -DRAW_LIMIT) & (ys < screen_height + DRAW_LIMIT))
+
+
+class Snake(reptilecore.Snake):
+    segment_class = Segment
+
+    def get_draw_rects(self, chunk=32, alpha=1.0):
+        """Bounding boxes of everything draw() may paint, one per body chunk"""
+        n = self.count
+        xs, ys, _ = self.interpolated(alpha)
+        shown = drawable(xs, ys)
+        # NaN out what draw() skips; fmin/fmax ignore it, all-NaN chunks drop out below
+        xs, ys = np.where(shown, xs, np.nan), np.where(shown, ys, np.nan)
+        starts = np.arange(0, n, chunk)
+        bounds = np.stack([np.fmin.reduceat(xs, starts), np.fmin.reduceat(ys, starts),
+                           np.fmax.reduceat(xs, starts), np.fmax.reduceat(ys, starts)], axis=1)
+        # Body: half thickness, shadow offset and the reach to the segment end
+        margin = 40
+        rects = [pygame.Rect(x0 - margin, y0 - margin, x1 - x0 + 2 * margin, y1 - y0 + 2 * margin)
+                 for x0, y0, x1, y1 in bounds[np.isfinite(bounds).all(axis=1)].tolist()]
+        # Head: radius 32 plus the forked tongue
+        head_margin = 64
+        if shown[0]:
+            rects.append(pygame.Rect(xs[0] - head_margin, ys[0] - head_margin, 2 * head_margin, 2 * head_margin))
+        return rects
+
+    def draw(self, surface, invulnerable=False, now=0, alpha=1.0):
+        """Tail first, so nearer segments overlap those behind them. The body
+        is one batched blit of cached segment sprites; only the head is drawn
+        primitive by primitive. ``alpha`` < 1 draws the body that far between
+        the previous tick and this one (see Snake.interpolated)"""
+        if invulnerable and now % 200 < 100:
+            return
+        n = self.count
+        length = self.segment_length
+        styles = body_tables.get(n, lambda: body_styles(n))
+        xs, ys, angles = self.interpolated(alpha)
+        shown = drawable(xs, ys) & np.isfinite(angles)
+        bins = np.zeros(n, dtype=int)
+        bins[shown] = np.rint(angles[shown] * (BODY_ANGLES / (2 * math.pi))).astype(int) % BODY_ANGLES
+        order = np.flatnonzero(shown[1:])[::-1] + 1
+
+        blits = []
+        for i, x, y, angle_bin in zip(order.tolist(), xs[order].astype(int).tolist(),
+                                      ys[order].astype(int).tolist(), bins[order].tolist()):
+            style = styles[i]
+            if style is None:
+                continue
+            key = (style, length, angle_bin)
+            sprite, (dx, dy) = segment_sprites.get(key, lambda: render_segment_sprite(*key))
+            blits.append((sprite, (x + dx, y + dy)))
+        surface.blits(blits, doreturn=False)
+
+        if shown[0]:
+            draw_head(surface, float(xs[0]), float(ys[0]), float(angles[0]), length)
+
+
+def vertical_gradient(size, top, bottom):
+    width, height = size
+    surface = pygame.Surface(size)
+    for y in range(height):
+        color_ratio = y / height
+        color = tuple(int(a + (b - a) * color_ratio) for a, b in zip(top, bottom))
+        pygame.draw.line(surface, color, (0, y), (width, y))
+    return surface
+
+
+# Resolution of the grass animation lookup tables (steps per 2*pi cycle)
+GRASS_LUT_SIZE = 256
+
+
+class BackgroundLayers:
+    """Background layers for one resolution.
+
+    The menu and game-over gradients never change, so they are rendered once.
+    The grass field is a persistent surface: each frame the dot sizes and
+    colours are looked up from small integer tables and only the dots whose
+    value actually changed are repainted.
+    """
+    base_color = (25, 35, 25)
+
+    def __init__(self, size):
+        self.size = size
+        self.menu = vertical_gradient(size, (20, 40, 20), (40, 80, 40))
+        self.game_over = vertical_gradient(size, (60, 20, 20), (20, 20, 20))
+
+        self.grass = pygame.Surface(size)
+        self.grass.fill(self.base_color)
+
+        width, height = size
+        points = [(i, j) for i in range(0, width, 40) for j in range(0, height, 40) if (i + j) % 80 == 0]
+        self.dot_x = np.array([p[0] for p in points])
+        self.dot_y = np.array([p[1] for p in points])
+
+        phase = np.arange(GRASS_LUT_SIZE) * (2 * math.pi / GRASS_LUT_SIZE)
+        self.radius_lut = (3 + np.sin(phase)).astype(np.int64)
+        self.red_lut = 30 + (np.sin(phase) * 10).astype(np.int64)
+        self.green_lut = 45 + (np.cos(phase) * 10).astype(np.int64)
+
+        # Per-dot phase offsets, in table steps
+        steps = GRASS_LUT_SIZE / (2 * math.pi)
+        self.radius_offset = np.round((self.dot_x + self.dot_y) * 0.01 * steps).astype(np.int64)
+        self.red_offset = np.round(self.dot_x * 0.02 * steps).astype(np.int64)
+        self.green_offset = np.round(self.dot_y * 0.02 * steps).astype(np.int64)
+
+        self.frame = None
+        self.changed_rects = []
+        self.radius = np.zeros(len(points), dtype=np.int64)
+        self.red = np.zeros(len(points), dtype=np.int64)
+        self.green = np.zeros(len(points), dtype=np.int64)
+
+    def grass_layer(self, now):
+        """Grass field at simulation time ``now`` (ms)"""
+        frame = int(now * 0.001 * GRASS_LUT_SIZE / (2 * math.pi)) % GRASS_LUT_SIZE
+        self.changed_rects = []
+        if frame == self.frame:
+            return self.grass
+        self.frame = frame
+
+        radius = self.radius_lut[(frame + self.radius_offset) % GRASS_LUT_SIZE]
+        red = self.red_lut[(frame + self.red_offset) % GRASS_LUT_SIZE]
+        green = self.green_lut[(frame + self.green_offset) % GRASS_LUT_SIZE]
+        changed = np.flatnonzero((radius != self.radius) | (red != self.red) | (green != self.green))
+
+        for k in changed.tolist():
+            x, y = int(self.dot_x[k]), int(self.dot_y[k])
+            # Dots are far apart, so clearing the dot's bounding box is safe
+            self.grass.fill(self.base_color, (x - 5, y - 5, 11, 11))
+            self.changed_rects.append(pygame.Rect(x - 5, y - 5, 11, 11))
+            pygame.draw.circle(self.grass, (int(red[k]), int(green[k]), 30), (x, y), int(radius[k]))
+
+        self.radius, self.red, self.green = radius, red, green
+        return self.grass
+
+
+_backgrounds = {}
+
+
+def get_background(size):
+    """BackgroundLayers for a resolution, built on first use"""
+    if size not in _backgrounds:
+        _backgrounds[size] = BackgroundLayers(size)
+    return _backgrounds[size]
+
+
+def draw_particles(surface, particles):
+    """Blend every live particle into ``surface`` with array operations.
+
+    Particles are squares that shrink and fade out over their lifetime. On
+    32-bit surfaces all their pixels are gathered, blended (red and blue
+    together in one integer multiply, then green) and scattered back through
+    a flat view of the packed pixels, instead of one draw call per particle.
+    Particles whose square pokes off the surface are skipped.
+    """
+    live = particles.live()
+    if not len(live):
+        return
+    fade = particles.life[live] / particles.max_life[live]
+    size = np.ceil(particles.size[live] * fade).astype(np.int32)
+    x, y = particles.x[live], particles.y[live]
+    width, height = surface.get_size()
+    with np.errstate(invalid='ignore'):
+        visible = (size > 0) & (x >= 0) & (y >= 0) & (x + size <= width) & (y + size <= height)
+    # Largest first, so the particles covering any given offset are a prefix
+    order = np.flatnonzero(visible)[np.argsort(-size[visible], kind='stable')]
+    if not len(order):
+        return
+    live, fade, size = live[order], fade[order], size[order]
+    x, y = x[order].astype(np.int32), y[order].astype(np.int32)
+    alpha = (np.minimum(fade * 1.5, 1.0) * 256).astype(np.uint32)
+    color = particles.color[live]
+
+    if surface.get_bytesize() != 4 or surface.get_shifts()[1] != 8:
+        for i in range(len(live)):
+            pygame.draw.rect(surface, color[i], (x[i], y[i], size[i], size[i]))
+        return
+
+    # Per particle: colour packed in the surface's layout, premultiplied by alpha
+    shifts = surface.get_shifts()
+    packed = (color[:, 0].astype(np.uint32) << shifts[0]) | (color[:, 1].astype(np.uint32) << shifts[1]) \
+        | (color[:, 2].astype(np.uint32) << shifts[2])
+    source_rb = (packed & 0xFF00FF) * alpha
+    source_g = (packed & 0x00FF00) * alpha
+    keep_weight = 256 - alpha
+    stride = surface.get_pitch() // 4
+    base = y * stride + x
+
+    # One entry per covered pixel, built from prefixes of the per-particle arrays
+    smallest_first = size[::-1]
+    parts = []
+    for dx in range(int(size[0])):
+        for dy in range(int(size[0])):
+            n = len(size) - np.searchsorted(smallest_first, max(dx, dy), side='right')
+            parts.append((n, dy * stride + dx))
+    index = np.concatenate([base[:n] + offset for n, offset in parts])
+    weight = np.concatenate([keep_weight[:n] for n, _ in parts])
+    rb_in = np.concatenate([source_rb[:n] for n, _ in parts])
+    g_in = np.concatenate([source_g[:n] for n, _ in parts])
+
+    view = surface.get_view('1')
+    pixels = np.frombuffer(view, dtype=np.uint32)
+    under = pixels[index]
+    rb = (((under & 0xFF00FF) * weight + rb_in) >> 8) & 0xFF00FF
+    g = (((under & 0x00FF00) * weight + g_in) >> 8) & 0x00FF00
+    pixels[index] = (under & 0xFF000000) | rb | g
+    del pixels, view  # Unlock the surface
+
+
+def particle_rect(particles):
+    """Bounding rect of the live particles, or None"""
+    live = particles.live()
+    if not len(live):
+        return None
+    x, y = particles.x[live], particles.y[live]
+    keep = drawable(x, y)
+    if not keep.any():
+        return None
+    x, y = x[keep], y[keep]
+    pad = int(particles.size[live].max()) + 1
+    left, top = int(x.min()) - 1, int(y.min()) - 1
+    return pygame.Rect(left, top, int(x.max()) - left + pad, int(y.max()) - top + pad).clip(
+        (0, 0, screen_width, screen_height))
+
+
+class DirtyRectRenderer:
+    """Alternative to a full repaint + flip that only touches changed regions.
+
+    While playing, the regions covered by the snake, food and HUD on the
+    previous and current frame are restored from the grass layer and redrawn,
+    and only those rects are pushed to the display. Menu, pause and game over
+    screens are static, so after their first frame nothing is redrawn at all.
+    Anything that changes the whole screen (state change, new level, resize)
+    triggers one full repaint.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.key = None
+        self.previous = []
+        self.overlay = None  # Panel drawn over the last frame, restored like a sprite
+
+    def sprite_rects(self):
+        game = self.game
+        rects = [food.get_draw_rect() for food in game.food_list]
+        rects.extend(game.snake.get_draw_rects(alpha=game.render_alpha()))
+        particles = particle_rect(game.particles)
+        if particles:
+            rects.append(particles)
+        rects.extend(game.ui_rects())
+        return rects
+
+    def render(self, surface):
+        """Draw the frame and return the list of rects that need updating"""
+        game = self.game
+        key = (game.state, game.stats.level, surface.get_size())
+        if key != self.key:
+            self.key = key
+            game.draw(surface)
+            self.previous = self.sprite_rects() if game.state == "playing" else []
+            return [surface.get_rect()]
+
+        if game.state != "playing":
+            return []
+
+        now = game.clock.get_ticks()
+        background = get_background(surface.get_size())
+        grass = background.grass_layer(now)
+
+        current = self.sprite_rects()
+        dirty = self.previous + current + background.changed_rects
+        if self.overlay:
+            dirty.append(self.overlay)
+        for rect in dirty:
+            surface.blit(grass, rect, rect)
+        profiler = game.profiler
+        if profiler:
+            profiler.mark('background')
+
+        # Obstacles are cheap cached blits; repainting all of them keeps any
+        # restored region underneath them correct.
+        for obstacle in game.obstacles:
+            obstacle.draw(surface)
+        if profiler:
+            profiler.mark('obstacles')
+        for food in game.food_list:
+            food.draw(surface, game.fx_rng)
+        if profiler:
+            profiler.mark('food')
+        game.snake.draw(surface, game.stats.invulnerable_timer > 0, now, game.render_alpha())
+        if profiler:
+            profiler.mark('snake_draw')
+        draw_particles(surface, game.particles)
+        if profiler:
+            profiler.mark('particles')
+        game.draw_ui(surface)
+        if profiler:
+            profiler.mark('ui')
+
+        self.previous = current
+        return dirty
+
+
+class Game(reptilecore.Game):
+    snake_class = Snake
+    food_class = Food
+    obstacle_class = Obstacle
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('state', "menu")
+        kwargs.setdefault('persist', True)
+        super().__init__(**kwargs)
+
+    def draw_speed_meter(self, surface):
+        """Draw a visual speed meter"""
+        meter_x = screen_width - 200
+        meter_y = 50
+        meter_width = 150
+        meter_height = 20
+
+        # Background
+        pygame.draw.rect(surface, (50, 50, 50), (meter_x, meter_y, meter_width, meter_height))
+        pygame.draw.rect(surface, (100, 100, 100), (meter_x, meter_y, meter_width, meter_height), 2)
+
+        # Speed fill
+        current_speed = self.stats.get_current_speed()
+        speed_ratio = (current_speed - self.stats.base_speed) / (self.stats.max_speed - self.stats.base_speed)
+        fill_width = int(meter_width * speed_ratio)
+
+        if fill_width > 0:
+            # Color gradient based on speed
+            if speed_ratio < 0.3:
+                color = (0, 255, 0)  # Green
+            elif speed_ratio < 0.7:
+                color = (255, 255, 0)  # Yellow
+            else:
+                color = (255, 100, 0)  # Orange-red
+
+            pygame.draw.rect(surface, color, (meter_x, meter_y, fill_width, meter_height))
+
+        # Label
+        speed_text = render_text(small_font, "SPEED", (255, 255, 255))
+        surface.blit(speed_text, (meter_x, meter_y - 25))
+
+    def ui_rects(self):
+        """Screen regions draw_ui may paint"""
+        return [pygame.Rect(5, 5, 300, 180),  # Stats panel
+                pygame.Rect(350, 10, 320, 40),  # Power-up banner
+                pygame.Rect(screen_width - 200, 25, 150, 45),  # Speed meter
+                pygame.Rect(screen_width - 185, 80, 185, 35)]  # High score
+
+    def high_score_label(self):
+        """The high score for display, held back until the stored one has loaded"""
+        return f"{self.stats.high_score:,}" if self.stats.high_score_loaded else "..."
+
+    def draw_ui(self, surface):
+        # Enhanced UI with better layout and styling
+        # Background panel
+        surface.blit(get_panel((300, 180), (0, 0, 0, 120)), (5, 5))
+
+        # Score and stats with better formatting
+        score_text = render_text(font, f"Score: {self.stats.score:,}", (255, 255, 100))
+        level_text = render_text(font, f"Level: {self.stats.level}", (100, 255, 100))
+        lives_text = render_text(font, f"Lives: {'♥' * self.stats.lives}", (255, 100, 100))
+        food_text = render_text(small_font, f"Food Remaining: {len(self.food_list)}", (255, 255, 255))
+        length_text = render_text(small_font, f"Snake Length: {len(self.snake.segments)}", (200, 200, 255))
+
+        # Speed info
+        current_speed = self.stats.get_current_speed()
+        speed_percentage = int((current_speed / self.stats.max_speed) * 100)
+        speed_text = render_text(small_font, f"Speed: {speed_percentage}%", (255, 200, 100))
+
+        surface.blit(score_text, (15, 15))
+        surface.blit(level_text, (15, 50))
+        surface.blit(lives_text, (15, 85))
+        surface.blit(food_text, (15, 115))
+        surface.blit(length_text, (15, 135))
+        surface.blit(speed_text, (15, 155))
+
+        # Power-up indicator with enhanced effects
+        if self.stats.power_up_timer > 0:
+            surface.blit(get_panel((200, 30), (138, 43, 226, 150)), (350, 10))
+
+            power_text = render_text(font, "⚡ SPEED BOOST! ⚡", (255, 255, 255))
+            surface.blit(power_text, (360, 15))
+
+        # Speed meter
+        self.draw_speed_meter(surface)
+
+        # High score with better positioning
+        surface.blit(get_panel((180, 30), (0, 0, 0, 120)), (screen_width - 185, 80))
+
+        high_score_text = render_text(small_font, f"High Score: {self.high_score_label()}", (255, 215, 0))
+        surface.blit(high_score_text, (screen_width - 180, 90))
+
+    def draw_menu(self, surface):
+        # Enhanced menu with gradient background
+        surface.blit(get_background(surface.get_size()).menu, (0, 0))
+
+        title = render_text(big_font, "🐍 SNAKE ADVENTURE 🐍", (50, 255, 50))
+        subtitle = render_text(font, "The Ultimate Slither Experience", (255, 255, 255))
+
+        instructions = [
+            "🎯 Click anywhere to guide your snake",
+            "🍎 Red food: Basic growth and points",
+            "🟡 Gold food: Bonus points and extra growth",
+            "🟣 Purple food: Speed boost power-up",
+            "⚠️ Avoid walls, rocks, and yourself",
+            "🏆 Clear all food to advance levels",
+            "🚀 Snake gets faster as you eat more!",
+            "",
+            "🎮 Click anywhere to start your adventure!"
+        ]
+
+        title_rect = title.get_rect(center=(screen_width // 2, 120))
+        subtitle_rect = subtitle.get_rect(center=(screen_width // 2, 170))
+
+        surface.blit(title, title_rect)
+        surface.blit(subtitle, subtitle_rect)
+
+        y_offset = 230
+        for instruction in instructions:
+            if instruction:
+                color = (200, 200, 200) if not instruction.startswith("🎮") else (100, 255, 100)
+                text = render_text(small_font, instruction, color)
+                text_rect = text.get_rect(center=(screen_width // 2, y_offset))
+                surface.blit(text, text_rect)
+            y_offset += 35
+
+    def draw_game_over(self, surface):
+        # Enhanced game over screen
+        surface.blit(get_background(surface.get_size()).game_over, (0, 0))
+
+        game_over_text = render_text(big_font, "💀 GAME OVER 💀", (255, 100, 100))
+        final_score = render_text(font, f"Final Score: {self.stats.score:,}", (255, 255, 255))
+        level_reached = render_text(font, f"Level Reached: {self.stats.level}", (255, 255, 255))
+        length_reached = render_text(font, f"Max Length: {len(self.snake.segments)}", (200, 200, 255))
+        food_eaten = render_text(font, f"Food Consumed: {self.stats.food_eaten}", (100, 255, 100))
+        high_score = render_text(font, f"High Score: {self.high_score_label()}", (255, 215, 0))
+
+        if self.stats.score == self.stats.high_score and self.stats.score > 0:
+            new_record = render_text(medium_font, "🎉 NEW HIGH SCORE! 🎉", (255, 215, 0))
+        else:
+            new_record = None
+
+        restart_text = render_text(small_font, "Press R to restart or ESC for menu", (200, 200, 200))
+
+        game_over_rect = game_over_text.get_rect(center=(screen_width // 2, 200))
+        final_score_rect = final_score.get_rect(center=(screen_width // 2, 280))
+        level_rect = level_reached.get_rect(center=(screen_width // 2, 320))
+        length_rect = length_reached.get_rect(center=(screen_width // 2, 360))
+        food_rect = food_eaten.get_rect(center=(screen_width // 2, 400))
+        high_score_rect = high_score.get_rect(center=(screen_width // 2, 440))
+        restart_rect = restart_text.get_rect(center=(screen_width // 2, 520))
+
+        surface.blit(game_over_text, game_over_rect)
+        surface.blit(final_score, final_score_rect)
+        surface.blit(level_reached, level_rect)
+        surface.blit(length_reached, length_rect)
+        surface.blit(food_eaten, food_rect)
+        surface.blit(high_score, high_score_rect)
+        surface.blit(restart_text, restart_rect)
+
+        if new_record:
+            new_record_rect = new_record.get_rect(center=(screen_width // 2, 480))
+            surface.blit(new_record, new_record_rect)
+
+    def draw(self, surface):
+        """Render the current state onto any surface (window or offscreen)"""
+        if self.state == "menu":
+            self.draw_menu(surface)
+        elif self.state == "game_over":
+            self.draw_game_over(surface)
+        else:
+            profiler = self.profiler
+
+            # Enhanced game background with animated grass
+            now = self.clock.get_ticks()
+            surface.blit(get_background(surface.get_size()).grass_layer(now), (0, 0))
+            if profiler:
+                profiler.mark('background')
+
+            # Draw obstacles
+            for obstacle in self.obstacles:
+                obstacle.draw(surface)
+            if profiler:
+                profiler.mark('obstacles')
+
+            # Draw food
+            for food in self.food_list:
+                food.draw(surface, self.fx_rng)
+            if profiler:
+                profiler.mark('food')
+
+            # Draw snake
+            self.snake.draw(surface, self.stats.invulnerable_timer > 0, now, self.render_alpha())
+            if profiler:
+                profiler.mark('snake_draw')
+
+            # Draw particle effects
+            draw_particles(surface, self.particles)
+            if profiler:
+                profiler.mark('particles')
+
+            # Draw UI
+            self.draw_ui(surface)
+            if profiler:
+                profiler.mark('ui')
+
+            # Paused overlay
+            if self.state == "paused":
+                surface.blit(get_panel((screen_width, screen_height), (0, 0, 0, 180)), (0, 0))
+
+                paused_text = render_text(big_font, "⏸️ PAUSED ⏸️", (255, 255, 255))
+                paused_rect = paused_text.get_rect(center=(screen_width // 2, screen_height // 2))
+                surface.blit(paused_text, paused_rect)
+
+                resume_text = render_text(small_font, "Click to resume or press ESC for menu", (200, 200, 200))
+                resume_rect = resume_text.get_rect(center=(screen_width // 2, screen_height // 2 + 50))
+                surface.blit(resume_text, resume_rect)
+
+    def draw_profiler_overlay(self, surface):
+        """Frame-time breakdown from the attached profiler (toggled with F3);
+        returns the rect it covers"""
+        profiler = self.profiler
+        averages = profiler.averages()
+        percentiles = profiler.percentiles()
+        lines = [f"FPS {clock.get_fps():5.1f}   frame p50 {percentiles[50]:.2f}  "
+                 f"p95 {percentiles[95]:.2f}  p99 {percentiles[99]:.2f} ms"]
+        for phase in ('input', 'snake_update', 'update_game', 'background', 'obstacles',
+                      'food', 'snake_draw', 'particles', 'ui', 'present'):
+            if phase in averages:
+                lines.append(f"{phase:<13}{averages[phase]:7.3f} ms")
+        for counter in ('segments', 'food_items', 'draw_calls', 'surfaces', 'text_renders'):
+            if counter in averages:
+                lines.append(f"{counter:<13}{averages[counter]:7.1f}")
+
+        # Rendered directly rather than through render_text so the changing
+        # numbers do not churn the HUD text cache.
+        height = 18 * len(lines) + 10
+        panel = surface.blit(get_panel((260, height), (0, 0, 0, 170)),
+                             (screen_width - 265, screen_height - height - 5))
+        for i, line in enumerate(lines):
+            text = small_font.render(line, True, (180, 255, 180))
+            surface.blit(text, (screen_width - 258, screen_height - height + i * 18))
+        return panel
+
+    def run(self, dirty_rects=False, profile_path=None, record_path=None, max_fps=MAX_FPS,
+            telemetry_path=None, spectate_port=None):
+        if screen is None:
+            init_display()
+        renderer = DirtyRectRenderer(self) if dirty_rects else None
+        recorder = ReplayWriter(record_path, self) if record_path else None
+        if telemetry_path:
+            self.telemetry = TelemetryWriter(telemetry_path)
+        if spectate_port is not None:
+            self.spectators = SpectatorServer(port=spectate_port).start()
+
+        # The profiler only exists while the overlay is shown or a trace was
+        # requested; otherwise every hook below is a single falsy check.
+        show_overlay = False
+        uninstall_counters = None
+        canvas = None
+        if profile_path:
+            self.profiler = FrameProfiler()
+            uninstall_counters = install_draw_counters(self.profiler)
+            canvas = counting_canvas(screen)
+        running = True
+        pending = []  # Input waiting for the next tick
+        frame_time = reptilecore.TICK_DT
+        clock.tick()
+
+        while running:
+            profiler = self.profiler
+            if profiler:
+                profiler.begin_frame()
+                text_misses = text_cache.misses
+
+            actions = pending
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+
+                elif event.type == pygame.KEYDOWN:
+                    if event.key in KEY_ACTIONS:
+                        actions.append(KEY_ACTIONS[event.key])
+
+                    elif event.key == pygame.K_F3:
+                        show_overlay = not show_overlay
+                        if renderer:
+                            renderer.key = None  # Repaint to add/remove the overlay
+                            renderer.overlay = None
+                        if show_overlay and not self.profiler:
+                            self.profiler = FrameProfiler()
+                            uninstall_counters = install_draw_counters(self.profiler)
+                            canvas = counting_canvas(screen)
+                        elif not show_overlay and not profile_path:
+                            uninstall_counters()
+                            self.profiler = None
+                            canvas = None
+
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    actions.append("click")
+
+            if profiler:
+                profiler.mark('input')
+
+            # Game time advances in fixed ticks however often we draw: a slow
+            # frame runs several, a fast one may run none. Input is applied at
+            # the start of the next tick and logged per tick, through
+            # handle_input, so a recording replays exactly.
+            mouse = pygame.mouse.get_pos()
+            ticks = self.due_ticks(frame_time, MAX_TICKS_PER_FRAME)
+            for _ in range(ticks):
+                if recorder:
+                    recorder.record(actions, mouse)
+                for action in actions:
+                    self.handle_input(action)
+                actions = []
+                self.tick(mouse)
+            pending = actions
+
+            # Draw everything (while counting draw calls, on the canvas)
+            target = screen if canvas is None else canvas
+            if renderer:
+                rects = renderer.render(target)
+                if show_overlay and profiler:
+                    panel = self.draw_profiler_overlay(target)
+                    if self.state == "playing":
+                        # Restore what is under the panel before it is blended again
+                        renderer.overlay = panel
+                        rects = rects + [panel]
+                    else:
+                        # Static screens restore nothing, so repaint them whole
+                        renderer.key = None
+                        rects = [screen.get_rect()]
+                if canvas is not None:
+                    for rect in rects:
+                        screen.blit(canvas, rect, rect)
+                if rects:
+                    pygame.display.update(rects)
+            else:
+                self.draw(target)
+                if show_overlay and profiler:
+                    self.draw_profiler_overlay(target)
+                if canvas is not None:
+                    screen.blit(canvas, (0, 0))
+                pygame.display.flip()
+
+            if profiler:
+                profiler.mark('present')
+                profiler.end_frame(segments=self.snake.count, food_items=len(self.food_list),
+                                   text_renders=text_cache.misses - text_misses, ticks=ticks)
+            frame_time = clock.tick(max_fps) / 1000
+
+        if recorder:
+            recorder.close()
+        if self.telemetry:
+            self.telemetry.close()
+        if self.spectators:
+            self.spectators.stop()
+        if profile_path:
+            self.profiler.export(profile_path)
+        if uninstall_counters:
+            uninstall_counters()
+        pygame.quit()
+        sys.exit()
+
+
+# Run the game
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snake Adventure - The Ultimate Slither")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only redraw changed screen regions (for low-power hardware)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="record per-frame timings and write them to PATH (.json or .csv) on exit")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record the session's input to a replay file (see reptilereplay.py)")
+    parser.add_argument("--fps", type=int, default=MAX_FPS,
+                        help="cap on frames drawn per second, 0 for none (the game itself always runs at 60 ticks/s)")
+    parser.add_argument("--telemetry", metavar="PATH",
+                        help="share per-tick game state through a ring buffer file (see reptiletelemetry.py)")
+    parser.add_argument("--spectate", type=int, metavar="PORT",
+                        help="stream the game to viewers on PORT (see reptilecast.py)")
+    args = parser.parse_args()
+
+    game = Game()
+    game.run(dirty_rects=args.dirty_rects, profile_path=args.profile, record_path=args.record,
+             max_fps=args.fps, telemetry_path=args.telemetry, spectate_port=args.spectate)
@@ -0,0 +1,176 @@
+"""Background persistence for high scores, session stats and the leaderboard.
+
+All file I/O for a ``ScoreStore`` runs on one worker thread, so the game
+loop never waits on the disk; every call returns a ``Future``. JSON files are
+replaced atomically (temp file, fsync, rename), so a crash leaves either the
+old or the new file, never a truncated one. Each finished game is appended
+to a JSON Lines session log, and the best ``leaderboard_size`` sessions are
+kept in a sorted leaderboard that is only read from disk (or rebuilt from
+the log) the first time it is needed.
+"""
+import atexit
+import bisect
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+def atomic_write_json(path, data):
+    """Replace ``path`` with ``data`` as JSON, all or nothing"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+def read_json(path, default=None):
+    """Contents of a JSON file, or ``default`` if it is missing or unreadable"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable %s: %s", path, e)
+        return default
+
+
+class Leaderboard:
+    """Best sessions, kept sorted by score (best first) for binary-search ranks"""
+    def __init__(self, entries=(), size=100):
+        self.size = size
+        self.entries = sorted(entries, key=lambda entry: -entry['score'])[:size]
+        self._keys = [-entry['score'] for entry in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rank(self, score):
+        """1-based position a session scoring ``score`` would take"""
+        return bisect.bisect_left(self._keys, -score) + 1
+
+    def insert(self, entry):
+        """Add a session; returns its rank, or None if it didn't make the board"""
+        position = bisect.bisect_right(self._keys, -entry['score'])
+        if position >= self.size:
+            return None
+        self._keys.insert(position, -entry['score'])
+        self.entries.insert(position, entry)
+        del self._keys[self.size:], self.entries[self.size:]
+        return position + 1
+
+    def top(self, n=10):
+        return self.entries[:n]
+
+
+class ScoreStore:
+    """High score, session log and leaderboard files in ``directory``"""
+    def __init__(self, directory='.', leaderboard_size=100):
+        self.high_score_path = os.path.join(directory, 'high_score.json')
+        self.log_path = os.path.join(directory, 'sessions.jsonl')
+        self.leaderboard_path = os.path.join(directory, 'leaderboard.json')
+        self.leaderboard_size = leaderboard_size
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reptilestore')
+        self._board = None  # Only touched on the worker thread
+        atexit.register(self.close)
+
+    def _submit(self, fn, *args):
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._report)
+        return future
+
+    @staticmethod
+    def _report(future):
+        if not future.cancelled() and future.exception() is not None:
+            log.error("Score persistence failed", exc_info=future.exception())
+
+    def load_high_score(self):
+        return self._submit(self._read_high_score)
+
+    def _read_high_score(self):
+        data = read_json(self.high_score_path, {})
+        return data.get('high_score', 0) if isinstance(data, dict) else 0
+
+    def save_high_score(self, score):
+        """Store ``score`` unless the file already holds a better one"""
+        return self._submit(self._write_high_score, score)
+
+    def _write_high_score(self, score):
+        if score > self._read_high_score():
+            atomic_write_json(self.high_score_path, {'high_score': score})
+
+    def record_session(self, **session):
+        """Append a finished game to the log and the leaderboard; the Future
+        resolves to its leaderboard rank (or None)"""
+        session.setdefault('time', time.time())
+        return self._submit(self._write_session, session)
+
+    def _write_session(self, session):
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(session) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        rank = self._leaderboard().insert(session)
+        if rank is not None:
+            atomic_write_json(self.leaderboard_path, {'entries': self._board.entries})
+        return rank
+
+    def leaderboard(self):
+        """Future resolving to a copy of the leaderboard, loaded on first use"""
+        return self._submit(lambda: Leaderboard(self._leaderboard().entries, self.leaderboard_size))
+
+    def _leaderboard(self):
+        if self._board is None:
+            data = read_json(self.leaderboard_path)
+            if isinstance(data, dict):
+                entries = data.get('entries', [])
+            else:
+                entries = self._read_log()
+            self._board = Leaderboard(entries, self.leaderboard_size)
+        return self._board
+
+    def _read_log(self):
+        """Every well-formed session in the log (for rebuilding the board)"""
+        sessions = []
+        try:
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        sessions.append(json.loads(line))
+                    except ValueError:
+                        continue  # A line cut short by a crash
+        except FileNotFoundError:
+            pass
+        return [session for session in sessions if isinstance(session, dict) and 'score' in session]
+
+    def flush(self):
+        """Block until everything submitted so far has been written"""
+        self.executor.submit(lambda: None).result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+_default_store = None
+
+
+def default_store():
+    """Store in the working directory, shared by every persisting game"""
+    global _default_store
+    if _default_store is None:
+        _default_store = ScoreStore()
+    return _default_store
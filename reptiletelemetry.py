@@ -0,0 +1,239 @@
+"""Shared-memory telemetry for Snake Adventure.
+
+A ``TelemetryWriter`` set as ``Game.telemetry`` stores one fixed-layout
+record per simulation tick in a ring buffer inside a memory-mapped file, so
+other local processes can follow the live game without slowing it down:
+writing a record is one ``struct.pack_into`` into the mapping and two 8-byte
+stores, with no syscall, lock or flush. File layout (little-endian)::
+
+    header   b'RTEL', u16 version, u16 record size, u32 capacity, u32 0,
+             u64 records written, zero padding to HEADER_SIZE bytes
+    slots    capacity x record (RECORD_FIELDS); record n (from 1) lives in
+             slot (n - 1) % capacity and ends with its own number n
+
+The writer stores a record's fields, then its number, then the new count in
+the header; the number and the count go through aligned 8-byte NumPy views,
+so each is a single store that a reader never sees half-written.
+``TelemetryReader`` maps the same file read-only, views the slots as a NumPy
+structured array without copying, and when it copies records out it
+re-reads the count afterwards, so a slot the writer came round to mid-copy
+is dropped rather than returned half old, half new.
+
+A new writer replaces the file rather than overwriting it; readers opened
+before that keep the old mapping, and ``replaced`` tells them to reopen::
+
+    python reptiletelemetry.py game.tel     # follow a running game
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import reptilecore
+
+
+MAGIC = b'RTEL'
+VERSION = 1
+HEADER_SIZE = 64
+DEFAULT_CAPACITY = 4096  # About 68 s of ticks
+
+_HEADER = struct.Struct('<4sHHII')
+_COUNT_OFFSET = 16
+
+# (name, struct code); a None name is padding. The record number comes last.
+RECORD_FIELDS = (
+    ('seed', 'Q'), ('tick', 'Q'), ('head_x', 'd'), ('head_y', 'd'), ('score', 'q'),
+    ('heading', 'f'), ('speed', 'f'), ('segments', 'I'), ('level', 'I'), ('lives', 'i'),
+    ('food_eaten', 'I'), ('food_left', 'I'), ('power_up_timer', 'i'),
+    ('invulnerable_timer', 'i'), ('events', 'I'), ('state', 'B'), (None, '7x'),
+    ('sequence', 'Q'),
+)
+_DTYPE_CODES = {'Q': '<u8', 'q': '<i8', 'd': '<f8', 'f': '<f4', 'I': '<u4', 'i': '<i4', 'B': 'u1'}
+
+_RECORD = struct.Struct('<' + ''.join(code for _, code in RECORD_FIELDS))
+_FIELDS = struct.Struct('<' + ''.join(code for _, code in RECORD_FIELDS[:-1]))
+RECORD_SIZE = _RECORD.size
+
+
+def _views(buffer, capacity):
+    """(count, sequences): one-element view of the header count and a
+    strided view of every slot's record number"""
+    count = np.ndarray(1, '<u8', buffer, _COUNT_OFFSET)
+    sequences = np.ndarray(capacity, '<u8', buffer, HEADER_SIZE + _FIELDS.size, (RECORD_SIZE,))
+    return count, sequences
+
+
+def _record_dtype():
+    names, formats, offsets = [], [], []
+    offset = 0
+    for name, code in RECORD_FIELDS:
+        if name is not None:
+            names.append(name)
+            formats.append(_DTYPE_CODES[code])
+            offsets.append(offset)
+        offset += struct.calcsize('<' + code)
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': offset})
+
+
+RECORD_DTYPE = _record_dtype()
+
+STATE_CODES = {name: code for code, name in enumerate(reptilecore.GAME_STATES)}
+
+EVENTS = {
+    'food': reptilecore.EVENT_FOOD,
+    'power_up': reptilecore.EVENT_POWER_UP,
+    'level_up': reptilecore.EVENT_LEVEL_UP,
+    'hit_wall': reptilecore.EVENT_HIT_WALL,
+    'hit_obstacle': reptilecore.EVENT_HIT_OBSTACLE,
+    'hit_self': reptilecore.EVENT_HIT_SELF,
+    'life_lost': reptilecore.EVENT_LIFE_LOST,
+    'game_over': reptilecore.EVENT_GAME_OVER,
+}
+
+
+def event_names(events):
+    """Names of the EVENTS bits set in ``events``"""
+    return [name for name, bit in EVENTS.items() if events & bit]
+
+
+class TelemetryWriter:
+    """Ring buffer of per-tick records in a new file at ``path``"""
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.count = 0
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+        # Built under a temporary name so readers never map a half-made file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix='.' + os.path.basename(path), suffix='.tmp')
+        try:
+            os.ftruncate(fd, size)
+            self.buffer = mmap.mmap(fd, size)
+            _HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, RECORD_SIZE, capacity, 0)
+            self._count, self._sequences = _views(self.buffer, capacity)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        finally:
+            os.close(fd)
+
+    def write(self, game):
+        """Append the state of ``game`` after the tick it just ran"""
+        n = self.count + 1
+        slot = self.count % self.capacity
+        offset = HEADER_SIZE + slot * RECORD_SIZE
+        snake, stats = game.snake, game.stats
+        _FIELDS.pack_into(self.buffer, offset, game.seed & 0xFFFFFFFFFFFFFFFF, game.ticks,
+                          snake.xs[0], snake.ys[0], stats.score, snake.angles[0],
+                          stats.get_current_speed() * snake.speed_boost, snake.count, stats.level,
+                          stats.lives, stats.food_eaten, len(game.food_list), stats.power_up_timer,
+                          stats.invulnerable_timer, game.events, STATE_CODES[game.state])
+        self._sequences[slot] = n
+        self._count[0] = n
+        self.count = n
+
+    def close(self):
+        self._count = self._sequences = None  # Views have to go before the mapping can close
+        self.buffer.close()
+
+
+class TelemetryReader:
+    """Read-only view of a telemetry file; ``read`` returns what is new"""
+    def __init__(self, path, from_start=False):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.capacity, _ = _HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a telemetry file")
+        if version != VERSION or record_size != RECORD_SIZE:
+            raise ValueError(f"Unsupported telemetry version {version}")
+        # Zero-copy view of every slot, in slot (not time) order
+        self.slots = np.frombuffer(self.buffer, RECORD_DTYPE, self.capacity, HEADER_SIZE)
+        self._count, _ = _views(self.buffer, self.capacity)
+        self.next = 1 if from_start else self.written() + 1
+        self.dropped = 0
+
+    def written(self):
+        """Records written so far (the number of the newest one)"""
+        return int(self._count[0])
+
+    def read(self, limit=None):
+        """Records written since the last call, oldest first, as a copy.
+
+        Records overwritten before they could be read are counted in
+        ``dropped``; ``limit`` caps how many of the newest are returned.
+        """
+        count = self.written()
+        # The slot after the newest may be mid-write, so it never counts
+        start = max(self.next, count - self.capacity + 2)
+        if limit is not None:
+            start = max(start, count - limit + 1)
+        numbers = np.arange(start, count + 1, dtype=np.uint64)
+        records = self.slots[(numbers - 1) % self.capacity]
+        complete = ((records['sequence'] == numbers)
+                    & (numbers + self.capacity >= self.written() + 2))
+        self.dropped += int(start - self.next) + int(np.count_nonzero(~complete))
+        self.next = count + 1
+        return records[complete]
+
+    def latest(self):
+        """The newest record (a copy), or None if there is none yet;
+        doesn't move the position ``read`` continues from"""
+        count = self.written()
+        if not count:
+            return None
+        record = self.slots[(count - 1) % self.capacity].copy()
+        # Only a writer a whole lap ahead could have reused the slot by now
+        return record if record['sequence'] == count else None
+
+    def replaced(self):
+        """Whether a new writer has put a different file at ``path``"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_dev, stat.st_ino) != (self.stat.st_dev, self.stat.st_ino)
+
+    def close(self):
+        self.slots = self._count = None  # Views have to go before the mapping can close
+        self.buffer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow the telemetry of a running Snake Adventure game")
+    parser.add_argument('path', help="telemetry file written by reptilesimu.py --telemetry")
+    parser.add_argument('--from-start', action='store_true', help="print what the buffer still holds first")
+    parser.add_argument('--interval', type=float, default=0.1, help="seconds between polls")
+    args = parser.parse_args(argv)
+
+    reader = TelemetryReader(args.path, from_start=args.from_start)
+    try:
+        while True:
+            for record in reader.read():
+                events = ','.join(event_names(int(record['events'])))
+                print(f"tick {record['tick']} {reptilecore.GAME_STATES[record['state']]}: "
+                      f"score {record['score']}, level {record['level']}, lives {record['lives']}, "
+                      f"length {record['segments']}, head ({record['head_x']:.1f}, {record['head_y']:.1f})"
+                      + (f" [{events}]" if events else ''))
+            if reader.replaced():
+                reader.close()
+                reader = TelemetryReader(args.path, from_start=True)
+                print("-- new session --", file=sys.stderr)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{reader.dropped} records dropped", file=sys.stderr)
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
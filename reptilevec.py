@@ -0,0 +1,472 @@
+"""Lockstep vector environment: many independent games stepped as arrays.
+
+``VecEnv`` runs N single-player games under the normal rules (speed ramp,
+power-up boost, lives, invulnerability after a hit or a level-up, levels
+laid out by ``reptilecore.layout_level``), with every per-game value held
+in batched arrays. Bodies are (segments, envs), as in the arena. Food is
+(envs, slots) and obstacles are (envs, max_obstacles, 4). ``step`` takes
+one steering target per game, the cursor of ``Game.tick``. It advances
+every game by one tick with a fixed number of NumPy operations per body
+position, restarts games that ended, and returns contiguous observation,
+reward and done arrays::
+
+    env = VecEnv(1024, seed=0)
+    obs = env.reset()
+    obs, rewards, dones = env.step(targets)     # targets: (N, 2) screen coords
+
+Only level layout (at a restart or level-up) runs per game in Python. Two
+things differ from a single ``Game``:
+- The follow chain works on unit vectors instead of angles, the fast-math
+  form of ``Snake.update``, equal up to rounding.
+- A head that leaves the finite plane counts as a crash instead of
+  carrying NaNs forward.
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+import reptilecore
+from reptilecore import screen_width, screen_height, TICK_RATE, table_sin
+
+
+# One row per game, in this column order; positions and offsets are in
+# screen widths/heights, timers and lives are fractions of their maximum
+OBS_FIELDS = ('head_x', 'head_y', 'heading_x', 'heading_y', 'speed',
+              'food_dx', 'food_dy', 'obstacle_dx', 'obstacle_dy', 'body_dx', 'body_dy',
+              'lives', 'invulnerable', 'power', 'length')
+
+
+def sweep_boxes(x0, y0, x1, y1, left, top, right, bottom):
+    """Batched reptilecore.sweep_box over broadcast arguments; inf where the
+    point never enters its box"""
+    enter, leave = 0.0, 1.0
+    with np.errstate(all='ignore'):
+        for start, end, low, high in ((x0, x1, left, right), (y0, y1, top, bottom)):
+            delta = end - start
+            near = (low - start) / delta
+            far = (high - start) / delta
+            moving = delta != 0
+            enter = np.where(moving, np.maximum(enter, np.minimum(near, far)), enter)
+            leave = np.where(moving, np.minimum(leave, np.maximum(near, far)),
+                             np.where((low < start) & (start < high), leave, -1.0))
+    return np.where(enter < leave, enter, np.inf)
+
+
+def swept_hits(x0, y0, x1, y1, half, left, top, width, height):
+    """Batched Snake._swept_hit: fraction of the head's move at which its
+    box (half-size ``half``) first touches the integer rect, inf if never"""
+    t = sweep_boxes(x0, y0, x1, y1, left - half + 1, top - half + 1,
+                    left + width + half, top + height + half)
+    head_left, head_top = np.trunc(x1 - half), np.trunc(y1 - half)
+    at_end = ((head_left < left + width) & (left < head_left + 2 * half)
+              & (head_top < top + height) & (top < head_top + 2 * half))
+    return np.where(np.isinf(t) & at_end, 1.0, t)
+
+
+class VecEnv:
+    start_length = 8
+    start_lives = 3
+    segment_length = 18
+    invulnerable_ticks = reptilecore.INVULNERABLE_TICKS
+    power_ticks = reptilecore.POWER_UP_TICKS
+    # Food keeps the 'normal' size, points and growth whatever its type, as in Game
+    food_size = 12
+    food_points = 10
+    food_growth = 1
+
+    # Tuning, overridable through ``config`` like Game.configure
+    base_speed = reptilecore.BASE_SPEED
+    speed_increment = reptilecore.SPEED_INCREMENT
+    max_speed = reptilecore.MAX_SPEED
+    super_food_chance = reptilecore.SUPER_FOOD_CHANCE
+    power_food_chance = reptilecore.POWER_FOOD_CHANCE
+    max_obstacles = reptilecore.MAX_OBSTACLES
+    head_clearance = reptilecore.HEAD_CLEARANCE
+    obstacle_gap = reptilecore.OBSTACLE_GAP
+    food_obstacle_margin = reptilecore.FOOD_OBSTACLE_MARGIN
+    food_spacing = reptilecore.FOOD_SPACING
+
+    # Subtracted from the reward for every life lost
+    life_penalty = 0.0
+
+    def __init__(self, num_envs, seed=None, config=None, max_ticks=36000):
+        self.num_envs = n = num_envs
+        self.config = dict(config or {})
+        self.configure(**self.config)
+        self.max_ticks = max_ticks
+
+        self.xs = np.zeros((32, n))
+        self.ys = np.zeros((32, n))
+        self.lengths = np.zeros(n, dtype=np.int64)
+        self.heading_x = np.ones(n)
+        self.start_x = np.zeros(n)  # Head position before this tick's move
+        self.start_y = np.zeros(n)
+        self.heading_y = np.zeros(n)
+
+        self.food_x = np.zeros((n, 16))
+        self.food_y = np.zeros((n, 16))
+        self.food_alive = np.zeros((n, 16), dtype=bool)
+        self.food_power = np.zeros((n, 16), dtype=bool)
+        self.obstacles = np.zeros((n, max(1, self.max_obstacles), 4), dtype=np.int64)
+        self.obstacle_count = np.zeros(n, dtype=np.int64)
+        # (left, top, right, bottom) planes of each rock grown by the reach of
+        # a head box, for the broad phase; NaN where there is no rock
+        self.obstacle_bounds = np.full((4,) + self.obstacles.shape[:2], np.nan)
+
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.int64)
+        self.food_eaten = np.zeros(n, dtype=np.int64)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.power_timer = np.zeros(n, dtype=np.int64)
+        self.invulnerable_timer = np.zeros(n, dtype=np.int64)
+        self.speed_boost = np.ones(n)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.seeds = np.zeros(n, dtype=np.int64)
+        self.rngs = [None] * n
+
+        # Outcome of the episode that ended in the last step (where dones)
+        self.final_score = np.zeros(n, dtype=np.int64)
+        self.final_level = np.zeros(n, dtype=np.int64)
+        self.final_ticks = np.zeros(n, dtype=np.int64)
+        self.episodes = 0
+
+        self.reset(seed)
+
+    def configure(self, **params):
+        """Override tuning parameters; accepts the same names as Game.configure"""
+        for name, value in params.items():
+            if name == 'fast_math':
+                continue  # The follow chain here is always the fast-math form
+            if name not in ('base_speed', 'speed_increment', 'max_speed', 'super_food_chance',
+                            'power_food_chance', 'max_obstacles', 'head_clearance', 'obstacle_gap',
+                            'food_obstacle_margin', 'food_spacing', 'life_penalty'):
+                raise ValueError(f"Unknown config parameter: {name!r}")
+            setattr(self, name, value)
+
+    def reset(self, seed=None):
+        """Start every game afresh, game ``e`` with seed ``seed + e``; returns observations"""
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        for e in range(self.num_envs):
+            self._new_game(e, self.seed + e)
+        return self.observe()
+
+    def _new_game(self, e, seed):
+        self.seeds[e] = seed
+        self.rngs[e] = reptilecore.make_rng_streams(seed)[0]
+        self.score[e] = self.food_eaten[e] = self.ticks[e] = 0
+        self.level[e] = 1
+        self.lives[e] = self.start_lives
+        self.power_timer[e] = self.invulnerable_timer[e] = 0
+        self._reset_snake(e)
+        self._generate_level(e)
+
+    def _reset_snake(self, e):
+        """Snake.reset for game ``e``"""
+        self.xs[:, e] = float(screen_width // 2)
+        self.ys[:, e] = float(screen_height // 2)
+        self.lengths[e] = self.start_length
+        self.heading_x[e], self.heading_y[e] = 1.0, 0.0
+        self.speed_boost[e] = 1.0
+
+    def _generate_level(self, e):
+        obstacles, foods = reptilecore.layout_level(self.rngs[e], int(self.level[e]),
+                                                    float(self.xs[0, e]), float(self.ys[0, e]), self)
+        self.obstacle_count[e] = len(obstacles)
+        if obstacles:
+            self.obstacles[e, :len(obstacles)] = obstacles
+        x, y, width, height = np.moveaxis(self.obstacles[e, :len(obstacles)], 1, 0)
+        self.obstacle_bounds[:, e] = np.nan
+        self.obstacle_bounds[:, e, :len(obstacles)] = (x - 20, y - 20, x + width + 20, y + height + 20)
+        if len(foods) > self.food_x.shape[1]:
+            slots = max(len(foods), 2 * self.food_x.shape[1])
+            for name in ('food_x', 'food_y', 'food_alive', 'food_power'):
+                old = getattr(self, name)
+                grown = np.zeros((self.num_envs, slots), dtype=old.dtype)
+                grown[:, :old.shape[1]] = old
+                setattr(self, name, grown)
+        self.food_alive[e] = False
+        for slot, (x, y, food_type) in enumerate(foods):
+            self.food_x[e, slot], self.food_y[e, slot] = x, y
+            self.food_alive[e, slot] = True
+            self.food_power[e, slot] = food_type == 'power'
+
+    def _reserve(self, capacity):
+        if capacity <= len(self.xs):
+            return
+        new_capacity = max(capacity, 2 * len(self.xs))
+        for name in ('xs', 'ys'):
+            old = getattr(self, name)
+            grown = np.zeros((new_capacity, self.num_envs))
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def speeds(self):
+        """GameStats.get_current_speed times the power-up boost, per game"""
+        speed = np.minimum(self.base_speed + self.food_eaten * self.speed_increment, self.max_speed)
+        return speed * self.speed_boost
+
+    def update_bodies(self, target_x, target_y):
+        """Batched Snake.update: segment i of every game in one step.
+
+        Per segment this is the fast-math follow step: with d the offset to
+        the parent's new position, the segment moves by
+        speed * (d - length * d / |d| + wiggle * perp(d) / |d|).
+        """
+        speed = self.speeds()
+        last = int(self.lengths.max())
+        phase = (self.ticks * 1000 // TICK_RATE) * 0.02
+        moving = np.hypot(target_x - self.xs[0], target_y - self.ys[0]) > 15
+        # Wiggle offsets for every segment at once, pre-scaled by the speed
+        # (from the same sine table as fast-math Snake.update)
+        wiggle = table_sin(phase + np.arange(last)[:, None] * 0.4) * np.where(moving, 12 * speed * speed, 0.0)
+        wiggle[0] = table_sin(phase) * np.where(moving, 5 * speed * speed, 0.0)
+        reach = self.segment_length * speed
+        tx, ty = target_x, target_y
+        xs, ys = self.xs, self.ys
+        with np.errstate(all='ignore'):
+            for i in range(last):
+                x, y = xs[i], ys[i]
+                dx, dy = tx - x, ty - y
+                squared = dx * dx + dy * dy
+                stacked = squared == 0
+                any_stacked = np.count_nonzero(stacked)
+                if any_stacked:  # atan2(0, 0) == 0: face +x, as a unit offset
+                    dx = np.where(stacked, 1.0, dx)
+                    squared = np.where(stacked, 1.0, squared)
+                inverse = 1 / np.sqrt(squared)
+                along = speed - reach * inverse
+                across = wiggle[i] * inverse
+                if any_stacked:
+                    along[stacked] = -reach[stacked]  # ...that it does not close
+                if i == 0:
+                    self.heading_x, self.heading_y = dx * inverse, dy * inverse
+                # Perpendicular (cos(a + pi/2), sin(a + pi/2)) is (-dy, dx) / |d|
+                tx = x + dx * along - dy * across
+                ty = y + dy * along + dx * across
+                xs[i], ys[i] = tx, ty
+
+    def step(self, actions):
+        """Advance every game one tick towards its (x, y) target.
+
+        Returns (observations, rewards, dones). A game is done when its last
+        life is lost or it reaches ``max_ticks``; it is restarted at once with
+        a seed drawn from its own level stream (as Game.restart does), so the
+        observation returned for it is the first of the next episode and its
+        outcome is left in ``final_score``/``final_level``/``final_ticks``.
+        """
+        actions = np.asarray(actions, dtype=np.float64)
+        score_before = self.score.copy()
+        self.start_x, self.start_y = self.xs[0].copy(), self.ys[0].copy()
+        self.update_bodies(actions[:, 0].copy(), actions[:, 1].copy())
+
+        # Update timers
+        powered = self.power_timer > 0
+        self.power_timer -= powered
+        self.speed_boost[powered & (self.power_timer == 0)] = 1.0
+        np.maximum(self.invulnerable_timer - 1, 0, out=self.invulnerable_timer)
+
+        self.collect_food()
+        crashed = self.collisions()
+
+        self.lives -= crashed
+        game_over = crashed & (self.lives <= 0)
+        for e in np.flatnonzero(crashed & ~game_over).tolist():
+            self._reset_snake(e)
+            self.invulnerable_timer[e] = self.invulnerable_ticks
+
+        self.ticks += 1
+        rewards = (self.score - score_before - self.life_penalty * crashed).astype(np.float32)
+        dones = game_over | (self.ticks >= self.max_ticks)
+        finished = np.flatnonzero(dones)
+        if len(finished):
+            self.final_score[finished] = self.score[finished]
+            self.final_level[finished] = self.level[finished]
+            self.final_ticks[finished] = self.ticks[finished]
+            self.episodes += len(finished)
+            for e in finished.tolist():
+                self._new_game(e, self.rngs[e].getrandbits(32))
+        return self.observe(), rewards, dones
+
+    def _move_bounds(self):
+        """(left, top, right, bottom) of the box around each head's move"""
+        return (np.minimum(self.start_x, self.xs[0]), np.minimum(self.start_y, self.ys[0]),
+                np.maximum(self.start_x, self.xs[0]), np.maximum(self.start_y, self.ys[0]))
+
+    def collect_food(self):
+        """Game.handle_food_collection for every food each head swept over,
+        in the order it reached them"""
+        # Broad phase: food near the box around each head's move
+        left, top, right, bottom = (bound[:, None] for bound in self._move_bounds())
+        reach = 22 + self.food_size + 2
+        near = (self.food_alive & (self.food_x > left - reach) & (self.food_x < right + reach)
+                & (self.food_y > top - reach) & (self.food_y < bottom + reach))
+        envs, slots = np.nonzero(near)
+        reached = np.full(self.food_x.shape, np.inf)
+        if not len(envs):
+            return
+        food_left = np.trunc(self.food_x[envs, slots] - self.food_size)
+        food_top = np.trunc(self.food_y[envs, slots] - self.food_size)
+        side = 2 * self.food_size
+        reached[envs, slots] = swept_hits(self.start_x[envs], self.start_y[envs], self.xs[0, envs],
+                                          self.ys[0, envs], 22, food_left, food_top, side, side)
+        rows = np.arange(self.num_envs)
+        while True:
+            # Earliest first; the food index answers ties in insertion order,
+            # so the lowest slot wins
+            eaten = reached.argmin(axis=1)
+            eaters = np.flatnonzero(reached[rows, eaten] < np.inf)
+            if not len(eaters):
+                return
+            eaten = eaten[eaters]
+            reached[eaters, eaten] = np.inf
+            self.score[eaters] += self.food_points
+            self.food_eaten[eaters] += 1
+            power = self.food_power[eaters, eaten]
+            self.power_timer[eaters[power]] = self.power_ticks
+            self.speed_boost[eaters[power]] = 2.0
+            self.food_alive[eaters, eaten] = False
+
+            # Snake.add_segment: new segments start stacked on the tail
+            lengths = self.lengths[eaters]
+            self._reserve(int(lengths.max()) + self.food_growth)
+            for k in range(self.food_growth):
+                self.xs[lengths + k, eaters] = self.xs[lengths - 1, eaters]
+                self.ys[lengths + k, eaters] = self.ys[lengths - 1, eaters]
+            self.lengths[eaters] += self.food_growth
+
+            # A level is only done once all its food is eaten, so nothing
+            # else is left in ``reached`` for the games that level up here
+            for e in eaters[~self.food_alive[eaters].any(axis=1)].tolist():
+                self.level[e] += 1
+                self.invulnerable_timer[e] = self.invulnerable_ticks
+                self._generate_level(e)
+
+    def collisions(self):
+        """Games whose (vulnerable) head hit a wall, or swept into a rock
+        or its own body"""
+        head_x, head_y = self.xs[0], self.ys[0]
+        start_x, start_y = self.start_x, self.start_y
+        margin = 25
+        with np.errstate(all='ignore'):
+            crashed = ((head_x < margin) | (head_x > screen_width - margin)
+                       | (head_y < margin) | (head_y > screen_height - margin)
+                       | ~np.isfinite(head_x) | ~np.isfinite(head_y))
+
+            # Rocks and body segments near the box around each move are
+            # swept against; the rest are too far to touch
+            left, top, right, bottom = self._move_bounds()
+            rock_left, rock_top, rock_right, rock_bottom = self.obstacle_bounds
+            near = ((rock_left < right[:, None]) & (left[:, None] < rock_right)
+                    & (rock_top < bottom[:, None]) & (top[:, None] < rock_bottom))
+            envs, slots = np.nonzero(near)
+            if len(envs):
+                ox, oy, ow, oh = self.obstacles[envs, slots].T
+                hit = swept_hits(start_x[envs], start_y[envs], head_x[envs], head_y[envs], 18,
+                                 ox, oy, ow, oh) < np.inf
+                crashed[envs[hit]] = True
+
+            # Own body from the sixth segment on, with the thickness taper
+            last = int(self.lengths.max())
+            if last > 5:
+                near = ((np.arange(5, last)[:, None] < self.lengths)
+                        & (self.xs[5:last] > left - 37) & (self.xs[5:last] < right + 37)
+                        & (self.ys[5:last] > top - 37) & (self.ys[5:last] < bottom + 37))
+                index, envs = np.nonzero(near)
+                if len(envs):
+                    index += 5
+                    thickness = (26 * (1 - index / np.maximum(1, self.lengths[envs] - 1) * 0.6)
+                                 + 8).astype(np.int64)
+                    seg_left = np.trunc(self.xs[index, envs] - thickness // 2)
+                    seg_top = np.trunc(self.ys[index, envs] - thickness // 2)
+                    hit = swept_hits(start_x[envs], start_y[envs], head_x[envs], head_y[envs], 18,
+                                     seg_left, seg_top, thickness, thickness) < np.inf
+                    crashed[envs[hit]] = True
+        return crashed & (self.invulnerable_timer == 0)
+
+    def observe(self):
+        """(num_envs, len(OBS_FIELDS)) float32 observations; see OBS_FIELDS"""
+        n = self.num_envs
+        obs = np.empty((n, len(OBS_FIELDS)), dtype=np.float32)
+        head_x, head_y = self.xs[0], self.ys[0]
+        scale = np.array([screen_width, screen_height])
+        obs[:, 0] = head_x / screen_width
+        obs[:, 1] = head_y / screen_height
+        obs[:, 2] = self.heading_x
+        obs[:, 3] = self.heading_y
+        obs[:, 4] = self.speeds()
+
+        with np.errstate(all='ignore'):
+            # Nearest food (1, 1 if there is none)
+            dx = self.food_x - head_x[:, None]
+            dy = self.food_y - head_y[:, None]
+            dist = np.where(self.food_alive, dx * dx + dy * dy, np.inf)
+            nearest = dist.argmin(axis=1)
+            rows = np.arange(n)
+            found = np.isfinite(dist[rows, nearest])
+            obs[:, 5:7] = np.where(found[:, None], np.stack([dx[rows, nearest], dy[rows, nearest]], axis=1) / scale, 1.0)
+
+            # Nearest point of the nearest rock
+            ox, oy, ow, oh = np.moveaxis(self.obstacles, 2, 0)
+            dx = np.clip(head_x[:, None], ox, ox + ow) - head_x[:, None]
+            dy = np.clip(head_y[:, None], oy, oy + oh) - head_y[:, None]
+            present = np.arange(self.obstacles.shape[1])[None, :] < self.obstacle_count[:, None]
+            dist = np.where(present, dx * dx + dy * dy, np.inf)
+            nearest = dist.argmin(axis=1)
+            found = np.isfinite(dist[rows, nearest])
+            obs[:, 7:9] = np.where(found[:, None], np.stack([dx[rows, nearest], dy[rows, nearest]], axis=1) / scale, 1.0)
+
+            # Nearest body segment that can be hit (index 5 on)
+            last = int(self.lengths.max())
+            if last > 5:
+                dx = self.xs[5:last] - head_x
+                dy = self.ys[5:last] - head_y
+                live = np.arange(5, last)[:, None] < self.lengths
+                dist = np.where(live, dx * dx + dy * dy, np.inf)
+                nearest = dist.argmin(axis=0)
+                found = np.isfinite(dist[nearest, rows])
+                obs[:, 9:11] = np.where(found[:, None], np.stack([dx[nearest, rows], dy[nearest, rows]], axis=1) / scale, 1.0)
+            else:
+                obs[:, 9:11] = 1.0
+
+        obs[:, 11] = self.lives / self.start_lives
+        obs[:, 12] = self.invulnerable_timer / self.invulnerable_ticks
+        obs[:, 13] = self.power_timer / self.power_ticks
+        obs[:, 14] = self.lengths / 100
+        return obs
+
+
+def greedy_actions(obs, reach=100):
+    """Steer every game towards its nearest food, from observations alone"""
+    head = obs[:, 0:2] * (screen_width, screen_height)
+    offset = obs[:, 5:7] * (screen_width, screen_height)
+    dist = np.maximum(np.hypot(offset[:, 0], offset[:, 1]), 1e-9)
+    return head + offset * np.minimum(1.0, reach / dist)[:, None]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Step many headless games in lockstep")
+    parser.add_argument('--envs', type=int, default=1024)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env = VecEnv(args.envs, seed=args.seed)
+    obs = env.reset(args.seed)
+    total_reward = 0.0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        obs, rewards, dones = env.step(greedy_actions(obs))
+        total_reward += float(rewards.sum())
+    elapsed = time.perf_counter() - start
+    steps = args.envs * args.steps
+    print(f"{args.envs} envs x {args.steps} steps in {elapsed:.2f}s ({steps / elapsed:,.0f} env-steps/s)",
+          file=sys.stderr)
+    print(f"{env.episodes} episodes finished, reward {total_reward:.0f}, "
+          f"mean level {env.level.mean():.2f}, longest snake {int(env.lengths.max())}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()